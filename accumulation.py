@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from . import sampling
+
+# Progressive accumulation
+# The raw lightmap of a progressive bake is kept next to the lightmap as the
+# running mean of every run, with the number of samples it holds. A refine run
+# bakes the same objects with another seed, so its noise is independent of the
+# previous runs, and is blended in weighted by sample count. Raising the
+# quality never bakes the samples already accumulated again.
+
+PIXELS_EXTENSION = ".npy"
+INFO_EXTENSION = ".json"
+
+class AccumulationBuffer:
+    def __init__(self, path):
+        # path without extension, the pixels and their info share it
+        self.pixels_path = path + PIXELS_EXTENSION
+        self.info_path = path + INFO_EXTENSION
+
+    def exists(self):
+        return os.path.exists(self.info_path) and os.path.exists(self.pixels_path)
+
+    def clear(self):
+        for path in (self.pixels_path, self.info_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def load_info(self):
+        # {"key", "samples", "runs", "seed"}, None without a buffer
+        if not self.exists():
+            return None
+
+        try:
+            with open(self.info_path) as info_file:
+                return json.load(info_file)
+        except ValueError:
+            return None
+
+    def load_pixels(self, width, height):
+        if not os.path.exists(self.pixels_path):
+            return None
+
+        pixels = np.load(self.pixels_path)
+        if pixels.shape != (height, width, 4):
+            return None
+
+        return pixels.astype(np.float32)
+
+    def start_run(self, key, seed, refine=True):
+        # Info of the next run: the accumulation to refine, or a new one when
+        # not refining or when the objects, lights or settings changed
+        info = self.load_info() if refine else None
+
+        if info is not None and info["key"] != key:
+            print(f"Objects, lights or settings of {os.path.basename(self.info_path)} changed, starting a new accumulation")
+            info = None
+
+        if info is None:
+            info = {"key": key, "samples": 0, "runs": 0, "seed": seed}
+
+        return info
+
+    def accumulate(self, info, pixels, samples):
+        # Blend pixels baked with samples into the accumulation, weighted by
+        # sample count, and store it. Returns the accumulated pixels, info is
+        # updated. Pixels of another resolution start the accumulation over.
+        height, width = pixels.shape[:2]
+
+        if info["samples"]:
+            accumulated_pixels = self.load_pixels(width, height)
+
+            if accumulated_pixels is None:
+                info["samples"] = 0
+            else:
+                pixels = sampling.blend(accumulated_pixels, info["samples"], pixels, samples)
+
+        info["samples"] += samples
+        info["runs"] += 1
+        self.save(pixels, info)
+
+        return pixels
+
+    def save(self, pixels, info):
+        # Full floats, the running mean is read back and rounded again by
+        # every refine run. The pixels are written first, the info only
+        # points to complete pixels.
+        self.write(self.pixels_path, lambda pixels_file: np.save(pixels_file, pixels.astype(np.float32)))
+        self.write(self.info_path, lambda info_file: info_file.write(json.dumps(info).encode()))
+
+    def write(self, path, write_data):
+        file_descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(file_descriptor, 'wb') as data_file:
+            write_data(data_file)
+        os.replace(temporary_path, path)
@@ -0,0 +1,121 @@
+import math
+
+import numpy as np
+
+# Atlas planner
+# Objects are spread over as many lightmaps as needed to reach a target texel
+# density, instead of sharing a single lightmap whatever their number. Objects
+# sharing a material stay in the same atlas, since a material points at one
+# lightmap, and so do objects sharing a mesh, since they share its UVs.
+
+# Part of an atlas actually covered once the UV islands and margins are packed
+ATLAS_FILL = 0.7
+
+MIN_RESOLUTION = 64
+
+def get_surface_areas(obj, depsgraph):
+    # World space surface area, lightmap UV area and lightmap UV bounds area
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+
+    try:
+        mesh.calc_loop_triangles()
+
+        vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+        mesh.vertices.foreach_get("co", vertices)
+
+        triangle_vertices = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("vertices", triangle_vertices)
+
+        triangle_loops = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("loops", triangle_loops)
+
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float64)
+        mesh.uv_layers[1].data.foreach_get("uv", uvs)
+    finally:
+        obj_eval.to_mesh_clear()
+
+    if not len(triangle_vertices):
+        return 0.0, 0.0, 0.0
+
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    vertices = vertices.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+
+    points = vertices[triangle_vertices].reshape(-1, 3, 3)
+    first = points[:, 1] - points[:, 0]
+    second = points[:, 2] - points[:, 0]
+    cross = np.stack([
+        first[:, 1] * second[:, 2] - first[:, 2] * second[:, 1],
+        first[:, 2] * second[:, 0] - first[:, 0] * second[:, 2],
+        first[:, 0] * second[:, 1] - first[:, 1] * second[:, 0],
+    ], axis=1)
+    world_area = 0.5 * np.linalg.norm(cross, axis=1).sum()
+
+    uv_points = uvs.reshape(-1, 2)[triangle_loops].reshape(-1, 3, 2)
+    first = uv_points[:, 1] - uv_points[:, 0]
+    second = uv_points[:, 2] - uv_points[:, 0]
+    uv_area = 0.5 * np.abs(first[:, 0] * second[:, 1] - first[:, 1] * second[:, 0]).sum()
+
+    uv_extent = uv_points.reshape(-1, 2).max(axis=0) - uv_points.reshape(-1, 2).min(axis=0)
+    uv_bounds_area = uv_extent[0] * uv_extent[1]
+
+    return float(world_area), float(uv_area), float(uv_bounds_area)
+
+def get_footprint(world_area, uv_area, uv_bounds_area, texels_per_meter):
+    # Texels needed by the object, islands covering little of their bounds take more room
+    footprint = world_area * texels_per_meter ** 2
+    if uv_area > 0.0 and uv_bounds_area > uv_area:
+        footprint *= uv_bounds_area / uv_area
+
+    return footprint
+
+def group_by_material(objects):
+    # Objects linked by a shared material or mesh, union find over their names
+    parents = {}
+
+    def find(key):
+        while parents.setdefault(key, key) != key:
+            parents[key] = parents[parents[key]]
+            key = parents[key]
+        return key
+
+    for obj in objects:
+        keys = [f"object:{obj.name}", f"mesh:{obj.data.name}"] + [f"material:{slot.material.name}" for slot in obj.material_slots if slot.material]
+        for key in keys[1:]:
+            parents[find(key)] = find(keys[0])
+
+    groups = {}
+    for obj in objects:
+        groups.setdefault(find(f"object:{obj.name}"), []).append(obj.name)
+
+    return list(groups.values())
+
+def get_atlas_resolution(footprint, max_resolution):
+    side = math.sqrt(footprint / ATLAS_FILL)
+    resolution = 1 << max(0, math.ceil(math.log2(max(side, 1.0))))
+
+    return min(max(resolution, MIN_RESOLUTION), max_resolution)
+
+def plan_atlases(objects, depsgraph, texels_per_meter, max_resolution):
+    # Returns a list of (resolution, object names), first fit decreasing
+    footprints = {obj.name: get_footprint(*get_surface_areas(obj, depsgraph), texels_per_meter) for obj in objects}
+    capacity = max_resolution ** 2 * ATLAS_FILL
+
+    groups = [(sum(footprints[obj_name] for obj_name in group), group) for group in group_by_material(objects)]
+    groups.sort(key=lambda group: -group[0])
+
+    atlases = []
+    for footprint, group in groups:
+        if footprint > capacity:
+            print(f"{', '.join(group)} share materials and need more than one {max_resolution} lightmap, "
+                  f"they get {math.sqrt(capacity / footprint) * texels_per_meter:.1f} texels per meter")
+
+        for atlas in atlases:
+            if atlas[0] + footprint <= capacity:
+                atlas[0] += footprint
+                atlas[1].extend(group)
+                break
+        else:
+            atlases.append([footprint, list(group)])
+
+    return [(get_atlas_resolution(footprint, max_resolution), names) for footprint, names in atlases]
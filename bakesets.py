@@ -0,0 +1,41 @@
+import fnmatch
+import re
+
+# Bake sets
+# Rules filling the bake list: every mesh of a collection, every mesh whose
+# name matches a pattern, every mesh with a custom property set. The objects
+# are walked once and matched against all the rules at the same time.
+
+def compile_rules(rules):
+    # (objects of the collection rules, name regex or None, custom property names)
+    collection_objects = set()
+    patterns = []
+    property_names = []
+
+    for rule in rules:
+        if rule.rule_type == 'COLLECTION' and rule.collection:
+            collection_objects.update(rule.collection.all_objects)
+        elif rule.rule_type == 'NAME' and rule.pattern:
+            patterns.append(fnmatch.translate(rule.pattern))
+        elif rule.rule_type == 'PROPERTY' and rule.property_name:
+            property_names.append(rule.property_name)
+
+    name_regex = re.compile("|".join(patterns)) if patterns else None
+
+    return collection_objects, name_regex, property_names
+
+def get_matcher(rules):
+    # Function telling if an object matches any of the rules
+    collection_objects, name_regex, property_names = compile_rules(rules)
+
+    def matches(obj):
+        return obj.type == 'MESH' and (
+            obj in collection_objects
+            or (name_regex is not None and name_regex.match(obj.name) is not None)
+            or any(obj.get(property_name) for property_name in property_names))
+
+    return matches
+
+def resolve_rules(rules, objects):
+    matches = get_matcher(rules)
+    return [obj for obj in objects if matches(obj)]
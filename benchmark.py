@@ -0,0 +1,231 @@
+import argparse
+import importlib
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+import bpy
+
+# Bake benchmark, on synthetic scenes baked on the CPU:
+#   blender -b --python /path/to/lightmap_baker/benchmark.py -- --objects 16,64 --resolutions 512,1024 --output report.json
+#   blender -b --python /path/to/lightmap_baker/benchmark.py -- --baseline report.json
+# Every combination of object, polygon, material slot and light count is baked at
+# every resolution. The JSON report holds the wall time, time per object, peak RSS
+# and lightmap file size of each case. With --baseline, the exit code is 1 when a
+# case got slower or used more memory than the baseline by more than the
+# tolerance.
+
+if __name__ == "__main__" and not __package__:
+    # Run as a script by blender --python, import the addon as a package
+    addon_directory = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(addon_directory))
+    __package__ = os.path.basename(addon_directory)
+    importlib.import_module(__package__)
+
+from . import cli, lightmap_baker, profiler
+
+EXIT_SUCCESS = 0
+EXIT_REGRESSION = 1
+
+CASE_KEYS = ("objects", "polygons", "materials", "lights", "resolution")
+
+def parse_int_list(text):
+    return [int(value) for value in text.split(',')]
+
+def parse_args(argv):
+    # Blender's own arguments stop at "--"
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+
+    parser = argparse.ArgumentParser(prog="lightmap_baker.benchmark", description="Time the bake pipeline on synthetic scenes")
+    parser.add_argument("--objects", type=parse_int_list, default=[16], help="Comma separated object counts")
+    parser.add_argument("--polygons", type=parse_int_list, default=[512], help="Comma separated polygon counts per object")
+    parser.add_argument("--materials", type=parse_int_list, default=[1], help="Comma separated material slot counts per object")
+    parser.add_argument("--lights", type=parse_int_list, default=[2], help="Comma separated light counts")
+    parser.add_argument("--resolutions", type=parse_int_list, default=[256, 512, 1024], help="Comma separated lightmap resolutions")
+    parser.add_argument("--samples", type=int, default=16, help="Sample count")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare the wall times and peak memory against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Slowdown or memory growth against the baseline reported as a regression")
+
+    return parser.parse_args(argv)
+
+def create_material(index):
+    material = bpy.data.materials.new(f"Benchmark_Material_{index}")
+    material.use_nodes = True
+
+    hue = (index * 0.618) % 1.0
+    principled = material.node_tree.nodes.get("Principled BSDF")
+    principled.inputs["Base Color"].default_value = (0.2 + 0.6 * hue, 0.5, 0.8 - 0.6 * hue, 1.0)
+
+    return material
+
+def create_grid_object(index, object_count, polygon_count, materials):
+    # A rippled grid, its lightmap UVs fill its own cell of the atlas
+    side = max(1, math.ceil(math.sqrt(polygon_count)))
+    cells = math.ceil(math.sqrt(object_count))
+    cell_x, cell_y = index % cells, index // cells
+
+    vertices = []
+    for y in range(side + 1):
+        for x in range(side + 1):
+            vertices.append((x / side, y / side, 0.05 * math.sin(6.0 * x / side) * math.cos(6.0 * y / side)))
+
+    faces = []
+    for y in range(side):
+        for x in range(side):
+            first = y * (side + 1) + x
+            faces.append((first, first + 1, first + side + 2, first + side + 1))
+
+    mesh = bpy.data.meshes.new(f"Benchmark_Mesh_{index}")
+    mesh.from_pydata(vertices, [], faces)
+
+    for material in materials:
+        mesh.materials.append(material)
+    for polygon in mesh.polygons:
+        polygon.material_index = polygon.index % len(materials)
+
+    # Keep some padding around each cell for the margin
+    mesh.uv_layers.new(name="UVMap")
+    lightmap_uv = mesh.uv_layers.new(name="Lightmap")
+    padding = 0.02
+    for loop in mesh.loops:
+        x, y = vertices[loop.vertex_index][:2]
+        lightmap_uv.data[loop.index].uv = (
+            (cell_x + padding + x * (1.0 - 2.0 * padding)) / cells,
+            (cell_y + padding + y * (1.0 - 2.0 * padding)) / cells,
+        )
+
+    obj = bpy.data.objects.new(f"Benchmark_Object_{index}", mesh)
+    obj.location = (cell_x * 1.2, cell_y * 1.2, 0.0)
+    bpy.context.scene.collection.objects.link(obj)
+
+    return obj
+
+def create_scene(object_count, polygon_count, material_count, light_count):
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    cli.ensure_registered()
+
+    scene = bpy.context.scene
+    scene.render.engine = 'CYCLES'
+
+    materials = [create_material(index) for index in range(material_count)]
+    objects = [create_grid_object(index, object_count, polygon_count, materials) for index in range(object_count)]
+
+    extent = math.ceil(math.sqrt(object_count)) * 1.2
+    for index in range(light_count):
+        light = bpy.data.lights.new(f"Benchmark_Light_{index}", type='POINT')
+        light.energy = 500.0
+        light_object = bpy.data.objects.new(f"Benchmark_Light_{index}", light)
+        angle = 2.0 * math.pi * index / light_count
+        light_object.location = (extent * (0.5 + 0.4 * math.cos(angle)), extent * (0.5 + 0.4 * math.sin(angle)), 3.0)
+        scene.collection.objects.link(light_object)
+
+    for obj in objects:
+        lightmap_baker.add_list_item(scene, obj)
+
+    return [obj.name for obj in objects]
+
+def run_case(case, samples, output_directory):
+    objects_to_bake = create_scene(case["objects"], case["polygons"], case["materials"], case["lights"])
+
+    context = bpy.context
+    properties = context.scene.lightmap_baker_properties
+    properties.lightmap_name = "Benchmark_Lightmap"
+    properties.lightmap_resolution = str(case["resolution"])
+    properties.sample_count = samples
+    properties.render_device = 'CPU'
+    properties.export_enabled = True
+    properties.export_path = output_directory
+    properties.incremental_bake = False
+    properties.use_bake_cache = False
+
+    profiler.reset()
+    time_start = time.perf_counter()
+    cli.bake_objects(context, objects_to_bake)
+    wall_time = time.perf_counter() - time_start
+
+    lightmap_path = lightmap_baker.get_img_filpath()
+
+    result = dict(case)
+    result["wall_time"] = wall_time
+    result["time_per_object"] = wall_time / case["objects"]
+    result["peak_rss"] = profiler.get_peak_rss()
+    result["file_size"] = os.path.getsize(lightmap_path) if os.path.exists(lightmap_path) else None
+    result["stages"] = {stage: total_time for stage, total_time, _ in profiler.get_summary()}
+
+    print(f"{case}: {wall_time:.2f} sec ({result['time_per_object']:.3f} sec/object)")
+
+    return result
+
+def get_case_key(result):
+    return tuple(result[key] for key in CASE_KEYS)
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    # Regressed cases, the ones missing from the baseline are not compared.
+    # Returns (regressions, cases without a peak RSS to compare)
+    with open(baseline_path) as baseline_file:
+        baseline = {get_case_key(result): result for result in json.load(baseline_file)["results"]}
+
+    regressions = []
+    unchecked_memory = []
+    for result in results:
+        baseline_result = baseline.get(get_case_key(result))
+        if baseline_result is None:
+            continue
+
+        case = dict(zip(CASE_KEYS, get_case_key(result)))
+
+        result["baseline_wall_time"] = baseline_result["wall_time"]
+        result["speedup"] = baseline_result["wall_time"] / result["wall_time"]
+
+        if result["wall_time"] > baseline_result["wall_time"] * (1.0 + tolerance):
+            regressions.append(dict(case, metric="wall_time"))
+
+        baseline_rss = baseline_result.get("peak_rss")
+        if result["peak_rss"] is None or baseline_rss is None:
+            print(f"WARNING: {case}: no peak RSS in the {'baseline' if baseline_rss is None else 'current run'}, memory is not compared")
+            unchecked_memory.append(case)
+            continue
+
+        result["baseline_peak_rss"] = baseline_rss
+        if result["peak_rss"] > baseline_rss * (1.0 + tolerance):
+            regressions.append(dict(case, metric="peak_rss"))
+
+    return regressions, unchecked_memory
+
+def main(argv=None):
+    args = parse_args(sys.argv if argv is None else argv)
+    output_directory = tempfile.mkdtemp(prefix="lightmap_baker_benchmark_")
+
+    cases = [dict(zip(CASE_KEYS, values)) for values in itertools.product(
+        args.objects, args.polygons, args.materials, args.lights, args.resolutions)]
+
+    report = {
+        "blender": bpy.app.version_string,
+        "samples": args.samples,
+        "results": [run_case(case, args.samples, output_directory) for case in cases],
+    }
+
+    exit_code = EXIT_SUCCESS
+    if args.baseline:
+        report["regressions"], report["unchecked_memory"] = compare_with_baseline(report["results"], args.baseline, args.tolerance)
+        if report["regressions"]:
+            exit_code = EXIT_REGRESSION
+        if report["unchecked_memory"]:
+            print(f"WARNING: peak memory not compared for {len(report['unchecked_memory'])} of {len(report['results'])} cases, see unchecked_memory in the report")
+
+    text = json.dumps(report, indent=2)
+    print(text)
+
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            report_file.write(text)
+
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# Bake cache
+# The baked pixels of each object are stored on disk, keyed by the object
+# fingerprint and the bake settings, so the same content baked again on
+# another machine, branch or session is read back instead. Entries hold the UV
+# region of the object as a compressed half float tile, with the texels the
+# object covers and the texels of its margin. The cache is bounded in size,
+# the least recently used entries are evicted first.
+
+ENTRY_EXTENSION = ".npz"
+
+def get_key(fingerprint, settings_hash):
+    return hashlib.sha1(f"{fingerprint}:{settings_hash}".encode()).hexdigest()
+
+class BakeCache:
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    def get_entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ENTRY_EXTENSION)
+
+    def load(self, key):
+        # Returns (x, y, mask, covered, pixels, bake time) or None
+        entry_path = self.get_entry_path(key)
+        if not os.path.exists(entry_path):
+            return None
+
+        try:
+            with np.load(entry_path) as entry:
+                origin = entry["origin"]
+                tile = (int(origin[0]), int(origin[1]), entry["mask"], entry["covered"],
+                        entry["pixels"].astype(np.float32), float(entry["bake_time"]))
+        except (OSError, ValueError, KeyError):
+            # Broken entry, or written before covered texels were stored, bake again
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            return None
+
+        # Most recently used
+        os.utime(entry_path)
+        return tile
+
+    def store(self, key, x, y, mask, covered, pixels, bake_time):
+        entry_path = self.get_entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        # Texels outside of the mask compress to nothing
+        pixels = np.where(mask[..., None], pixels, 0.0).astype(np.float16)
+
+        # Write aside and move in place, other processes never read a partial entry
+        file_descriptor, temporary_path = tempfile.mkstemp(suffix=ENTRY_EXTENSION, dir=self.directory)
+        with os.fdopen(file_descriptor, 'wb') as entry_file:
+            np.savez_compressed(entry_file, origin=np.array([x, y]), mask=mask, covered=covered, pixels=pixels, bake_time=bake_time)
+        os.replace(temporary_path, entry_path)
+
+    def get_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                if file_name.endswith(ENTRY_EXTENSION):
+                    stat = os.stat(os.path.join(root, file_name))
+                    entries.append((stat.st_mtime, stat.st_size, os.path.join(root, file_name)))
+        return entries
+
+    def get_size(self):
+        return sum(size for _, size, _ in self.get_entries())
+
+    def evict(self):
+        entries = sorted(self.get_entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+
+        for _, entry_size, entry_path in entries:
+            if size <= self.max_size:
+                break
+            os.remove(entry_path)
+            size -= entry_size
+
+        return size
+
+def extract_tile(pixels, mask):
+    # Bounding box of the mask, returns (x, y, mask, pixels)
+    rows = np.flatnonzero(mask.any(axis=1))
+    columns = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        return None
+
+    top, bottom = rows[0], rows[-1] + 1
+    left, right = columns[0], columns[-1] + 1
+
+    return left, top, mask[top:bottom, left:right], pixels[top:bottom, left:right]
+
+def paste_tile(pixels, x, y, mask, tile_pixels):
+    region = pixels[y:y + mask.shape[0], x:x + mask.shape[1]]
+    region[mask] = tile_pixels[mask]
+
+def paste_tiles(pixels, tiles):
+    # tiles: list of (x, y, mask, covered, tile pixels)
+    # Covered texels come from their own object first, margins are only
+    # written where no pasted object covers the texel, so the margin of an
+    # object never overwrites a neighbour that won't be baked again
+    height, width = pixels.shape[:2]
+    filled = np.zeros((height, width), dtype=bool)
+
+    for x, y, _, covered, _ in tiles:
+        filled[y:y + covered.shape[0], x:x + covered.shape[1]] |= covered
+
+    for x, y, _, covered, tile_pixels in tiles:
+        paste_tile(pixels, x, y, covered, tile_pixels)
+
+    for x, y, mask, _, tile_pixels in tiles:
+        margin = mask & ~filled[y:y + mask.shape[0], x:x + mask.shape[1]]
+        paste_tile(pixels, x, y, margin, tile_pixels)
+        filled[y:y + mask.shape[0], x:x + mask.shape[1]] |= margin
@@ -0,0 +1,572 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import traceback
+
+import bpy
+
+# Headless bake, for build machines running Blender in background mode:
+#   blender -b level.blend --python-exit-code 1 --python /path/to/lightmap_baker/cli.py -- --collection Level --resolution 2048
+#   blender -b --python-exit-code 1 --python-expr "import sys; from lightmap_baker import cli; sys.exit(cli.main())" -- --blend level.blend --objects Floor,Wall
+# The bake runs synchronously, without the scheduler, modal operators or UI redraws.
+# The exit code is 0 when the lightmap was baked, and a JSON summary is printed on stdout.
+# Blender exits with 0 after an uncaught error in a script unless --python-exit-code is given.
+
+if __name__ == "__main__" and not __package__:
+    # Run as a script by blender --python, import the addon as a package
+    addon_directory = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(addon_directory))
+    __package__ = os.path.basename(addon_directory)
+    importlib.import_module(__package__)
+
+import numpy as np
+
+from . import coverage, jobqueue, lightmap_baker, parallel, postprocess, profiler
+
+EXIT_SUCCESS = 0
+EXIT_BAKE_FAILED = 1
+EXIT_INVALID_INPUT = 2
+
+RESOLUTIONS = ['64', '128', '256', '512', '1024', '2048', '4096', '8192']
+
+def parse_args(argv):
+    # Blender's own arguments stop at "--"
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+
+    parser = argparse.ArgumentParser(prog="lightmap_baker.cli", description="Bake lightmaps without the user interface")
+    parser.add_argument("--blend", help=".blend file to open, the file loaded by Blender is used otherwise")
+    parser.add_argument("--objects", help="Comma separated names of the objects to bake")
+    parser.add_argument("--objects-file", help="JSON file holding the list of the objects to bake")
+    parser.add_argument("--collection", help="Bake every mesh object of this collection")
+    parser.add_argument("--resolution", choices=RESOLUTIONS, help="Lightmap resolution")
+    parser.add_argument("--udim", action="store_true", help="Bake lightmap UVs beyond the 0-1 square into UDIM tiles, one file per tile")
+    parser.add_argument("--texels-per-meter", type=float, help="Spread the objects over as many lightmaps as needed to reach this texel density")
+    parser.add_argument("--samples", type=int, help="Sample count")
+    parser.add_argument("--adaptive-samples", type=int, help="Bake every object with this many samples first, and spend the rest of --samples per object only on the noisy ones")
+    parser.add_argument("--noise-threshold", type=float, help="Relative noise above which an object gets more samples with --adaptive-samples")
+    parser.add_argument("--progressive", action="store_true", help="Keep the samples of the bake next to the lightmap, --refine adds to them later")
+    parser.add_argument("--refine", action="store_true", help="Bake again with another seed and blend into the accumulated lightmap, weighted by samples")
+    parser.add_argument("--margin", type=int, help="Bake margin in pixels")
+    parser.add_argument("--margin-mode", choices=['JUMP_FLOOD', 'CYCLES'], help="Fill the margin once at the end, or let Cycles extend it after every object")
+    parser.add_argument("--device", choices=['CPU', 'GPU'], help="Render device")
+    parser.add_argument("--output", help="Directory the lightmap is exported to")
+    parser.add_argument("--trace", help="Write a Chrome trace of the bake stages to this file")
+    parser.add_argument("--summary", help="Also write the JSON summary to this file")
+    parser.add_argument("--threads", type=int, help="Number of render threads")
+    parser.add_argument("--tile-size", choices=['512', '1024', '2048', '4096'], help="Bake the lightmap in tiles of this size, streamed to disk")
+    parser.add_argument("--max-tiles-in-memory", type=int, help="Finished tiles kept in memory before they are written to disk")
+    parser.add_argument("--workers", type=int, help="Split the bake across this many Blender processes")
+    parser.add_argument("--queue", help="Split the bake in jobs in this shared directory, baked by queue workers, and merge their results")
+    parser.add_argument("--queue-worker", help="Bake the jobs of this shared directory until none is left, instead of baking a list")
+    parser.add_argument("--queue-local-workers", type=int, default=0, help="Queue workers started on this machine by the coordinator")
+    parser.add_argument("--queue-job-size", type=int, default=16, help="Objects per queue job")
+    parser.add_argument("--queue-timeout", type=float, default=600.0, help="Seconds after which the claim of a silent worker goes back to the queue")
+    parser.add_argument("--queue-idle", type=float, default=0.0, help="Seconds a queue worker waits for new jobs once the queue is empty")
+    parser.add_argument("--benchmark-workers", help="Comma separated worker counts to time, e.g. 1,2,4,8")
+    parser.add_argument("--compare-margin", action="store_true", help="Bake with both margin modes and report how much their lightmaps differ")
+    parser.add_argument("--skip-uv-check", action="store_true", help="Don't look for overlapping or out of bounds lightmap UVs before baking")
+    parser.add_argument("--journal", action="store_true", help="Journal every baked object next to the lightmap, so the bake can be resumed with --resume")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted bake from its journal, journaled objects aren't baked again")
+    parser.add_argument("--raw-output", help="Save the raw float buffer (.npy) instead of post processing and exporting the lightmap")
+
+    return parser.parse_args(argv)
+
+def ensure_registered():
+    # The addon may not be enabled in the preferences of the build machine
+    if not hasattr(bpy.types.Scene, "lightmap_baker_properties"):
+        importlib.import_module(__package__).register()
+
+def apply_settings(scene, args):
+    properties = scene.lightmap_baker_properties
+
+    if args.resolution:
+        properties.lightmap_resolution = args.resolution
+    if args.udim:
+        properties.use_udim = True
+    if args.texels_per_meter:
+        properties.use_atlas_planner = True
+        properties.texels_per_meter = args.texels_per_meter
+    if args.samples:
+        properties.sample_count = args.samples
+    if args.adaptive_samples:
+        properties.adaptive_sampling = True
+        properties.adaptive_initial_samples = args.adaptive_samples
+    if args.noise_threshold:
+        properties.noise_threshold = args.noise_threshold
+    if args.progressive or args.refine:
+        properties.progressive_bake = True
+    properties.refine_bake = args.refine
+    if args.margin is not None:
+        properties.bake_margin = args.margin
+    if args.margin_mode:
+        properties.margin_mode = args.margin_mode
+    if args.device:
+        properties.render_device = args.device
+    if args.output:
+        properties.export_path = args.output
+    if args.tile_size:
+        properties.bake_mode = 'TILED'
+        properties.tile_size = args.tile_size
+    if args.max_tiles_in_memory:
+        properties.max_tiles_in_memory = args.max_tiles_in_memory
+    if args.threads:
+        scene.render.threads_mode = 'FIXED'
+        scene.render.threads = args.threads
+
+    if args.skip_uv_check:
+        properties.check_lightmap_uvs = False
+    if args.journal or args.resume:
+        properties.use_bake_journal = True
+    properties.resume_bake = args.resume
+
+    # Parallel workers bake exactly what the coordinator asks for
+    if args.raw_output:
+        properties.incremental_bake = False
+        properties.use_bake_cache = False
+        properties.check_lightmap_uvs = False
+        properties.use_bake_journal = False
+        properties.adaptive_sampling = False
+        properties.progressive_bake = False
+
+    # Nothing would be left of the bake otherwise
+    properties.export_enabled = True
+
+    # Only Cycles can bake
+    scene.render.engine = 'CYCLES'
+
+def resolve_objects(scene, args):
+    names = []
+
+    if args.objects:
+        names += [name.strip() for name in args.objects.split(',') if name.strip()]
+
+    if args.objects_file:
+        with open(args.objects_file) as objects_file:
+            names += json.load(objects_file)
+
+    if args.collection:
+        collection = bpy.data.collections.get(args.collection)
+        if collection is None:
+            raise ValueError(f"Collection not found: {args.collection}")
+        names += [obj.name for obj in collection.all_objects if obj.type == 'MESH']
+
+    # Without a selection, bake the list saved in the file, with its bake set rules
+    if not names:
+        if scene.lightmap_baker_rules:
+            lightmap_baker.apply_bake_set_rules(scene)
+        return [item.objects_list for item in scene.lightmap_baker_objects]
+
+    missing_objects = [name for name in names if bpy.data.objects.get(name) is None]
+    if missing_objects:
+        raise ValueError(f"Objects not found: {', '.join(missing_objects)}")
+
+    scene.lightmap_baker_objects.clear()
+    for name in dict.fromkeys(names):
+        lightmap_baker.add_list_item(scene, bpy.data.objects[name])
+
+    return [item.objects_list for item in scene.lightmap_baker_objects]
+
+# Same loop as the bake scheduler, one blocking Cycles bake per object (or batch)
+def bake_batches(context, objects_to_bake):
+    properties = context.scene.lightmap_baker_properties
+    timings = []
+
+    while True:
+        if properties.objects_index >= len(objects_to_bake):
+            # Bake the objects again with other seeds or more samples
+            if lightmap_baker.start_next_adaptive_pass(context):
+                continue
+            # The next atlas gets its own lightmap
+            if lightmap_baker.start_next_atlas(context):
+                continue
+            break
+
+        objects, batch_count = lightmap_baker.get_bake_batch(context)
+        properties.bake_batch_count = batch_count
+
+        if objects:
+            time_start = time.perf_counter()
+            lightmap_baker.bake_diffuse(context, objects, execution_context='EXEC_DEFAULT')
+            bake_time = time.perf_counter() - time_start
+
+            profiler.record("bake_diffuse", time_start, time_start + bake_time,
+                            **lightmap_baker.get_span_args(context, [obj.name for obj in objects]))
+
+            lightmap_baker.record_bake_time(context, bake_time)
+            lightmap_baker.record_journal_entries(context)
+
+            for obj in objects:
+                timings.append({"object": obj.name, "time": bake_time / len(objects), "samples": context.scene.cycles.samples})
+
+        properties.objects_index += batch_count
+
+    return timings
+
+def bake_objects(context, objects_to_bake, raw_output=None):
+    properties = context.scene.lightmap_baker_properties
+
+    lightmap_baker.prepare_bake(context, objects_to_bake)
+
+    if properties.bake_mode == 'TILED':
+        return bake_tiles(context, objects_to_bake)
+
+    timings = bake_batches(context, objects_to_bake)
+
+    time_start = time.perf_counter()
+    image = bpy.data.images[properties.lightmap_name]
+
+    # Parallel workers hand their buffer over to the coordinator
+    if raw_output:
+        np.save(raw_output, postprocess.read_pixels(image))
+    else:
+        lightmap_baker.finalize_lightmap(context)
+
+    finalize_time = time.perf_counter() - time_start
+
+    lightmap_baker.calculate_elapsed_time()
+    lightmap_baker.record_peak_memory(context)
+    lightmap_baker.clear_bake_journals(context)
+    lightmap_baker.restore_progressive_seed(context)
+    lightmap_baker.restore_atlas_settings(context)
+
+    return timings, finalize_time
+
+# One blocking Cycles bake per tile, each tile is written to disk once baked
+def bake_tiles(context, objects_to_bake):
+    timings = []
+
+    lightmap_baker.start_tiled_bake(context, objects_to_bake)
+
+    while True:
+        time_start = time.perf_counter()
+        if not lightmap_baker.bake_next_tile(context, execution_context='EXEC_DEFAULT'):
+            break
+        bake_time = time.perf_counter() - time_start
+
+        tile, tile_objects = lightmap_baker.tiled_bake_job.jobs[lightmap_baker.tiled_bake_job.index]
+        profiler.record("bake_diffuse", time_start, time_start + bake_time, **lightmap_baker.get_span_args(context, tile_objects))
+        timings.append({"tile": list(tile), "objects": tile_objects, "time": bake_time})
+
+        lightmap_baker.finish_tile(context)
+
+    # The peak memory is recorded before the lightmap is loaded back
+    time_start = time.perf_counter()
+    lightmap_baker.finalize_lightmap(context)
+    finalize_time = time.perf_counter() - time_start
+
+    lightmap_baker.calculate_elapsed_time()
+
+    return timings, finalize_time
+
+# Split the objects across background Blender processes and merge their buffers
+def bake_objects_parallel(context, objects_to_bake, worker_count, threads_per_worker=0):
+    properties = context.scene.lightmap_baker_properties
+
+    lightmap_baker.prepare_bake(context, objects_to_bake)
+
+    # Unchanged objects were already copied from the previous bake
+    objects_to_bake = [item.objects_list for item in context.scene.lightmap_baker_objects if not item.bake_skip]
+
+    job = parallel.ParallelBake(objects_to_bake, worker_count, threads_per_worker)
+    job.start()
+    job.wait()
+    profiler.record("parallel_bake", job.time_start, time.perf_counter(), workers=len(job.subsets),
+                    **lightmap_baker.get_span_args(context))
+
+    failed_workers = []
+    try:
+        failed_workers = job.failed_workers()
+        if failed_workers:
+            raise RuntimeError(f"Workers failed, see the logs in {job.directory}: {failed_workers}")
+
+        timings = job.get_timings()
+        lightmap_baker.record_worker_timings(context, timings)
+
+        time_start = time.perf_counter()
+        with profiler.span("merge_buffers", **lightmap_baker.get_span_args(context)):
+            job.merge(context, bpy.data.images[properties.lightmap_name])
+        lightmap_baker.finalize_lightmap(context)
+        finalize_time = time.perf_counter() - time_start
+    finally:
+        if not failed_workers:
+            job.cleanup()
+
+    lightmap_baker.calculate_elapsed_time()
+    lightmap_baker.record_peak_memory(context)
+
+    return timings, finalize_time
+
+# Split the objects in jobs of a shared queue, baked by any worker watching it, and merge their results
+def bake_objects_queue(context, objects_to_bake, args):
+    properties = context.scene.lightmap_baker_properties
+
+    lightmap_baker.prepare_bake(context, objects_to_bake)
+
+    # Unchanged objects were already copied from the previous bake
+    objects_to_bake = [item.objects_list for item in context.scene.lightmap_baker_objects if not item.bake_skip]
+
+    job = parallel.QueueBake(args.queue, objects_to_bake, jobqueue.get_settings(properties), args.queue_job_size,
+                             args.queue_local_workers, args.threads or 0, args.queue_timeout)
+    job.start()
+    job.wait()
+    profiler.record("queue_bake", job.time_start, time.perf_counter(), jobs=len(job.subsets),
+                    **lightmap_baker.get_span_args(context))
+
+    failed_jobs = job.failed_jobs()
+    if failed_jobs:
+        job.terminate()
+        raise RuntimeError(f"Jobs failed, see the logs in {os.path.join(args.queue, 'logs')}: {'; '.join(failed_jobs)}")
+
+    try:
+        timings = job.get_timings()
+        lightmap_baker.record_worker_timings(context, timings)
+
+        time_start = time.perf_counter()
+        with profiler.span("merge_buffers", **lightmap_baker.get_span_args(context)):
+            job.merge(bpy.data.images[properties.lightmap_name])
+        lightmap_baker.finalize_lightmap(context)
+        finalize_time = time.perf_counter() - time_start
+    finally:
+        job.cleanup()
+
+    lightmap_baker.calculate_elapsed_time()
+    lightmap_baker.record_peak_memory(context)
+
+    return timings, finalize_time
+
+# Bake the jobs of a queue one after the other, until nothing is left to claim
+def run_queue_worker(args):
+    job_queue = jobqueue.JobQueue(args.queue_worker, args.queue_timeout)
+    idle_start = time.perf_counter()
+    summary = {"status": "FINISHED", "jobs": [], "failed_jobs": [], "reclaimed_jobs": []}
+
+    while True:
+        job = job_queue.claim()
+
+        if job is None:
+            # Claims of other workers may still go stale and come back
+            if not job_queue.list_jobs("claimed") and time.perf_counter() - idle_start >= args.queue_idle:
+                break
+            time.sleep(jobqueue.POLL_INTERVAL)
+            continue
+
+        print(f"Baking job {job['job']}, {len(job['objects'])} objects")
+
+        try:
+            if bake_queue_job(job_queue, job, args):
+                summary["jobs"].append(job["job"])
+            else:
+                print(f"Job {job['job']} was reclaimed, its result is dropped")
+                summary["reclaimed_jobs"].append(job["job"])
+        except (RuntimeError, ValueError, KeyError, OSError) as error:
+            if job_queue.fail(job, str(error)):
+                summary["failed_jobs"].append(job["job"])
+            else:
+                summary["reclaimed_jobs"].append(job["job"])
+
+        idle_start = time.perf_counter()
+
+    write_summary(summary, args)
+    return EXIT_SUCCESS
+
+def bake_queue_job(job_queue, job, args):
+    # Jobs of the same bake share the scene, it is only opened once
+    blend_path = job_queue.get_blend_path(job)
+    if os.path.normpath(bpy.data.filepath) != os.path.normpath(blend_path):
+        bpy.ops.wm.open_mainfile(filepath=blend_path)
+        ensure_registered()
+
+    context = bpy.context
+    scene = context.scene
+    properties = scene.lightmap_baker_properties
+
+    jobqueue.apply_settings(properties, job["settings"])
+
+    # Workers bake exactly the objects of the job, into one lightmap
+    properties.bake_mode = 'OBJECT'
+    properties.use_udim = False
+    properties.use_atlas_planner = False
+    properties.incremental_bake = False
+    properties.use_bake_cache = False
+    properties.use_bake_journal = False
+    properties.check_lightmap_uvs = False
+    properties.lightmap_report = False
+    scene.render.engine = 'CYCLES'
+    if args.threads:
+        scene.render.threads_mode = 'FIXED'
+        scene.render.threads = args.threads
+
+    scene.lightmap_baker_objects.clear()
+    for obj_name in job["objects"]:
+        lightmap_baker.add_list_item(scene, bpy.data.objects[obj_name])
+
+    with job_queue.keep_alive(job):
+        lightmap_baker.prepare_bake(context, job["objects"])
+        timings = bake_batches(context, job["objects"])
+
+        image = bpy.data.images[properties.lightmap_name]
+        tiles = parallel.extract_object_tiles(context, image, job["objects"])
+
+    # False when the job was reclaimed while baking, another worker bakes it
+    return job_queue.complete(job, tiles, timings)
+
+# Bake once per margin mode and compare the lightmaps, covered texels and margins apart
+def compare_margin_modes(context, objects_to_bake):
+    properties = context.scene.lightmap_baker_properties
+
+    # Both bakes start from a clean lightmap
+    properties.incremental_bake = False
+    properties.use_bake_cache = False
+
+    lightmaps = {}
+    comparison = {}
+    for margin_mode in ('CYCLES', 'JUMP_FLOOD'):
+        properties.margin_mode = margin_mode
+
+        time_start = time.perf_counter()
+        bake_objects(context, objects_to_bake)
+        comparison[f"{margin_mode.lower()}_time"] = time.perf_counter() - time_start
+
+        lightmaps[margin_mode] = postprocess.read_pixels(bpy.data.images[properties.lightmap_name])
+
+    height, width = lightmaps['CYCLES'].shape[:2]
+    objects = [bpy.data.objects[obj_name] for obj_name in objects_to_bake]
+    covered = coverage.objects_coverage(objects, width, height, context.evaluated_depsgraph_get())
+    margin = coverage.dilate_mask(covered, properties.bake_margin) & ~covered
+
+    difference = np.abs(lightmaps['CYCLES'] - lightmaps['JUMP_FLOOD'])[..., :3].max(axis=2)
+    for name, texels in (("covered", covered), ("margin", margin)):
+        comparison[f"{name}_texels"] = int(texels.sum())
+        comparison[f"{name}_mean_difference"] = float(difference[texels].mean()) if texels.any() else 0.0
+        comparison[f"{name}_max_difference"] = float(difference[texels].max()) if texels.any() else 0.0
+
+    return comparison
+
+def write_summary(summary, args):
+    text = json.dumps(summary, indent=2)
+    print(text)
+
+    if args.summary:
+        with open(args.summary, 'w') as summary_file:
+            summary_file.write(text)
+
+def main(argv=None):
+    args = parse_args(sys.argv if argv is None else argv)
+    summary = {"status": "FAILED", "objects": []}
+
+    profiler.reset()
+    time_start = time.perf_counter()
+
+    # Queue workers take their scene, objects and settings from the jobs
+    if args.queue_worker:
+        ensure_registered()
+        return run_queue_worker(args)
+
+    try:
+        if args.blend:
+            bpy.ops.wm.open_mainfile(filepath=args.blend)
+
+        ensure_registered()
+
+        context = bpy.context
+        scene = context.scene
+        apply_settings(scene, args)
+        objects_to_bake = resolve_objects(scene, args)
+    except (ValueError, RuntimeError) as error:
+        summary["error"] = str(error)
+        write_summary(summary, args)
+        return EXIT_INVALID_INPUT
+    except Exception as error:
+        traceback.print_exc()
+        summary["error"] = f"{type(error).__name__}: {error}"
+        write_summary(summary, args)
+        return EXIT_BAKE_FAILED
+
+    properties = scene.lightmap_baker_properties
+    summary["resolution"] = int(properties.lightmap_resolution)
+    summary["samples"] = properties.sample_count
+    summary["margin"] = properties.bake_margin
+    summary["margin_mode"] = properties.margin_mode
+
+    if not objects_to_bake:
+        summary["error"] = "Nothing to Bake :("
+        write_summary(summary, args)
+        return EXIT_INVALID_INPUT
+
+    # Same checks as the Bake button, every problem is reported at once
+    problems = lightmap_baker.find_bake_problems(context)
+    problems.update((message, []) for message in lightmap_baker.find_settings_problems(context, args.workers, args.queue))
+    if problems:
+        summary["error"] = "; ".join(f"{message}: {', '.join(names)}" if names else message for message, names in problems.items())
+        summary["problems"] = problems
+        write_summary(summary, args)
+        return EXIT_INVALID_INPUT
+
+    profiler.record("preflight", time_start, time.perf_counter(), **lightmap_baker.get_span_args(context))
+
+    if args.benchmark_workers:
+        worker_counts = [int(worker_count) for worker_count in args.benchmark_workers.split(',')]
+        summary["status"] = "FINISHED"
+        summary["scaling"] = parallel.benchmark_scaling(objects_to_bake, worker_counts, args.threads or 0)
+        write_summary(summary, args)
+        return EXIT_SUCCESS
+
+    if args.compare_margin:
+        summary["status"] = "FINISHED"
+        summary["margin_comparison"] = compare_margin_modes(context, objects_to_bake)
+        write_summary(summary, args)
+        return EXIT_SUCCESS
+
+    try:
+        if args.workers:
+            timings, finalize_time = bake_objects_parallel(context, objects_to_bake, args.workers, args.threads or 0)
+        elif args.queue:
+            timings, finalize_time = bake_objects_queue(context, objects_to_bake, args)
+        else:
+            timings, finalize_time = bake_objects(context, objects_to_bake, args.raw_output)
+    except Exception as error:
+        # Any error of the bake fails it, the summary and exit code still go out
+        traceback.print_exc()
+        summary["error"] = str(error) if isinstance(error, RuntimeError) else f"{type(error).__name__}: {error}"
+        write_summary(summary, args)
+        return EXIT_BAKE_FAILED
+
+    summary["status"] = "FINISHED"
+    summary["objects"] = timings
+    summary["skipped_objects"] = properties.skipped_objects
+    summary["skipped_time"] = properties.skipped_time
+    summary["cache_hits"] = properties.cache_hits if properties.use_bake_cache else 0
+    summary["finalize_time"] = finalize_time
+    summary["total_time"] = properties.elapsed_time
+    # None when the platform doesn't report it
+    summary["peak_memory"] = properties.peak_memory or None
+    summary["atlases"] = properties.atlas_count
+    if properties.lightmap_report and lightmap_baker.lightmap_report:
+        summary["utilization"] = properties.lightmap_utilization
+        summary["suggested_resolution"] = properties.suggested_resolution
+        summary["density_outliers"] = properties.density_outliers
+    if properties.adaptive_sampling and lightmap_baker.sampling_report:
+        summary["refined_objects"] = properties.adaptive_refined_objects
+        summary["adaptive_time_saved"] = properties.adaptive_time_saved
+    if properties.progressive_bake:
+        summary["accumulated_samples"] = properties.accumulated_samples
+    if len(lightmap_baker.atlas_plan) > 1:
+        # One lightmap per atlas, next to the base lightmap
+        directory = os.path.dirname(lightmap_baker.get_img_filpath())
+        summary["lightmap"] = [{"name": lightmap_name, "path": os.path.join(directory, f"{lightmap_name}.exr"), "resolution": resolution, "objects": names}
+                               for lightmap_name, (resolution, names) in zip(lightmap_baker.get_atlas_lightmap_names(context), lightmap_baker.atlas_plan)]
+    else:
+        summary["lightmap"] = args.raw_output or (lightmap_baker.get_udim_filpath() if properties.use_udim else lightmap_baker.get_img_filpath())
+    summary["stages"] = [{"stage": stage, "time": total_time, "count": count} for stage, total_time, count in profiler.get_summary()]
+    write_summary(summary, args)
+
+    if args.trace:
+        profiler.write_trace(args.trace)
+
+    return EXIT_SUCCESS
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import math
+
+import numpy as np
+
+# Lightmap UV coverage
+# Rasterizes the lightmap UV triangles of the objects with NumPy, to know which
+# texels of the lightmap belong to which object.
+
+# Candidate texels tested at once, bounds the temporary buffers
+MAX_CANDIDATES = 1 << 22
+
+def get_lightmap_uv_triangles(obj, depsgraph):
+    # The bake sees the evaluated mesh, modifiers included
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+
+    try:
+        mesh.calc_loop_triangles()
+
+        loops = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("loops", loops)
+
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        mesh.uv_layers[1].data.foreach_get("uv", uvs)
+    finally:
+        obj_eval.to_mesh_clear()
+
+    return uvs.reshape(-1, 2)[loops].reshape(-1, 3, 2)
+
+def get_triangle_tiles(triangles):
+    # A triangle belongs to the tile its center falls in, UDIM rows hold ten tiles
+    return np.floor(triangles.mean(axis=1)).astype(np.int64)
+
+def in_tile_range(tile_coordinates):
+    # Tiles left of 1001, below it or past the tenth column have no UDIM number
+    return (tile_coordinates[:, 0] >= 0) & (tile_coordinates[:, 0] < 10) & (tile_coordinates[:, 1] >= 0)
+
+def rasterize_chunk(points, top_left, lower, upper, offsets_x, offsets_y, width):
+    # Texel centers of the bounding boxes
+    texels_x = lower[:, 0, None] + offsets_x
+    texels_y = lower[:, 1, None] + offsets_y
+
+    inside = (texels_x <= upper[:, 0, None]) & (texels_y <= upper[:, 1, None])
+
+    for edge in range(3):
+        start = points[:, edge]
+        end = points[:, (edge + 1) % 3]
+
+        # Both triangles sharing an edge walk it in the same direction, so the
+        # rounding of the test is the same on both sides
+        reverse = (start[:, 1] > end[:, 1]) | ((start[:, 1] == end[:, 1]) & (start[:, 0] > end[:, 0]))
+        start, end = np.where(reverse[:, None], end, start), np.where(reverse[:, None], start, end)
+
+        edge_x = (end[:, 0] - start[:, 0])[:, None]
+        edge_y = (end[:, 1] - start[:, 1])[:, None]
+        side = edge_x * (texels_y - start[:, 1, None]) - edge_y * (texels_x - start[:, 0, None])
+        side = np.where(reverse[:, None], -side, side)
+
+        # Texels exactly on an edge only belong to one of the two triangles sharing it
+        inside &= (side > 0) | ((side == 0) & top_left[:, edge, None])
+
+    hits, candidates = np.nonzero(inside)
+    return hits, (texels_y * width + texels_x)[hits, candidates]
+
+def iterate_texels(triangles, width, height):
+    # Yields (triangle indices, texel indices) of the covered texels, chunk by chunk
+    points = triangles.reshape(-1, 3, 2).astype(np.float64) * (width, height) - 0.5
+
+    # Counter clockwise winding, degenerate triangles cover nothing
+    first = points[:, 1] - points[:, 0]
+    second = points[:, 2] - points[:, 0]
+    area = first[:, 0] * second[:, 1] - first[:, 1] * second[:, 0]
+    flipped = area < 0
+    points[flipped] = points[flipped][:, [0, 2, 1]]
+    kept = np.flatnonzero(area != 0)
+    points = points[kept]
+
+    edges = np.roll(points, -1, axis=1) - points
+    top_left = (edges[..., 1] < 0) | ((edges[..., 1] == 0) & (edges[..., 0] < 0))
+
+    lower = np.maximum(np.ceil(points.min(axis=1)), 0).astype(np.int64)
+    upper = np.minimum(np.floor(points.max(axis=1)), (width - 1, height - 1)).astype(np.int64)
+
+    visible = np.flatnonzero((upper >= lower).all(axis=1))
+    extent = upper[visible] - lower[visible] + 1
+
+    # Split the largest triangles in bands of rows, so no candidate grid gets too big
+    band_height = np.maximum(1, MAX_CANDIDATES // extent[:, 0])
+    bands = -(-extent[:, 1] // band_height)
+    item = np.repeat(np.arange(len(visible)), bands)
+    band = np.arange(len(item)) - np.repeat(np.cumsum(bands) - bands, bands)
+
+    item_lower = lower[visible][item]
+    item_upper = upper[visible][item]
+    item_lower[:, 1] += band * band_height[item]
+    item_upper[:, 1] = np.minimum(item_upper[:, 1], item_lower[:, 1] + band_height[item] - 1)
+    item = visible[item]
+
+    # Group by power of two extents, so the candidate grids stay tight
+    bucket = np.ceil(np.log2(item_upper - item_lower + 1)).astype(np.int64)
+    keys = bucket[:, 0] * 64 + bucket[:, 1]
+
+    for key in np.unique(keys):
+        members = np.flatnonzero(keys == key)
+        grid_width, grid_height = 1 << int(key // 64), 1 << int(key % 64)
+        offsets_y, offsets_x = np.divmod(np.arange(grid_width * grid_height), grid_width)
+        chunk = max(1, MAX_CANDIDATES // (grid_width * grid_height))
+
+        for start in range(0, len(members), chunk):
+            chunk_members = members[start:start + chunk]
+            triangle = item[chunk_members]
+
+            hits, texels = rasterize_chunk(points[triangle], top_left[triangle], item_lower[chunk_members],
+                                           item_upper[chunk_members], offsets_x, offsets_y, width)
+
+            yield kept[triangle[hits]], texels
+
+def rasterize_triangles(triangles, width, height, counts=False):
+    # Returns a (height, width) mask of the covered texels, or the number of
+    # triangles covering each texel when counts is set
+    coverage = np.zeros(width * height, dtype=np.int32 if counts else bool)
+
+    for _, texels in iterate_texels(triangles, width, height):
+        if counts:
+            coverage += np.bincount(texels, minlength=coverage.size).astype(np.int32)
+        else:
+            coverage[texels] = True
+
+    return coverage.reshape(height, width)
+
+def get_region_bounds(triangles, width, height, margin=0):
+    # Texels (left, top, right, bottom) around the triangles grown by margin, None when empty
+    if not len(triangles):
+        return None
+
+    points = triangles.reshape(-1, 2).astype(np.float64) * (width, height) - 0.5
+    left, top = np.maximum(np.floor(points.min(axis=0)).astype(np.int64) - margin, 0)
+    right, bottom = np.minimum(np.ceil(points.max(axis=0)).astype(np.int64) + margin + 1, (width, height))
+
+    if left >= right or top >= bottom:
+        return None
+
+    return int(left), int(top), int(right), int(bottom)
+
+def rasterize_region(triangles, width, height, margin=0):
+    # Covered texels in a mask the size of the bounding box of the triangles
+    # grown by margin, instead of the whole lightmap: (x, y, mask), None when
+    # nothing is covered
+    bounds = get_region_bounds(triangles, width, height, margin)
+    if bounds is None:
+        return None
+
+    left, top, right, bottom = bounds
+    mask = np.zeros((bottom - top, right - left), dtype=bool)
+
+    for _, texels in iterate_texels(triangles, width, height):
+        rows, columns = np.divmod(texels, width)
+        mask[rows - top, columns - left] = True
+
+    if not mask.any():
+        return None
+
+    return left, top, mask
+
+def object_region(obj, width, height, depsgraph, margin=0):
+    # (x, y, covered, mask) of the object, mask being covered grown by margin,
+    # both the size of the UV region of the object. None when nothing is covered
+    region = rasterize_region(get_lightmap_uv_triangles(obj, depsgraph), width, height, margin)
+    if region is None:
+        return None
+
+    x, y, covered = region
+    return x, y, covered, dilate_mask(covered, margin)
+
+def object_coverage(obj, width, height, depsgraph):
+    return rasterize_triangles(get_lightmap_uv_triangles(obj, depsgraph), width, height)
+
+def objects_coverage(objects, width, height, depsgraph):
+    # All the triangles are rasterized in one go
+    triangles = [get_lightmap_uv_triangles(obj, depsgraph) for obj in objects]
+    if not triangles:
+        return np.zeros((height, width), dtype=bool)
+
+    return rasterize_triangles(np.concatenate(triangles), width, height)
+
+def dilate_mask(mask, radius):
+    # Grow the mask by radius texels, rows then columns
+    dilated = mask.copy()
+
+    for _ in range(radius):
+        grown = dilated.copy()
+        grown[1:] |= dilated[:-1]
+        grown[:-1] |= dilated[1:]
+        dilated = grown
+
+    for _ in range(radius):
+        grown = dilated.copy()
+        grown[:, 1:] |= dilated[:, :-1]
+        grown[:, :-1] |= dilated[:, 1:]
+        dilated = grown
+
+    return dilated
+
+def offset_slices(height, width, dy, dx):
+    # Texels [y, x] and their neighbours [y + dy, x + dx], inside of the image,
+    # empty when the offset is past the size of the image
+    target = (slice(max(0, -dy), max(0, height - max(0, dy))), slice(max(0, -dx), max(0, width - max(0, dx))))
+    source = (slice(max(0, dy), max(0, height + min(0, dy))), slice(max(0, dx), max(0, width + min(0, dx))))
+    return target, source
+
+def get_margin_distance(dy, dx):
+    # Square distance like the margin, the nearest texel by the usual distance
+    # among texels as far on the square
+    dy = dy.astype(np.int64)
+    dx = dx.astype(np.int64)
+    return (np.maximum(np.abs(dy), np.abs(dx)) << 32) + dy * dy + dx * dx
+
+def nearest_texels(mask, radius):
+    # Jump flood: the nearest covered texel of every texel within about radius,
+    # -1 where none was found. log2(radius) passes over the image, plus a last
+    # one pass fixing most of the approximations of the algorithm
+    height, width = mask.shape
+    rows = np.arange(height, dtype=np.int32)[:, None]
+    columns = np.arange(width, dtype=np.int32)[None, :]
+
+    seed_y = np.where(mask, rows, -1).astype(np.int32)
+    seed_x = np.where(mask, columns, -1).astype(np.int32)
+    distance = np.where(mask, 0, np.iinfo(np.int64).max).astype(np.int64)
+
+    steps = []
+    step = 1 << max(0, math.ceil(math.log2(max(radius, 1))))
+    while step >= 1:
+        steps.append(step)
+        step //= 2
+    steps.append(1)
+
+    for step in steps:
+        for dy in (-step, 0, step):
+            for dx in (-step, 0, step):
+                if not dy and not dx:
+                    continue
+
+                target, source = offset_slices(height, width, dy, dx)
+                candidate_y = seed_y[source]
+                candidate_x = seed_x[source]
+                candidate_distance = get_margin_distance(candidate_y - rows[target[0]], candidate_x - columns[:, target[1]])
+
+                closer = (candidate_y >= 0) & (candidate_distance < distance[target])
+                seed_y[target][closer] = candidate_y[closer]
+                seed_x[target][closer] = candidate_x[closer]
+                distance[target][closer] = candidate_distance[closer]
+
+    return seed_y, seed_x
+
+def fill_margin(pixels, mask, radius):
+    # Texels up to radius away from the mask (square, like the Cycles margin)
+    # take the color of the nearest covered texel
+    if radius < 1 or not mask.any():
+        return pixels
+
+    height, width = mask.shape
+    seed_y, seed_x = nearest_texels(mask, radius)
+
+    rows = np.arange(height)[:, None]
+    columns = np.arange(width)[None, :]
+    margin = ~mask & (seed_y >= 0) & (np.maximum(np.abs(seed_y - rows), np.abs(seed_x - columns)) <= radius)
+
+    pixels[margin] = pixels[seed_y[margin], seed_x[margin]]
+    return pixels
@@ -0,0 +1,181 @@
+import hashlib
+import numpy as np
+
+# Bake fingerprints
+# A hash of everything that lights an object: its evaluated mesh, lightmap UVs,
+# world matrix and materials, plus the lights, emitters and world of the scene.
+# An object whose fingerprint didn't change since the last bake doesn't need a new one.
+
+# Nodes added by the addon, they don't change the lighting
+ADDON_NODES = {"Bake_Texture_Node", "UVMap_Node"}
+
+# Node properties that only change how the node editor looks
+UI_PROPERTIES = {
+    "name", "label", "location", "width", "width_hidden", "height", "dimensions",
+    "select", "hide", "mute", "show_options", "show_preview", "show_texture",
+    "use_custom_color", "color", "parent", "bl_idname", "bl_label", "bl_description",
+    "bl_icon", "bl_static_type", "bl_width_default", "bl_width_min", "bl_width_max",
+    "bl_height_default", "bl_height_min", "bl_height_max", "type",
+}
+
+LIGHT_PROPERTIES = [
+    "type", "color", "energy", "shadow_soft_size", "use_shadow", "spot_size", "spot_blend",
+    "shape", "size", "size_y", "angle", "spread", "use_nodes",
+]
+
+def hash_value(hasher, value):
+    if isinstance(value, set):
+        value = sorted(value)
+    try:
+        value = tuple(value)
+    except TypeError:
+        pass
+    hasher.update(repr(value).encode())
+
+def hash_collection(hasher, collection, attribute, dtype, components=1):
+    values = np.empty(len(collection) * components, dtype=dtype)
+    collection.foreach_get(attribute, values)
+    hasher.update(values.tobytes())
+
+def hash_matrix(hasher, matrix):
+    hasher.update(np.array(matrix, dtype=np.float32).tobytes())
+
+def hash_node_tree(hasher, node_tree, visited=None):
+    if node_tree is None:
+        return
+
+    # Node groups can be shared by several nodes
+    visited = set() if visited is None else visited
+    if node_tree.name in visited:
+        return
+    visited.add(node_tree.name)
+
+    for node in sorted(node_tree.nodes, key=lambda node: node.name):
+        if node.name in ADDON_NODES:
+            continue
+
+        hasher.update(node.bl_idname.encode())
+
+        for prop in node.bl_rna.properties:
+            if prop.identifier in UI_PROPERTIES or prop.type not in {'BOOLEAN', 'INT', 'FLOAT', 'STRING', 'ENUM'}:
+                continue
+            hash_value(hasher, getattr(node, prop.identifier))
+
+        for socket in node.inputs:
+            if not socket.is_linked and hasattr(socket, "default_value"):
+                hash_value(hasher, socket.default_value)
+
+        image = getattr(node, "image", None)
+        if image:
+            hasher.update(image.name.encode())
+            hasher.update(image.filepath.encode())
+
+        hash_node_tree(hasher, getattr(node, "node_tree", None), visited)
+
+    for link in node_tree.links:
+        if link.from_node.name in ADDON_NODES or link.to_node.name in ADDON_NODES:
+            continue
+        hash_value(hasher, (link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier))
+
+def hash_material(hasher, material):
+    if material is None:
+        hasher.update(b"None")
+        return
+
+    hasher.update(material.name.encode())
+    hash_value(hasher, material.diffuse_color)
+    if material.use_nodes:
+        hash_node_tree(hasher, material.node_tree)
+
+def is_emissive(material):
+    if material is None or not material.use_nodes:
+        return False
+
+    for node in material.node_tree.nodes:
+        if node.type == 'EMISSION':
+            return True
+
+        strength = node.inputs.get("Emission Strength")
+        color = node.inputs.get("Emission Color") or node.inputs.get("Emission")
+        if strength and color and strength.default_value > 0.0 and any(color.default_value[:3]):
+            return True
+
+    return False
+
+def hash_mesh(hasher, obj, depsgraph):
+    # The bake sees the evaluated mesh, modifiers included
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+
+    try:
+        hash_collection(hasher, mesh.vertices, "co", np.float32, 3)
+        hash_collection(hasher, mesh.loops, "vertex_index", np.int32)
+        hash_collection(hasher, mesh.polygons, "loop_total", np.int32)
+        hash_collection(hasher, mesh.polygons, "material_index", np.int32)
+
+        if len(mesh.uv_layers) > 1:
+            hash_collection(hasher, mesh.uv_layers[1].data, "uv", np.float32, 2)
+    finally:
+        obj_eval.to_mesh_clear()
+
+# Everything lighting the scene, shared by every object
+def get_lighting_hash(scene, depsgraph):
+    hasher = hashlib.sha1()
+
+    if scene.world:
+        hash_value(hasher, scene.world.color)
+        if scene.world.use_nodes:
+            hash_node_tree(hasher, scene.world.node_tree)
+
+    for setting in ("max_bounces", "diffuse_bounces", "glossy_bounces", "transmission_bounces", "transparent_max_bounces"):
+        hash_value(hasher, getattr(scene.cycles, setting))
+
+    for obj in sorted(scene.objects, key=lambda obj: obj.name):
+        if not obj.visible_get():
+            continue
+
+        if obj.type == 'LIGHT':
+            hasher.update(obj.name.encode())
+            hash_matrix(hasher, obj.matrix_world)
+            for setting in LIGHT_PROPERTIES:
+                hash_value(hasher, getattr(obj.data, setting, None))
+            if obj.data.use_nodes:
+                hash_node_tree(hasher, obj.data.node_tree)
+
+        # Emissive meshes light their surroundings too
+        elif obj.type == 'MESH' and any(is_emissive(slot.material) for slot in obj.material_slots):
+            hasher.update(obj.name.encode())
+            hash_matrix(hasher, obj.matrix_world)
+            hash_mesh(hasher, obj, depsgraph)
+            for slot in obj.material_slots:
+                hash_material(hasher, slot.material)
+
+    return hasher.hexdigest()
+
+def get_object_fingerprint(obj, depsgraph, lighting_hash):
+    hasher = hashlib.sha1(lighting_hash.encode())
+
+    hash_mesh(hasher, obj, depsgraph)
+    hash_matrix(hasher, obj.matrix_world)
+
+    for slot in obj.material_slots:
+        hash_material(hasher, slot.material)
+
+    return hasher.hexdigest()
+
+# Bake settings changing the baked pixels
+def get_settings_hash(properties):
+    settings = (properties.sample_count, properties.bake_margin, properties.lightmap_resolution,
+                properties.render_device, properties.margin_mode)
+
+    # Hashes of uniform bakes stay the same
+    if properties.adaptive_sampling:
+        settings += (properties.adaptive_initial_samples, properties.noise_threshold)
+
+    return hashlib.sha1(repr(settings).encode()).hexdigest()
+
+# Inputs of an accumulated lightmap, runs with any sample count add up
+def get_accumulation_hash(properties, object_fingerprints):
+    settings = (properties.bake_margin, properties.lightmap_resolution, properties.render_device,
+                properties.margin_mode, tuple(sorted(object_fingerprints)))
+    return hashlib.sha1(repr(settings).encode()).hexdigest()
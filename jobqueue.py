@@ -0,0 +1,238 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+# Job queue
+# A bake is split in jobs of a few objects, written as JSON manifests in a
+# shared directory. Worker processes, on this machine or on any machine
+# mounting the directory, claim a job by moving its manifest from pending/ to
+# claimed/ under a name of its own (a rename, atomic on one file system), bake
+# its objects and drop their coverage masked pixels in results/. While baking,
+# a worker touches its claim as a heartbeat, and a claim whose modification
+# time didn't change for a while belongs to a dead worker and goes back to
+# pending/. A worker only writes the outcome of a job after taking its claim
+# back with another rename, so a job reclaimed in the meantime is never
+# completed twice. The coordinator, in parallel.py, merges the results into
+# the lightmap and post processes it once.
+
+STATES = ("pending", "claimed", "done", "failed")
+
+# Seconds between two looks at the queue
+POLL_INTERVAL = 1.0
+
+# Heartbeats written by a worker within the timeout of its claim
+HEARTBEATS_PER_TIMEOUT = 4
+
+# Claims are named job id, separator, claim id. Released claims, whose outcome
+# is being written, get the suffix.
+CLAIM_SEPARATOR = "@"
+RELEASED = "_released"
+
+# Settings of the coordinator the workers bake with
+JOB_SETTINGS = ("lightmap_name", "lightmap_resolution", "sample_count", "bake_margin", "margin_mode", "render_device")
+
+def get_settings(properties):
+    return {setting: getattr(properties, setting) for setting in JOB_SETTINGS}
+
+def apply_settings(properties, settings):
+    for setting, value in settings.items():
+        setattr(properties, setting, value)
+
+class JobQueue:
+    def __init__(self, directory, timeout=600.0):
+        self.directory = directory
+        self.timeout = timeout
+
+        for folder in STATES + ("results", "blends", "logs"):
+            os.makedirs(os.path.join(directory, folder), exist_ok=True)
+
+        # Claim name: (last modification time of the claim, time of this process it changed)
+        self.heartbeats = {}
+
+    def get_path(self, state, job_id):
+        return os.path.join(self.directory, state, job_id + ".json")
+
+    def write_json(self, path, data):
+        # Write aside and move in place, other processes never read a partial file
+        file_descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(file_descriptor, 'w') as json_file:
+            json.dump(data, json_file)
+        os.replace(temporary_path, path)
+
+    def read_json(self, path):
+        with open(path) as json_file:
+            return json.load(json_file)
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def list_files(self, state, bake_id=None):
+        # Names of the files of a state, claims hold their claim id
+        names = sorted(file_name[:-5] for file_name in os.listdir(os.path.join(self.directory, state)) if file_name.endswith(".json"))
+        if bake_id:
+            names = [name for name in names if name.startswith(bake_id + "_")]
+        return names
+
+    def list_jobs(self, state, bake_id=None):
+        return [name.split(CLAIM_SEPARATOR)[0] for name in self.list_files(state, bake_id)]
+
+    def get_claim_path(self, job, suffix=""):
+        return self.get_path("claimed", f"{job['job']}{CLAIM_SEPARATOR}{job['claim']}{suffix}")
+
+    def submit(self, job):
+        self.write_json(self.get_path("pending", job["job"]), job)
+
+    def reclaim_stale(self):
+        # Heartbeats are set with the clock of the worker, possibly on another
+        # machine. They are only compared with each other, the time since the
+        # last change is measured with the clock of this process.
+        now = time.monotonic()
+        claims = self.list_files("claimed")
+
+        for claim in claims:
+            claimed_path = self.get_path("claimed", claim)
+            try:
+                heartbeat = os.stat(claimed_path).st_mtime_ns
+            except OSError:
+                # Finished or reclaimed in the meantime
+                continue
+
+            last_heartbeat = self.heartbeats.get(claim)
+            if last_heartbeat is None or last_heartbeat[0] != heartbeat:
+                self.heartbeats[claim] = (heartbeat, now)
+                continue
+
+            if now - last_heartbeat[1] > self.timeout:
+                job_id = claim.split(CLAIM_SEPARATOR)[0]
+                try:
+                    os.rename(claimed_path, self.get_path("pending", job_id))
+                    print(f"Reclaimed stale job {job_id}")
+                except OSError:
+                    pass
+
+        for claim in set(self.heartbeats) - set(claims):
+            del self.heartbeats[claim]
+
+    def claim(self):
+        # The next pending job, None when there is nothing left to claim
+        self.reclaim_stale()
+
+        for job_id in self.list_jobs("pending"):
+            # Only this worker knows the name of its claim
+            job = {"job": job_id, "claim": uuid.uuid4().hex}
+            try:
+                os.rename(self.get_path("pending", job_id), self.get_claim_path(job))
+            except OSError:
+                # Another worker was faster
+                continue
+
+            job = dict(self.read_json(self.get_claim_path(job)), claim=job["claim"])
+            self.heartbeat(job)
+            return job
+
+        return None
+
+    def heartbeat(self, job):
+        # Touch the claim, False once it was reclaimed. A reclaimed claim was
+        # renamed, it is never created again under its old name.
+        heartbeat = time.time_ns()
+        try:
+            os.utime(self.get_claim_path(job), ns=(heartbeat, heartbeat))
+        except OSError:
+            return False
+        return True
+
+    def release(self, job):
+        # Take the claim back from the queue, None when it was reclaimed: the
+        # job belongs to whoever claims it next. A released claim is still
+        # reclaimed if the worker dies before writing the outcome of the job.
+        released_path = self.get_claim_path(job, RELEASED)
+        try:
+            os.rename(self.get_claim_path(job), released_path)
+        except OSError:
+            return None
+        return released_path
+
+    @contextmanager
+    def keep_alive(self, job):
+        # Heartbeats from a thread while the job is baked, a single Cycles
+        # bake can last longer than the timeout
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.timeout / HEARTBEATS_PER_TIMEOUT):
+                if not self.heartbeat(job):
+                    print(f"Job {job['job']} was reclaimed")
+                    break
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def get_blend_path(self, job):
+        return os.path.join(self.directory, job["blend"])
+
+    def get_result_path(self, job_id):
+        return os.path.join(self.directory, "results", job_id + ".npz")
+
+    def complete(self, job, tiles, timings):
+        # tiles: list of (x, y, mask, covered, pixels) per object
+        # False when the job was reclaimed, its tiles are dropped
+        released_path = self.release(job)
+        if released_path is None:
+            return False
+
+        arrays = {}
+        for index, (x, y, mask, covered, pixels) in enumerate(tiles):
+            arrays[f"origin_{index}"] = np.array([x, y])
+            arrays[f"mask_{index}"] = mask
+            arrays[f"covered_{index}"] = covered
+            arrays[f"pixels_{index}"] = np.where(mask[..., None], pixels, 0.0).astype(np.float16)
+
+        result_path = self.get_result_path(job["job"])
+        file_descriptor, temporary_path = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(result_path))
+        with os.fdopen(file_descriptor, 'wb') as result_file:
+            np.savez_compressed(result_file, **arrays)
+        os.replace(temporary_path, result_path)
+
+        self.write_json(self.get_path("done", job["job"]), dict(job, timings=timings, tiles=len(tiles)))
+        self.remove(released_path)
+        return True
+
+    def fail(self, job, error):
+        released_path = self.release(job)
+        if released_path is None:
+            return False
+
+        self.write_json(self.get_path("failed", job["job"]), dict(job, error=error))
+        self.remove(released_path)
+        return True
+
+    def load_result(self, job_id):
+        # Returns the (x, y, mask, covered, pixels) tiles of a done job
+        tile_count = self.read_json(self.get_path("done", job_id))["tiles"]
+
+        with np.load(self.get_result_path(job_id)) as result:
+            return [(int(result[f"origin_{index}"][0]), int(result[f"origin_{index}"][1]), result[f"mask_{index}"],
+                     result[f"covered_{index}"], result[f"pixels_{index}"].astype(np.float32)) for index in range(tile_count)]
+
+    def remove_bake(self, bake_id):
+        for state in STATES:
+            for name in self.list_files(state, bake_id):
+                self.remove(self.get_path(state, name))
+                self.remove(self.get_result_path(name.split(CLAIM_SEPARATOR)[0]))
+
+        self.remove(os.path.join(self.directory, "blends", bake_id + ".blend"))
@@ -0,0 +1,129 @@
+import io
+import json
+import os
+
+import numpy as np
+
+# Bake journal
+# Every object baked into a lightmap is appended to a journal next to the
+# lightmap: a JSON line naming the object, the settings hash and where its
+# pixels are, and its UV region as a compressed half float tile in a data
+# file, with the texels the object covers. The data is written and flushed
+# before the line, a line only exists once its pixels are on disk. After a
+# crash, the journal is replayed in order into a new lightmap and the
+# journaled objects aren't baked again.
+
+JOURNAL_EXTENSION = ".jsonl"
+DATA_EXTENSION = ".bin"
+
+class BakeJournal:
+    def __init__(self, path):
+        # path without extension, the journal and its data file share it
+        self.journal_path = path + JOURNAL_EXTENSION
+        self.data_path = path + DATA_EXTENSION
+
+    def exists(self):
+        return os.path.exists(self.journal_path)
+
+    def clear(self):
+        for path in (self.journal_path, self.data_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def append(self, obj_name, settings_hash, x, y, mask, covered, pixels, bake_time):
+        # Texels outside of the mask compress to nothing
+        pixels = np.where(mask[..., None], pixels, 0.0).astype(np.float16)
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, mask=mask, covered=covered, pixels=pixels)
+        data = buffer.getvalue()
+
+        with open(self.data_path, 'ab') as data_file:
+            offset = data_file.tell()
+            data_file.write(data)
+            data_file.flush()
+            os.fsync(data_file.fileno())
+
+        entry = {
+            "object": obj_name,
+            "settings": settings_hash,
+            "x": int(x),
+            "y": int(y),
+            "offset": offset,
+            "size": len(data),
+            "bake_time": bake_time,
+        }
+
+        with open(self.journal_path, 'a') as journal_file:
+            journal_file.write(json.dumps(entry) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+    def repair(self):
+        # Cut the journal after its last complete entry, and the data after
+        # the pixels of that entry. Entries appended when resuming would
+        # otherwise follow a line cut by the crash and be lost with it.
+        if not self.exists():
+            return
+
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        journal_size = 0
+        data_end = 0
+
+        with open(self.journal_path, 'rb') as journal_file:
+            for line in journal_file:
+                if not line.endswith(b"\n"):
+                    break
+
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+
+                if entry["offset"] + entry["size"] > data_size:
+                    break
+
+                journal_size += len(line)
+                data_end = max(data_end, entry["offset"] + entry["size"])
+
+        with open(self.journal_path, 'r+b') as journal_file:
+            journal_file.truncate(journal_size)
+
+        if data_size > data_end:
+            with open(self.data_path, 'r+b') as data_file:
+                data_file.truncate(data_end)
+
+    def get_entries(self, settings_hash):
+        # Entries written with the same settings, in order. A line cut by a
+        # crash, or pointing past the end of the data, ends the journal.
+        if not self.exists() or not os.path.exists(self.data_path):
+            return []
+
+        data_size = os.path.getsize(self.data_path)
+        entries = []
+
+        with open(self.journal_path) as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+
+                if entry["offset"] + entry["size"] > data_size:
+                    break
+
+                if entry["settings"] == settings_hash:
+                    entries.append(entry)
+
+        return entries
+
+    def load(self, entry):
+        # Returns (x, y, mask, covered, pixels)
+        with open(self.data_path, 'rb') as data_file:
+            data_file.seek(entry["offset"])
+            data = data_file.read(entry["size"])
+
+        with np.load(io.BytesIO(data)) as tile:
+            # Journals written before covered texels were stored
+            covered = tile["covered"] if "covered" in tile.files else tile["mask"]
+            return entry["x"], entry["y"], tile["mask"], covered, tile["pixels"].astype(np.float32)
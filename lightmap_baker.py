@@ -4,6 +4,8 @@ import ctypes
 import tempfile
 import os
 from bpy.app.handlers import persistent
+import numpy as np
+from . import accumulation, atlas, bakesets, cache, coverage, fingerprint, jobqueue, journal, parallel, postprocess, preflight, profiler, report, sampling, tiles, udim, uvcheck, uvpack
 
 # Reset variables in case blender ended in a bad baking state? yea it happend more than once :P
 @persistent
@@ -14,21 +16,52 @@ def on_file_opened(dummy):
     properties.bake_in_progress = False
     properties.cancel_bake = False
     properties.bake_progress = 0.0
+    properties.resume_bake = False
+    properties.refine_bake = False
+
+    preflight.reset()
+
+    for scene in bpy.data.scenes:
+        migrate_nodes_dictionary(scene)
+
 @persistent
 def on_post_bake(dummy):  
 
     property = bpy.context.scene.lightmap_baker_properties
-    # select the next object
+    # Ignore bakes that were not started by the addon
+    if not property.busy:
+        return
+
+    global idle_time_start
+    idle_time_start = time.perf_counter()
+
+    record_bake_time(bpy.context, idle_time_start - batch_time_start)
+    record_journal_entries(bpy.context)
+
+    start = property.objects_index
+    objects = [item.objects_list for item in bpy.context.scene.lightmap_baker_objects[start:start + property.bake_batch_count] if not item.bake_skip]
+    profiler.record("bake_diffuse", batch_time_start, idle_time_start, **get_span_args(bpy.context, objects))
+
+    # select the next object (or the next batch of objects)
     property.bake_in_progress = False
-    property.objects_index += 1
+    property.objects_index += property.bake_batch_count
+    update_bake_progress(bpy.context, property.objects_index)
 
-    pack_lightmap_texture()
+    # Dispatch the next bake right away instead of waiting for the next tick
+    start_bake_scheduler()
 
 @persistent
 def on_bake_cancel(dummy):
     context = bpy.context
     scene = context.scene
 
+    cancel_adaptive_bake(context)
+    restore_progressive_seed(context)
+    restore_atlas_settings(context)
+
+    # The journal stays, Resume Bake picks it up
+    scene.lightmap_baker_properties.resume_bake = False
+    scene.lightmap_baker_properties.refine_bake = False
     scene.lightmap_baker_properties.bake_in_progress = False
     scene.lightmap_baker_properties.cancel_bake = True
     scene.lightmap_baker_properties.elapsed_time = 0.0
@@ -51,39 +84,214 @@ def handle_bake_completion(context):
         # Freedom is real
         properties.busy = False
 
-        save_image()
-        apply_postprocess()
+        # Tiled bakes take their peak memory before loading the lightmap back
+        tiled_bake = tiled_bake_job is not None
+
+        finalize_lightmap(context)
         calculate_elapsed_time()
+        record_bake_mode_timing(context)
+        if not tiled_bake:
+            record_peak_memory(context)
+        clear_bake_journals(context)
+        restore_progressive_seed(context)
+        restore_atlas_settings(context)
+        properties.resume_bake = False
+        properties.refine_bake = False
+
+        if properties.profile_bake:
+            write_profile()
 
         # Automatic lightmap preview
-        objects_list = context.scene.lightmap_baker_objects
-        lightmap_preview_diffuse(context, objects_list)
+        lightmap_preview_diffuse(context)
 
         return {'FINISHED'}
 
 
+# Post process and save (or pack) the baked lightmap
+def finalize_lightmap(context):
+    properties = context.scene.lightmap_baker_properties
+
+    span_args = get_span_args(context)
+
+    if properties.use_udim:
+        with profiler.span("save_image", **span_args):
+            finalize_udim_lightmap(context)
+        return
+
+    # Tiles were post processed and written as they were baked
+    if tiled_bake_job:
+        with profiler.span("save_image", **span_args):
+            finalize_tiled_lightmap(context)
+        return
+
+    if properties.margin_mode == 'JUMP_FLOOD':
+        with profiler.span("fill_margin", **span_args):
+            fill_lightmap_margin(context)
+
+    if progressive_info:
+        with profiler.span("accumulate_lightmap", **span_args):
+            accumulate_lightmap(context)
+
+    # Keep the unfiltered result around for the next incremental bake and the cache
+    if properties.incremental_bake or properties.use_bake_cache:
+        raw_pixels = postprocess.read_pixels(bpy.data.images[properties.lightmap_name])
+
+        if properties.incremental_bake:
+            save_raw_lightmap(raw_pixels)
+            commit_fingerprints(context)
+
+        if properties.use_bake_cache:
+            with profiler.span("store_cache_entries", **span_args):
+                store_cache_entries(context, raw_pixels)
+
+    if properties.lightmap_report:
+        with profiler.span("lightmap_report", **span_args):
+            write_lightmap_report(context)
+
+    if properties.postprocess_engine == 'NUMPY':
+        # Denoise is only available through the compositor, its render is
+        # the one round trip left, the filters then run on the denoised pixels
+        if properties.use_denoise:
+            with profiler.span("save_image", **span_args):
+                save_image()
+            with profiler.span("apply_postprocess", **span_args):
+                apply_postprocess()
+
+        with profiler.span("apply_postprocess", **span_args):
+            apply_postprocess_in_memory()
+
+        if properties.export_enabled:
+            with profiler.span("save_image", **span_args):
+                save_image()
+        else:
+            with profiler.span("pack_lightmap_texture", **span_args):
+                pack_lightmap_texture()
+    else:
+        with profiler.span("save_image", **span_args):
+            save_image()
+        with profiler.span("apply_postprocess", **span_args):
+            apply_postprocess()
+
+        # Pack once the whole bake is over, when the lightmap isn't exported
+        if not properties.export_enabled and not bpy.data.images[properties.lightmap_name].packed_file:
+            with profiler.span("pack_lightmap_texture", **span_args):
+                pack_lightmap_texture()
+
+# Extend every UV island of the lightmap by the bake margin in a single pass
+def fill_lightmap_margin(context):
+    properties = context.scene.lightmap_baker_properties
+    if not properties.bake_margin:
+        return
+
+    image = bpy.data.images[properties.lightmap_name]
+    width, height = image.size
+    depsgraph = context.evaluated_depsgraph_get()
+
+    objects = [get_item_object(item) for item in get_atlas_items(context)]
+    mask = coverage.objects_coverage(objects, width, height, depsgraph)
+
+    pixels = postprocess.read_pixels(image)
+    postprocess.write_pixels(image, coverage.fill_margin(pixels, mask, properties.bake_margin))
+
+# Report of the last finalized lightmap
+lightmap_report = None
+
+# Texel usage and density of the lightmap, written next to it as JSON
+def write_lightmap_report(context):
+    global lightmap_report
+    properties = context.scene.lightmap_baker_properties
+
+    image = bpy.data.images[properties.lightmap_name]
+    objects = [get_item_object(item) for item in get_atlas_items(context)]
+    resolutions = [int(identifier) for identifier in properties.bl_rna.properties['lightmap_resolution'].enum_items.keys()]
+
+    lightmap_report = report.build_report(objects, postprocess.read_pixels(image), context.evaluated_depsgraph_get(),
+                                          resolutions, properties.min_texels_per_meter)
+    report.write_report(os.path.splitext(get_img_filpath())[0] + "_report.json", lightmap_report)
+
+    properties.lightmap_utilization = lightmap_report["utilization"]
+    properties.suggested_resolution = lightmap_report["suggested_resolution"]
+    properties.density_outliers = sum(entry["outlier"] for entry in lightmap_report["objects"])
+
+    print(f"Lightmap {properties.lightmap_name}: {lightmap_report['utilization']:.1f}% of the texels used, "
+          f"{properties.density_outliers} density outliers, suggested resolution {lightmap_report['suggested_resolution']}")
+
+# Objects dispatched to Cycles in the next bake call, and how many entries
+# of the list they span (skipped objects included)
+def get_bake_batch(context):
+    properties = context.scene.lightmap_baker_properties
+    objects_list = context.scene.lightmap_baker_objects
+
+    batch_size = 1
+
+    # Every object shares the same lightmap, so Cycles can bake them in one go.
+    # Refined objects are baked one at a time, each with its own samples.
+    if properties.bake_mode == 'BATCHED' and not (adaptive_bake and adaptive_bake.pass_index == sampling.REFINE):
+        batch_size = properties.batch_size or len(objects_list)
+
+    objects = []
+    index = properties.objects_index
+
+    while index < len(objects_list) and len(objects) < batch_size:
+        item = objects_list[index]
+        index += 1
+
+        # Unchanged objects keep their previous pixels
+        if not item.bake_skip:
+            objects.append(get_item_object(item))
+
+    return objects, index - properties.objects_index
+
+# List entries of the batch that was just baked
+def get_batch_items(context):
+    properties = context.scene.lightmap_baker_properties
+    start = properties.objects_index
+    return [item for item in context.scene.lightmap_baker_objects[start:start + properties.bake_batch_count] if not item.bake_skip]
+
+# Bake time of the objects of the batch that was just baked
+def record_bake_time(context, bake_time):
+    items = get_batch_items(context)
+
+    for item in items:
+        item.bake_time = bake_time / len(items)
+
+        if adaptive_bake:
+            adaptive_bake.add_time(item.objects_list, item.bake_time)
+
 # When the bake started...
-def bake_diffuse(context, obj):
+# 'INVOKE_DEFAULT' runs the bake as a job, 'EXEC_DEFAULT' blocks until it's done (no window needed)
+def bake_diffuse(context, objects, execution_context='INVOKE_DEFAULT'):
     # Adjust bake settings
     bpy.types.BakeSettings.use_pass_direct = True
     bpy.types.BakeSettings.use_pass_indirect = True
     bpy.types.BakeSettings.use_pass_color = False
 
-    context.scene.render.bake.margin = context.scene.lightmap_baker_properties.bake_margin
+    # The margin is filled once over the whole lightmap when the bake is over
+    if context.scene.lightmap_baker_properties.margin_mode == 'JUMP_FLOOD':
+        context.scene.render.bake.margin = 0
+    else:
+        context.scene.render.bake.margin = context.scene.lightmap_baker_properties.bake_margin
+
+    if adaptive_bake and adaptive_bake.pass_index == sampling.REFINE:
+        context.scene.cycles.samples = adaptive_bake.get_pass_samples(objects[0].name)
 
     bpy.ops.object.mode_set(mode='OBJECT')
 
-    # Make the object active and select it
+    # Make the objects active and select them
     bpy.ops.object.select_all(action='DESELECT')
-    context.view_layer.objects.active = obj
-    obj.select_set(True)
+    context.view_layer.objects.active = objects[0]
+    for obj in objects:
+        obj.select_set(True)
 
     # Invoke the bake operation
-    bpy.ops.object.bake('INVOKE_DEFAULT', type='DIFFUSE', use_clear=False)
+    bpy.ops.object.bake(execution_context, type='DIFFUSE', use_clear=False)
 
     current_index = context.scene.lightmap_baker_properties.objects_index
     total_objects = len(context.scene.lightmap_baker_objects)
-    print(f"Baking object {obj.name} {current_index + 1}/{total_objects}")
+    if len(objects) == 1:
+        print(f"Baking object {objects[0].name} {current_index + 1}/{total_objects}")
+    else:
+        print(f"Baking objects {current_index + 1}-{current_index + len(objects)}/{total_objects} in a single pass")
 
 def create_lightmap_nodes(context, objects_to_bake):
     resolution_options = {
@@ -98,6 +306,10 @@ def create_lightmap_nodes(context, objects_to_bake):
     }
 
     resolution = resolution_options.get(context.scene.lightmap_baker_properties.lightmap_resolution)
+
+    # Tiles are baked one after the other in an image the size of a tile and its halo
+    if context.scene.lightmap_baker_properties.bake_mode == 'TILED':
+        resolution = min(resolution, int(context.scene.lightmap_baker_properties.tile_size)) + 2 * tiles.get_halo(context.scene.lightmap_baker_properties)
     existing_image = bpy.data.images.get(context.scene.lightmap_baker_properties.lightmap_name)
 
     # Check if lightmap already exists
@@ -115,6 +327,13 @@ def create_lightmap_nodes(context, objects_to_bake):
     lightmap_name = context.scene.lightmap_baker_properties.lightmap_name
 
     # Check if 'new_image' is not already created
+    if not new_image and context.scene.lightmap_baker_properties.use_udim:
+        # Only the UDIM tiles covered by the objects are created
+        objects = [bpy.data.objects.get(obj_name) for obj_name in objects_to_bake]
+        tile_numbers = udim.get_used_tiles(objects, context.evaluated_depsgraph_get())
+        new_image = udim.create_udim_image(lightmap_name, resolution, tile_numbers)
+        print(f"Lightmap UDIM tiles: {', '.join(str(tile_number) for tile_number in tile_numbers)}")
+
     if not new_image:
         # Create a new image with the specified parameters
         new_image = bpy.data.images.new(
@@ -124,17 +343,30 @@ def create_lightmap_nodes(context, objects_to_bake):
             float_buffer=True
         )
 
-        new_image.colorspace_settings.name = 'Linear Rec.709'
-        new_image.use_view_as_render = True
-        new_image.file_format = 'OPEN_EXR'
+    # Same setup for a single image and UDIM tiles
+    new_image.colorspace_settings.name = 'Linear Rec.709'
+    new_image.use_view_as_render = True
+    new_image.file_format = 'OPEN_EXR'
+
+    setup_lightmap_nodes(context, objects_to_bake, new_image)
 
+    return {'FINISHED'}
+
+# Lightmap texture and UV nodes of the materials of the objects, baking into image
+def setup_lightmap_nodes(context, objects_to_bake, image):
+    # Materials shared by several objects are set up once
+    registry_entries = get_material_registry_entries(context.scene)
+    processed_materials = set()
 
     for obj_name in objects_to_bake:
         obj = bpy.data.objects.get(obj_name)
         if obj and obj.data.materials:
             for material_slot in obj.material_slots:
                 obj_material = material_slot.material
-                
+
+                if obj_material in processed_materials:
+                    continue
+                processed_materials.add(obj_material)
 
                 # Check if a ShaderNodeTexImage already exists
                 texture_node = obj_material.node_tree.nodes.get("Bake_Texture_Node")
@@ -145,7 +377,7 @@ def create_lightmap_nodes(context, objects_to_bake):
                     texture_node.location = (0, -50)
 
                 # Set the image for the texture node
-                texture_node.image = new_image
+                texture_node.image = image
 
                 # Set the node setting to cubic
                 obj_material.node_tree.nodes["Bake_Texture_Node"].interpolation = 'Cubic'
@@ -160,374 +392,2260 @@ def create_lightmap_nodes(context, objects_to_bake):
 
                 obj_material.node_tree.links.new(uvmap_node.outputs["UV"], texture_node.inputs["Vector"])
                 obj_material.node_tree.nodes.active = texture_node
-    
-    return {'FINISHED'}
 
-# Preview Lightmaps
-def lightmap_preview_diffuse(context, objects_list):
-    if context.scene.lightmap_baker_properties.preview_diffuse_enabled:
-        connect_lightmap_to_shader_output(context)
-    else:
-        disconnect_lightmap_to_shader_output(context, objects_list)
+                register_lightmap_material(context.scene, registry_entries, obj_material)
 
-def connect_lightmap_to_shader_output(context):
-    objects_list = context.scene.lightmap_baker_objects
-    processed_materials = set()
+# Objects of the list that can't be baked, every problem at once, grouped by error message
+def find_bake_problems(context):
+    properties = context.scene.lightmap_baker_properties
+    objects = [(item.objects_list, get_item_object(item)) for item in context.scene.lightmap_baker_objects]
+    depsgraph = context.evaluated_depsgraph_get()
 
-    for obj_name in objects_list:
-        obj = bpy.data.objects.get(obj_name.objects_list)
-        if obj and obj.data.materials:
-            for material_slot in obj.material_slots:
-                obj_material = material_slot.material
+    # Atlases get their lightmap UVs packed before the bake, they are checked below
+    check_uvs = properties.check_lightmap_uvs and not properties.use_atlas_planner
+    problems = preflight.run(objects, depsgraph, int(properties.lightmap_resolution), properties.use_udim, check_uvs=check_uvs)
 
-                if obj_material not in processed_materials:
-                    nodes_dict = {key: value for key, value in (entry.split(':') for entry in obj_name.nodes_dictionary.split(',') if ':' in entry)}
+    if properties.use_atlas_planner and properties.check_lightmap_uvs:
+        invalid_objects = {obj_name for message in (preflight.MISSING_OBJECT, preflight.NOT_MESH, preflight.MISSING_UV)
+                           for obj_name in problems.get(message, [])}
+        atlas_objects = [obj for obj_name, obj in objects if obj_name not in invalid_objects]
 
-                    texture_node = obj_material.node_tree.nodes.get("Bake_Texture_Node")
-                    material_output = find_material_output_node(obj_material)
+        for message, names in find_atlas_problems(context, atlas_objects, depsgraph).items():
+            problems.setdefault(message, []).extend(names)
 
-                    if texture_node and material_output:
-                        # Save linked node here
-                        nodes_dict[obj_material.name] = find_shader_connected_to_material_output(obj_material).name
+    return problems
 
-                        # Mark material as processed
-                        processed_materials.add(obj_material)
+# Problems of the lightmap UVs of each atlas, as they are once packed in it.
+# Objects of different atlases share the UV space, each atlas is checked alone.
+def find_atlas_problems(context, objects, depsgraph):
+    problems = {}
 
-                        # Connect the lightmap
-                        obj_material.node_tree.links.new(texture_node.outputs[0], material_output.inputs[0])
+    for resolution, names, transforms in pack_atlases(context, objects, depsgraph):
+        if not transforms:
+            problems.setdefault("Lightmap UVs can't be packed in their atlas, lower the bake margin", []).extend(names)
+            continue
 
-                    # Update the nodes_dictionary in obj_name with the modified dictionary
-                    obj_name.nodes_dictionary = ','.join(f"{key}:{value}" for key, value in nodes_dict.items())
+        triangle_sets = []
+        for obj_name in names:
+            obj = bpy.data.objects[obj_name]
+            triangles = preflight.get_object_result(obj_name, obj, depsgraph, True)[1]
 
-def disconnect_lightmap_to_shader_output(context, objects_list):
-    for obj_name in objects_list:
-        obj = bpy.data.objects.get(obj_name.objects_list)
-        if obj and obj.data.materials:
-            for material_slot in obj.material_slots:
-                obj_material = material_slot.material
-                links = obj_material.node_tree.links
+            if obj.data.name in transforms and triangles is not None and len(triangles):
+                scale, offset = transforms[obj.data.name]
+                triangle_sets.append((obj_name, triangles * scale + offset))
 
-                nodes_dict = dict(entry.split(':') for entry in obj_name.nodes_dictionary.split(',') if entry)
+        if triangle_sets:
+            for message, atlas_names in uvcheck.analyse(triangle_sets, resolution).items():
+                problems.setdefault(message, []).extend(atlas_names)
 
-                connected_node_name = nodes_dict.get(obj_material.name)
-                if connected_node_name:
-                    original_shader_node = obj_material.node_tree.nodes.get(connected_node_name)
-                    if original_shader_node:
-                        print(f"Restored Node {original_shader_node.name} in Material {obj_material.name}")
-                        material_output = find_material_output_node(obj_material)
-                        links.new(original_shader_node.outputs[0], material_output.inputs[0])
+    return problems
 
-def find_shader_connected_to_material_output(material):
-    material_output = find_material_output_node(material)
-    
-    for n_input in material_output.inputs:
-        for node_link in n_input.links:
-            return node_link.from_node
+# Settings the bake can't start with. The command line bakes with workers or
+# a queue whatever the bake mode of the file is.
+def find_settings_problems(context, workers=0, queue=None):
+    properties = context.scene.lightmap_baker_properties
+    problems = []
+
+    # Modes baking the objects outside of the scheduler
+    split_bake = bool(workers or queue) or properties.bake_mode in {'PARALLEL', 'TILED', 'QUEUE'}
+
+    if context.scene.render.engine == 'BLENDER_EEVEE':
+        problems.append("Only Cycles render is supported!")
+
+    if properties.export_path == "":
+        problems.append("Export part is empty")
+
+    if properties.use_udim and split_bake:
+        problems.append("UDIM lightmaps can only be baked per object or batched")
+
+    if properties.use_atlas_planner and (properties.use_udim or split_bake):
+        problems.append("Atlases can only be baked per object or batched, without UDIM tiles")
+
+    if properties.adaptive_sampling and (properties.use_udim or split_bake):
+        problems.append("Adaptive sampling only works per object or batched, without UDIM tiles")
+
+    if properties.progressive_bake and (properties.use_udim or properties.adaptive_sampling or split_bake):
+        problems.append("Progressive bakes only work per object or batched, without UDIM tiles or adaptive sampling")
+
+    return problems
+
+# Get the scene, materials and state ready before the first object is baked
+def prepare_bake(context, objects_to_bake):
+    global progressive_base_seed
+    progressive_base_seed = None
+
+    # Set the active object outside the loop
+    bpy.ops.object.mode_set(mode='OBJECT')
+    bpy.ops.object.select_all(action='DESELECT')
+    active_object = bpy.data.objects.get(objects_to_bake[0])
+    active_object.select_set(True)
+    context.view_layer.objects.active = active_object
+
+    context.scene.cycles.device = context.scene.lightmap_baker_properties.render_device
+
+    sample_count = context.scene.lightmap_baker_properties.sample_count
+    context.scene.cycles.samples = sample_count
+
+    # Disable lightmaps preview
+    context.scene.lightmap_baker_properties.preview_diffuse_enabled = False
+    context.scene.lightmap_baker_properties.preview_draft = False
+    lightmap_preview_diffuse(context)
+
+    # Statistics of the whole bake, every atlas included
+    context.scene.lightmap_baker_properties.skipped_objects = 0
+    context.scene.lightmap_baker_properties.skipped_time = 0.0
+    context.scene.lightmap_baker_properties.cache_hits = 0
+    context.scene.lightmap_baker_properties.cache_misses = 0
+    context.scene.lightmap_baker_properties.adaptive_refined_objects = 0
+    context.scene.lightmap_baker_properties.adaptive_time_saved = 0.0
+
+    plan_atlases(context, objects_to_bake)
+    atlas_objects = [item.objects_list for item in get_atlas_items(context)]
+
+    span_args = get_span_args(context)
+    with profiler.span("create_lightmap_nodes", **span_args):
+        create_lightmap_nodes(context, atlas_objects)
+    with profiler.span("prepare_incremental_bake", **span_args):
+        prepare_incremental_bake(context)
+    with profiler.span("replay_bake_journal", **span_args):
+        replay_bake_journal(context)
+    start_adaptive_bake(context)
+    start_progressive_run(context)
+
+    for obj_name in objects_to_bake:
+        obj = bpy.data.objects.get(obj_name)
+        obj.data.uv_layers.active_index = 1
+
+    # Reset bake aborting
+    context.scene.lightmap_baker_properties.cancel_bake = False
+    # Reset the objects to bake index
+    context.scene.lightmap_baker_properties.objects_index = 0
+    # Reset elapsed time
+    context.scene.lightmap_baker_properties.elapsed_time = 0.0
+    # Reset the progression
+    context.scene.lightmap_baker_properties.bake_progress = 0.0
+    # Start the timer
+    context.scene.lightmap_baker_properties.time_start = time.perf_counter()
+
+    global idle_time_start
+    idle_time_start = context.scene.lightmap_baker_properties.time_start
+
+# Atlases
+# Resolution and objects of each atlas of the running bake
+atlas_plan = []
+
+# Lightmap name and resolution chosen by the user, while atlases are baked
+atlas_base_settings = None
+
+def get_atlas_items(context):
+    atlas_index = context.scene.lightmap_baker_properties.atlas_index
+    return [item for item in context.scene.lightmap_baker_objects if item.atlas == atlas_index]
+
+def plan_atlases(context, objects_to_bake):
+    global atlas_plan, atlas_base_settings
+    properties = context.scene.lightmap_baker_properties
+
+    properties.atlas_index = 0
+    atlas_plan = []
+
+    if properties.use_atlas_planner:
+        objects = [bpy.data.objects.get(obj_name) for obj_name in objects_to_bake]
+        packed_atlases = pack_atlases(context, objects, context.evaluated_depsgraph_get())
+        atlas_plan = [(resolution, names) for resolution, names, _ in packed_atlases]
+
+        # The lightmap UVs of each atlas fill it, at the same density
+        for _, _, transforms in packed_atlases:
+            apply_lightmap_uv_transforms(context, transforms)
+
+    atlas_objects = {obj_name: index for index, (_, names) in enumerate(atlas_plan) for obj_name in names}
+    for item in context.scene.lightmap_baker_objects:
+        item.atlas = atlas_objects.get(item.objects_list, 0)
+
+    properties.atlas_count = max(len(atlas_plan), 1)
+
+    if atlas_plan:
+        atlas_base_settings = (properties.lightmap_name, properties.lightmap_resolution)
+        set_atlas_settings(context)
+
+        for index, (resolution, names) in enumerate(atlas_plan):
+            print(f"Atlas {index + 1}/{len(atlas_plan)}: {resolution}x{resolution}, {len(names)} objects")
+
+# Resolution, object names and lightmap UV transform of each mesh of every atlas
+def pack_atlases(context, objects, depsgraph):
+    properties = context.scene.lightmap_baker_properties
+    plan = atlas.plan_atlases(objects, depsgraph, properties.texels_per_meter, int(properties.lightmap_resolution))
+
+    # The margin of each side of a rectangle, in texels of the atlas
+    return [(resolution, names, uvpack.pack_objects([bpy.data.objects[obj_name] for obj_name in names], depsgraph,
+                                                    2.0 * properties.bake_margin / resolution))
+            for resolution, names in plan]
+
+# Lightmap of each atlas of the running (or last) bake
+def get_atlas_lightmap_names(context):
+    base_name = atlas_base_settings[0] if atlas_base_settings else context.scene.lightmap_baker_properties.lightmap_name
+
+    if len(atlas_plan) > 1:
+        return [f"{base_name}_{index}" for index in range(len(atlas_plan))]
+    return [base_name]
+
+def set_atlas_settings(context):
+    properties = context.scene.lightmap_baker_properties
+    base_name, _ = atlas_base_settings
+
+    # A single atlas keeps the name of the lightmap
+    if len(atlas_plan) > 1:
+        properties.lightmap_name = f"{base_name}_{properties.atlas_index}"
+    properties.lightmap_resolution = str(atlas_plan[properties.atlas_index][0])
+
+def restore_atlas_settings(context):
+    global atlas_base_settings
+    properties = context.scene.lightmap_baker_properties
+
+    if atlas_base_settings:
+        properties.lightmap_name, properties.lightmap_resolution = atlas_base_settings
+        atlas_base_settings = None
+
+# Finalize the lightmap of the current atlas and get the next one ready, False after the last atlas
+def start_next_atlas(context):
+    properties = context.scene.lightmap_baker_properties
+    if properties.atlas_index + 1 >= properties.atlas_count:
+        return False
+
+    finalize_lightmap(context)
+
+    properties.atlas_index += 1
+    set_atlas_settings(context)
+
+    objects_to_bake = [item.objects_list for item in get_atlas_items(context)]
+    span_args = get_span_args(context)
+    with profiler.span("create_lightmap_nodes", **span_args):
+        create_lightmap_nodes(context, objects_to_bake)
+    with profiler.span("prepare_incremental_bake", **span_args):
+        prepare_incremental_bake(context)
+    with profiler.span("replay_bake_journal", **span_args):
+        replay_bake_journal(context)
+    start_adaptive_bake(context)
+    start_progressive_run(context)
+
+    properties.objects_index = 0
+    return True
+
+# Incremental Bake
+# Fingerprints of the current bake, only stored on the objects once the bake completed
+pending_fingerprints = {}
+
+def get_raw_lightmap_path():
+    return os.path.splitext(get_img_filpath())[0] + "_raw.npy"
+
+def save_raw_lightmap(raw_pixels):
+    np.save(get_raw_lightmap_path(), raw_pixels.astype(np.float16))
+
+def load_raw_lightmap(width, height):
+    raw_path = get_raw_lightmap_path()
+    if not os.path.exists(raw_path):
         return None
 
-def find_material_output_node(obj_material):
-    for node in obj_material.node_tree.nodes:
-        if node.type == 'OUTPUT_MATERIAL':
-            return node
-    return None
+    raw_pixels = np.load(raw_path)
+    if raw_pixels.shape != (height, width, 4):
+        return None
 
-# What we do when bake is done?
-def calculate_elapsed_time():
-    bpy.context.scene.lightmap_baker_properties.elapsed_time = time.perf_counter() - bpy.context.scene.lightmap_baker_properties.time_start
+    return raw_pixels.astype(np.float32)
 
-def pack_lightmap_texture():
+def commit_fingerprints(context):
+    for item in context.scene.lightmap_baker_objects:
+        if item.objects_list in pending_fingerprints:
+            item.fingerprint = pending_fingerprints[item.objects_list]
 
-    image_name = bpy.context.scene.lightmap_baker_properties.lightmap_name
-    image = bpy.data.images[image_name]
-    image.pack()
+# Mark unchanged (or cached) objects as skipped and copy their previous pixels in the new lightmap
+def prepare_incremental_bake(context):
+    global pending_fingerprints
+    properties = context.scene.lightmap_baker_properties
+    objects_list = get_atlas_items(context)
 
-def save_image():
-    scene = bpy.context.scene
+    pending_fingerprints = {}
 
-    lightmap_name = scene.lightmap_baker_properties.lightmap_name
-    
-    if scene.lightmap_baker_properties.export_enabled:
-        filepath = bpy.path.abspath(scene.lightmap_baker_properties.export_path)
-    else:
-        filepath = bpy.path.abspath(tempfile.gettempdir())
+    # Objects of the other atlases are baked with their own lightmap
+    for item in context.scene.lightmap_baker_objects:
+        item.bake_skip = item.atlas != properties.atlas_index
 
-    filepath = os.path.join(filepath, f"{lightmap_name}.exr")
+    if not properties.incremental_bake and not properties.use_bake_cache:
+        return
 
-    # Set the render settings for OpenEXR codec to ZIP compression
-    scene.render.image_settings.file_format = 'OPEN_EXR'
-    scene.render.image_settings.color_mode = 'RGB'
-    scene.render.image_settings.exr_codec = 'ZIP'
-    scene.render.filepath = filepath
+    # A refine bakes every object again with another seed
+    if is_refine_bake(context):
+        return
 
-    # Save the image to the specified file path
-    image = bpy.data.images.get(lightmap_name)
-    image.save_render(filepath=filepath, scene=scene)
-    image.filepath = get_img_filpath()
-    image.unpack(method='REMOVE')
+    # The whole lightmap would have to be loaded
+    if properties.bake_mode == 'TILED' or properties.use_udim:
+        return
 
-def get_img_filpath():
-    scene = bpy.context.scene
+    depsgraph = context.evaluated_depsgraph_get()
+    lighting_hash = fingerprint.get_lighting_hash(context.scene, depsgraph)
+
+    for item in objects_list:
+        obj = get_item_object(item)
+        pending_fingerprints[item.objects_list] = fingerprint.get_object_fingerprint(obj, depsgraph, lighting_hash)
+
+    image = bpy.data.images[properties.lightmap_name]
+    width, height = image.size
+    pixels = postprocess.read_pixels(image)
+    raw_pixels = load_raw_lightmap(width, height) if properties.incremental_bake else None
+
+    # Pixels of the skipped objects: (x, y, mask, covered, pixels)
+    kept_tiles = []
+
+    # Objects unchanged since the last bake of this file
+    if raw_pixels is not None:
+        for item in objects_list:
+            if item.fingerprint and item.fingerprint == pending_fingerprints[item.objects_list]:
+                item.bake_skip = True
+                properties.skipped_objects += 1
+                properties.skipped_time += item.bake_time
+
+                region = coverage.object_region(get_item_object(item), width, height, depsgraph, properties.bake_margin)
+                if region is not None:
+                    x, y, covered, mask = region
+                    kept_tiles.append((x, y, mask, covered, raw_pixels[y:y + mask.shape[0], x:x + mask.shape[1]]))
+
+    # Objects already baked with the same inputs, here or on another machine
+    if properties.use_bake_cache:
+        bake_cache = get_bake_cache(context)
+        settings_hash = fingerprint.get_settings_hash(properties)
+
+        for item in objects_list:
+            if item.bake_skip:
+                continue
+
+            tile = bake_cache.load(cache.get_key(pending_fingerprints[item.objects_list], settings_hash))
+            if tile is None:
+                properties.cache_misses += 1
+                continue
+
+            x, y, mask, covered, tile_pixels, bake_time = tile
+            kept_tiles.append((x, y, mask, covered, tile_pixels))
+
+            item.bake_skip = True
+            item.bake_time = bake_time
+            properties.cache_hits += 1
+            properties.skipped_objects += 1
+            properties.skipped_time += bake_time
+
+    if not any(item.bake_skip for item in objects_list):
+        return
 
-    lightmap_name = scene.lightmap_baker_properties.lightmap_name
-    
-    if scene.lightmap_baker_properties.export_enabled:
-        filepath = bpy.path.abspath(scene.lightmap_baker_properties.export_path)
-    else:
-        filepath = bpy.path.abspath(tempfile.gettempdir())
+    # Changed objects are baked over a clean background
+    cache.paste_tiles(pixels, kept_tiles)
+    postprocess.write_pixels(image, pixels)
 
-    filepath = os.path.join(filepath, f"{lightmap_name}.exr")
+    print(f"Skipping {properties.skipped_objects} unchanged objects, saving about {properties.skipped_time:.2f} sec")
 
-    return filepath
+# Bake Journal
+# Objects baked into each lightmap, kept until the whole bake is over so a
+# crashed or cancelled bake can be resumed
+def get_bake_journal(lightmap_name=None):
+    lightmap_name = lightmap_name or bpy.context.scene.lightmap_baker_properties.lightmap_name
+    return journal.BakeJournal(os.path.join(os.path.dirname(get_img_filpath()), f"{lightmap_name}_journal"))
 
-def apply_postprocess():
-    scene = bpy.context.scene
-    property =  scene.lightmap_baker_properties
+def is_bake_journal_enabled(context):
+    properties = context.scene.lightmap_baker_properties
 
-    # Cancel compositing if no checkbox enabled
-    if not property.use_denoise and not property.use_bilateral_blur: 
+    # Parallel, tiled and UDIM bakes never hold the whole lightmap in the image,
+    # adaptive passes bake the objects more than once
+    return (properties.use_bake_journal and properties.bake_mode in {'OBJECT', 'BATCHED'}
+            and not properties.use_udim and not properties.adaptive_sampling and not is_refine_bake(context))
+
+def has_bake_journal(context):
+    # A bake split in atlases starts with the first one
+    lightmap_name = context.scene.lightmap_baker_properties.lightmap_name
+    return any(get_bake_journal(name).exists() for name in (lightmap_name, f"{lightmap_name}_0"))
+
+# Append the objects of the batch that was just baked, with their pixels
+def record_journal_entries(context):
+    if not is_bake_journal_enabled(context):
         return
-    
-    scene.use_nodes = True
-    compositor = scene.node_tree
-    nodes = compositor.nodes
-    
-    lightmap_name = scene.lightmap_baker_properties.lightmap_name
-    lightmap = bpy.data.images.get(lightmap_name)
 
+    items = get_batch_items(context)
+    if not items:
+        return
 
-    image_node = nodes.get(lightmap_name)
+    properties = context.scene.lightmap_baker_properties
+    image = bpy.data.images[properties.lightmap_name]
+    width, height = image.size
+    depsgraph = context.evaluated_depsgraph_get()
 
-    if not image_node:
-        image_node = nodes.new(type='CompositorNodeImage')
-        image_node.location = (0, 0)
-        image_node.name = lightmap_name         
+    # Each object is rasterized in its own UV region only
+    regions = []
+    for item in items:
+        region = coverage.object_region(get_item_object(item), width, height, depsgraph, properties.bake_margin)
+        if region is not None:
+            regions.append((item, region))
 
-    image_node.image = lightmap
-    composite_node = compositor.nodes.get('Composite', None)
+    if not regions:
+        return
 
-    if not composite_node:
-        composite_node = compositor.nodes.new(type='CompositorNodeComposite')
-        composite_node.location = (800, 0)
+    # Only the rows of the lightmap spanned by the batch are read
+    top = min(y for _, (_, y, _, _) in regions)
+    bottom = max(y + mask.shape[0] for _, (_, y, _, mask) in regions)
+    pixels = postprocess.read_rows(image, top, bottom)
 
+    bake_journal = get_bake_journal()
+    settings_hash = fingerprint.get_settings_hash(properties)
 
-    # Denoise and Bilateral Blur
-    if property.use_denoise and property.use_bilateral_blur:
+    for item, (x, y, covered, mask) in regions:
+        tile_pixels = pixels[y - top:y - top + mask.shape[0], x:x + mask.shape[1]]
+        bake_journal.append(item.objects_list, settings_hash, x, y, mask, covered, tile_pixels, item.bake_time)
 
-        denoise_node = nodes.get('Denoise')
+# Paste the journaled objects back in the lightmap and skip them, or start a new journal
+def replay_bake_journal(context):
+    if not is_bake_journal_enabled(context):
+        return
 
-        # If the Denoise node doesn't exist, create one
-        if not denoise_node:
-            denoise_node = nodes.new(type='CompositorNodeDenoise')
-            denoise_node.location = (200, 0)
-            denoise_node.name = 'Denoise'
+    properties = context.scene.lightmap_baker_properties
+    bake_journal = get_bake_journal()
 
-        bilateral_node = nodes.get('Bilateral Blur')
+    if not properties.resume_bake:
+        bake_journal.clear()
+        return
 
-        if not bilateral_node:
-            bilateral_node = nodes.new(type='CompositorNodeBilateralblur')
-            bilateral_node.location = (600, 0)
-            bilateral_node.name = 'Bilateral Blur'
-            bilateral_node.iterations = property.bilateral_blur_iterations
-            bilateral_node.sigma_color = property.bilateral_blur_color_sigma
-            bilateral_node.sigma_space = property.bilateral_blur_space_sigma
+    # Objects baked from now on are appended after the last complete entry
+    bake_journal.repair()
 
-        # Check if Blur node already exists
-        blur_node = nodes.get('Blur')
+    items = {item.objects_list: item for item in get_atlas_items(context)}
+    entries = [entry for entry in bake_journal.get_entries(fingerprint.get_settings_hash(properties)) if entry["object"] in items]
+    if not entries:
+        return
 
-        if not blur_node:
-            blur_node = nodes.new(type='CompositorNodeBlur')
-            blur_node.location = (400, 0)
-            blur_node.name = 'Blur'
-            blur_node.size_x = 2
-            blur_node.size_y = 2
+    image = bpy.data.images[properties.lightmap_name]
+    width, height = image.size
+    pixels = postprocess.read_pixels(image)
+    depsgraph = context.evaluated_depsgraph_get()
 
-        # Connect image node 
-        compositor.links.new(image_node.outputs['Image'], denoise_node.inputs['Image'])
+    # Objects already skipped keep their pixels, journaled margins don't go over them
+    kept_tiles = []
+    for item in items.values():
+        region = coverage.object_region(get_item_object(item), width, height, depsgraph) if item.bake_skip else None
+        if region is not None:
+            x, y, covered, _ = region
+            kept_tiles.append((x, y, covered, covered, pixels[y:y + covered.shape[0], x:x + covered.shape[1]].copy()))
 
-        # Connect denoise node 
-        compositor.links.new(denoise_node.outputs['Image'], blur_node.inputs['Image'])
-        compositor.links.new(denoise_node.outputs['Image'], bilateral_node.inputs['Image'])
+    for entry in entries:
+        kept_tiles.append(bake_journal.load(entry))
 
-        # Connect Blur node 
-        compositor.links.new(blur_node.outputs['Image'], bilateral_node.inputs['Determinator'])
+        item = items[entry["object"]]
+        if not item.bake_skip:
+            item.bake_skip = True
+            item.bake_time = entry["bake_time"]
+            properties.skipped_objects += 1
+            properties.skipped_time += entry["bake_time"]
 
-        # Connect Bilateral Blur node
-        compositor.links.new(bilateral_node.outputs['Image'], composite_node.inputs['Image'])
+    # Covered texels first, margins where no object covers the texel, in the order they were baked
+    cache.paste_tiles(pixels, kept_tiles)
+    postprocess.write_pixels(image, pixels)
 
-    # Denoise
-    elif property.use_denoise:
-        # Check if a Denoise node already exists
-        denoise_node = nodes.get('Denoise')
+    print(f"Resuming {properties.lightmap_name}, {len(entries)} objects already baked")
 
-        # If the Denoise node doesn't exist, create one
-        if not denoise_node:
-            denoise_node = nodes.new(type='CompositorNodeDenoise')
-            denoise_node.location = (200, 0)
-            denoise_node.name = 'Denoise'
+def clear_bake_journals(context):
+    for lightmap_name in get_atlas_lightmap_names(context):
+        get_bake_journal(lightmap_name).clear()
 
-        compositor.links.new(image_node.outputs['Image'], denoise_node.inputs['Image'])
-        compositor.links.new(denoise_node.outputs['Image'], composite_node.inputs['Image'])
+# Progressive Bake
+# Accumulation of the lightmap being baked: {"key", "samples", "runs", "seed"}
+progressive_info = None
 
-    # Bilateral Blur
-    elif property.use_bilateral_blur:
-        # Check if Bilateral Blur node already exists
-        bilateral_node = nodes.get('Bilateral Blur')
+# Seed of the scene, while progressive runs change it
+progressive_base_seed = None
 
-        if not bilateral_node:
-            bilateral_node = nodes.new(type='CompositorNodeBilateralblur')
-            bilateral_node.location = (600, 0)
-            bilateral_node.name = 'Bilateral Blur'
-            bilateral_node.iterations = property.bilateral_blur_iterations
-            bilateral_node.sigma_color = property.bilateral_blur_color_sigma
-            bilateral_node.sigma_space = property.bilateral_blur_space_sigma
+def is_progressive_bake_enabled(context):
+    properties = context.scene.lightmap_baker_properties
+    return (properties.progressive_bake and properties.bake_mode in {'OBJECT', 'BATCHED'}
+            and not properties.use_udim and not properties.adaptive_sampling)
 
-        # Check if Blur node already exists
-        blur_node = nodes.get('Blur')
+def is_refine_bake(context):
+    return context.scene.lightmap_baker_properties.refine_bake and is_progressive_bake_enabled(context)
 
-        if not blur_node:
-            blur_node = nodes.new(type='CompositorNodeBlur')
-            blur_node.location = (400, 0)
-            blur_node.name = 'Blur'
-            blur_node.size_x = 2
-            blur_node.size_y = 2
+def get_accumulation_buffer(lightmap_name=None):
+    lightmap_name = lightmap_name or bpy.context.scene.lightmap_baker_properties.lightmap_name
+    return accumulation.AccumulationBuffer(os.path.join(os.path.dirname(get_img_filpath()), f"{lightmap_name}_accumulation"))
 
-        # Connect image node to Blur node
-        compositor.links.new(image_node.outputs['Image'], blur_node.inputs['Image'])
+def has_accumulation_buffer(context):
+    # A bake split in atlases starts with the first one
+    lightmap_name = context.scene.lightmap_baker_properties.lightmap_name
+    return any(get_accumulation_buffer(name).exists() for name in (lightmap_name, f"{lightmap_name}_0"))
 
-        # Connect image node to Bilateral Blur node
-        compositor.links.new(image_node.outputs['Image'], bilateral_node.inputs['Image'])
-        compositor.links.new(blur_node.outputs['Image'], bilateral_node.inputs['Determinator'])
+# Objects, lighting and settings of the current lightmap, without the samples
+def get_accumulation_key(context):
+    properties = context.scene.lightmap_baker_properties
+    depsgraph = context.evaluated_depsgraph_get()
+    lighting_hash = fingerprint.get_lighting_hash(context.scene, depsgraph)
 
-        # Connect Bilateral Blur node to Composite node
-        compositor.links.new(bilateral_node.outputs['Image'], composite_node.inputs['Image'])
+    object_fingerprints = [fingerprint.get_object_fingerprint(get_item_object(item), depsgraph, lighting_hash)
+                           for item in get_atlas_items(context)]
+    return fingerprint.get_accumulation_hash(properties, object_fingerprints)
 
+# Pick the seed of the next run of the current lightmap, a new accumulation unless refining
+def start_progressive_run(context):
+    global progressive_info, progressive_base_seed
+    progressive_info = None
 
+    if not is_progressive_bake_enabled(context):
+        return
 
-    # Render Post Process
-    width, height = lightmap.size
-    scene.render.resolution_x = width
-    scene.render.resolution_y = height
+    properties = context.scene.lightmap_baker_properties
+    if progressive_base_seed is None:
+        progressive_base_seed = context.scene.cycles.seed
 
-    bpy.ops.render.render(write_still=True, use_viewport=False)   
-    lightmap.reload()
-    
-    if not property.export_enabled:
-        lightmap.pack()
-        if os.path.exists(get_img_filpath()):
-            os.remove(get_img_filpath())
+    info = get_accumulation_buffer().start_run(get_accumulation_key(context), progressive_base_seed, properties.refine_bake)
+
+    # Each run gets its own seed, its noise is independent of the previous runs
+    context.scene.cycles.seed = info["seed"] + info["runs"]
+    progressive_info = info
+
+def restore_progressive_seed(context):
+    global progressive_info, progressive_base_seed
+    progressive_info = None
+
+    if progressive_base_seed is not None:
+        context.scene.cycles.seed = progressive_base_seed
+        progressive_base_seed = None
+
+# Blend the raw lightmap into the accumulation, weighted by sample count, and store the result
+def accumulate_lightmap(context):
+    properties = context.scene.lightmap_baker_properties
+    image = bpy.data.images[properties.lightmap_name]
+
+    pixels = postprocess.read_pixels(image)
+    accumulated_pixels = get_accumulation_buffer().accumulate(progressive_info, pixels, properties.sample_count)
+
+    # The lightmap becomes the running mean once previous runs were blended in
+    if progressive_info["samples"] > properties.sample_count:
+        postprocess.write_pixels(image, accumulated_pixels)
+
+    properties.accumulated_samples = progressive_info["samples"]
+    print(f"Lightmap {properties.lightmap_name}: {progressive_info['samples']} samples accumulated over {progressive_info['runs']} runs")
+
+# Adaptive Sampling
+# Passes of the running adaptive bake of the current lightmap
+adaptive_bake = None
+
+# Samples report of the last adaptive lightmap
+sampling_report = None
+
+def is_adaptive_sampling_enabled(context):
+    properties = context.scene.lightmap_baker_properties
+    return properties.adaptive_sampling and properties.bake_mode in {'OBJECT', 'BATCHED'} and not properties.use_udim
+
+def get_adaptive_image_name(context):
+    return context.scene.lightmap_baker_properties.lightmap_name + "_adaptive"
+
+# Point the lightmap texture nodes of the current atlas to another image, Cycles bakes into it
+def set_bake_image(context, image):
+    materials = set()
+    for item in get_atlas_items(context):
+        obj = get_item_object(item)
+        if obj:
+            materials.update(slot.material for slot in obj.material_slots if slot.material)
+
+    for material in materials:
+        texture_node = material.node_tree.nodes.get("Bake_Texture_Node")
+        if texture_node:
+            texture_node.image = image
+
+# A black image the size of the lightmap, for the passes that can't bake over it
+def create_adaptive_image(context):
+    existing_image = bpy.data.images.get(get_adaptive_image_name(context))
+    if existing_image:
+        bpy.data.images.remove(existing_image, do_unlink=True)
+
+    width, height = bpy.data.images[context.scene.lightmap_baker_properties.lightmap_name].size
+    image = bpy.data.images.new(name=get_adaptive_image_name(context), width=width, height=height, float_buffer=True)
+    image.colorspace_settings.name = 'Linear Rec.709'
+
+    return image
+
+def set_adaptive_pass_settings(context):
+    context.scene.cycles.seed = adaptive_bake.get_pass_seed()
+    if adaptive_bake.pass_index != sampling.REFINE:
+        context.scene.cycles.samples = adaptive_bake.get_pass_samples()
+
+# Bake the objects of the current lightmap in adaptive passes, instead of once with the same samples
+def start_adaptive_bake(context):
+    global adaptive_bake
+    adaptive_bake = None
+
+    if not is_adaptive_sampling_enabled(context):
+        return
+
+    properties = context.scene.lightmap_baker_properties
+    objects_to_bake = [item.objects_list for item in get_atlas_items(context) if not item.bake_skip]
+    if not objects_to_bake:
+        return
+
+    adaptive_bake = sampling.AdaptiveBake(objects_to_bake, properties.adaptive_initial_samples, properties.sample_count,
+                                          properties.noise_threshold, context.scene.cycles.seed)
+    set_adaptive_pass_settings(context)
+
+# Get the next adaptive pass ready, False once the lightmap is done
+def start_next_adaptive_pass(context):
+    if adaptive_bake is None:
+        return False
+
+    properties = context.scene.lightmap_baker_properties
+    span_args = get_span_args(context)
+
+    if adaptive_bake.pass_index == sampling.FIRST_HALF:
+        # The second half goes in its own image, both are compared once baked
+        set_bake_image(context, create_adaptive_image(context))
+        adaptive_bake.pass_index = sampling.SECOND_HALF
+
+    elif adaptive_bake.pass_index == sampling.SECOND_HALF:
+        with profiler.span("estimate_noise", **span_args):
+            extra_samples = estimate_object_noise(context)
+
+        if not extra_samples:
+            finish_adaptive_bake(context)
+            return False
+
+        # Only the noisy objects are baked again
+        set_bake_image(context, create_adaptive_image(context))
+        for item in get_atlas_items(context):
+            if not item.bake_skip and item.objects_list not in extra_samples:
+                item.bake_skip = True
+                adaptive_bake.skipped.add(item.objects_list)
+
+        adaptive_bake.pass_index = sampling.REFINE
+        print(f"Refining {len(extra_samples)}/{len(adaptive_bake.objects)} noisy objects")
+
+    else:
+        with profiler.span("blend_refined_objects", **span_args):
+            blend_refined_objects(context)
+        finish_adaptive_bake(context)
+        return False
+
+    set_adaptive_pass_settings(context)
+    properties.objects_index = 0
+    return True
+
+# Noise of every object from both halves, their mean replaces the first half in the lightmap
+def estimate_object_noise(context):
+    properties = context.scene.lightmap_baker_properties
+    image = bpy.data.images[properties.lightmap_name]
+    width, height = image.size
+    depsgraph = context.evaluated_depsgraph_get()
+
+    first = postprocess.read_pixels(image)
+    second = postprocess.read_pixels(bpy.data.images[get_adaptive_image_name(context)])
+
+    covered = np.zeros((height, width), dtype=bool)
+    baked = np.zeros((height, width), dtype=bool)
+
+    # Each object is rasterized in its own UV region only
+    for obj_name in adaptive_bake.objects:
+        region = coverage.object_region(bpy.data.objects[obj_name], width, height, depsgraph, properties.bake_margin)
+        if region is None:
+            adaptive_bake.noise[obj_name] = 0.0
+            continue
+
+        x, y, object_covered, mask = region
+        window = (slice(y, y + mask.shape[0]), slice(x, x + mask.shape[1]))
+        adaptive_bake.noise[obj_name] = sampling.estimate_noise(first[window], second[window], object_covered)
+        covered[window] |= object_covered
+        baked[window] |= mask
+
+    # Skipped objects were only pasted in the first half
+    kept = [get_item_object(item) for item in get_atlas_items(context) if item.bake_skip]
+    if kept:
+        baked &= ~coverage.objects_coverage(kept, width, height, depsgraph)
+
+    first[baked] = (first[baked] + second[baked]) / 2.0
+    postprocess.write_pixels(image, first)
+
+    adaptive_bake.covered = covered
+    return adaptive_bake.allocate()
+
+# Blend the refined objects into the lightmap, weighted by sample count
+def blend_refined_objects(context):
+    properties = context.scene.lightmap_baker_properties
+    image = bpy.data.images[properties.lightmap_name]
+    width, height = image.size
+    depsgraph = context.evaluated_depsgraph_get()
+
+    pixels = postprocess.read_pixels(image)
+    refined_pixels = postprocess.read_pixels(bpy.data.images[get_adaptive_image_name(context)])
+
+    # Extra samples of each texel, margins only where no baked object covers the texel
+    weights = np.zeros((height, width), dtype=np.float32)
+    for obj_name, extra_samples in adaptive_bake.extra_samples.items():
+        region = coverage.object_region(bpy.data.objects[obj_name], width, height, depsgraph, properties.bake_margin)
+        if region is None:
+            continue
+
+        x, y, object_covered, mask = region
+        window = (slice(y, y + mask.shape[0]), slice(x, x + mask.shape[1]))
+        margin = mask & ~adaptive_bake.covered[window] & (weights[window] == 0)
+        weights[window][object_covered | margin] = extra_samples
+
+    refined = weights > 0
+    pixels[refined] = sampling.blend(pixels[refined], adaptive_bake.initial_samples, refined_pixels[refined], weights[refined][:, None])
+    postprocess.write_pixels(image, pixels)
+
+# Bake the next objects with the lightmap and settings of the user again
+def restore_adaptive_settings(context):
+    properties = context.scene.lightmap_baker_properties
+
+    set_bake_image(context, bpy.data.images.get(properties.lightmap_name))
+
+    adaptive_image = bpy.data.images.get(get_adaptive_image_name(context))
+    if adaptive_image:
+        bpy.data.images.remove(adaptive_image, do_unlink=True)
+
+    context.scene.cycles.seed = adaptive_bake.base_seed
+    context.scene.cycles.samples = properties.sample_count
+
+    for item in get_atlas_items(context):
+        if item.objects_list in adaptive_bake.skipped:
+            item.bake_skip = False
+
+def finish_adaptive_bake(context):
+    global adaptive_bake, sampling_report
+    properties = context.scene.lightmap_baker_properties
+
+    restore_adaptive_settings(context)
+
+    sampling_report = adaptive_bake.get_report()
+    sampling.write_report(os.path.splitext(get_img_filpath())[0] + "_samples.json", sampling_report)
+
+    samples = {entry["object"]: entry["samples"] for entry in sampling_report["objects"]}
+    for item in get_atlas_items(context):
+        if item.objects_list in samples:
+            item.samples_used = samples[item.objects_list]
+            item.bake_time = adaptive_bake.get_total_time(item.objects_list)
+
+    properties.adaptive_refined_objects += sampling_report["refined_objects"]
+    properties.adaptive_time_saved += sampling_report["time_saved"]
+
+    print(f"Lightmap {properties.lightmap_name}: {sampling_report['refined_objects']}/{len(samples)} objects refined, "
+          f"{sampling_report['total_samples']} samples instead of {sampling_report['uniform_total_samples']}, "
+          f"about {sampling_report['time_saved']:.2f} sec saved")
+
+    adaptive_bake = None
+
+def cancel_adaptive_bake(context):
+    global adaptive_bake
+    if adaptive_bake:
+        restore_adaptive_settings(context)
+        adaptive_bake = None
+
+# Bake Cache
+def get_bake_cache(context):
+    properties = context.scene.lightmap_baker_properties
+
+    # Next to the exported lightmap by default
+    if properties.cache_directory:
+        directory = bpy.path.abspath(properties.cache_directory)
+    else:
+        directory = os.path.join(os.path.dirname(get_img_filpath()), "lightmap_cache")
+
+    return cache.BakeCache(directory, properties.cache_max_size * 1024 * 1024)
+
+# Store the objects baked by this bake in the cache
+def store_cache_entries(context, raw_pixels):
+    properties = context.scene.lightmap_baker_properties
+    bake_cache = get_bake_cache(context)
+    settings_hash = fingerprint.get_settings_hash(properties)
+    depsgraph = context.evaluated_depsgraph_get()
+    height, width = raw_pixels.shape[:2]
+
+    for item in context.scene.lightmap_baker_objects:
+        if item.bake_skip or item.objects_list not in pending_fingerprints:
+            continue
+
+        # Only the UV region of the object is rasterized
+        region = coverage.object_region(get_item_object(item), width, height, depsgraph, properties.bake_margin)
+        if region is None:
+            continue
+
+        x, y, covered, mask = region
+        tile_pixels = raw_pixels[y:y + mask.shape[0], x:x + mask.shape[1]]
+        bake_cache.store(cache.get_key(pending_fingerprints[item.objects_list], settings_hash), x, y, mask, covered, tile_pixels, item.bake_time)
+
+    properties.cache_size = bake_cache.evict() / (1024 * 1024)
+
+# Lightmap material registry
+# Each material of the baked objects is listed once, with its output node, the
+# shader it was connected to and its lightmap texture node, so previewing the
+# lightmap goes through every material once instead of every material slot.
+def get_material_registry_entries(scene):
+    return {entry.material: entry for entry in scene.lightmap_baker_materials if entry.material}
+
+def register_lightmap_material(scene, registry_entries, material):
+    entry = registry_entries.get(material)
+    if not entry:
+        entry = scene.lightmap_baker_materials.add()
+        entry.material = material
+        registry_entries[material] = entry
+
+    material_output = find_material_output_node(material)
+
+    entry.name = material.name
+    entry.output_node = material_output.name if material_output else ""
+    entry.texture_node = "Bake_Texture_Node"
+
+# Registry of the materials of the objects list, for lightmaps baked before the registry existed
+def update_material_registry(scene):
+    registry_entries = get_material_registry_entries(scene)
+
+    for item in scene.lightmap_baker_objects:
+        obj = get_item_object(item)
+        if obj and obj.data.materials:
+            for material_slot in obj.material_slots:
+                obj_material = material_slot.material
+                if obj_material and obj_material.use_nodes and obj_material not in registry_entries:
+                    if obj_material.node_tree.nodes.get("Bake_Texture_Node"):
+                        register_lightmap_material(scene, registry_entries, obj_material)
+
+    return registry_entries
+
+# Files saved before the material registry kept the shader of each material in
+# a "material:node,..." string on every list entry. Blender still loads the
+# string as an ID property, its shaders go to the registry before it's dropped.
+def migrate_nodes_dictionary(scene):
+    registry_entries = get_material_registry_entries(scene)
+
+    for item in scene.lightmap_baker_objects:
+        nodes_dictionary = item.get("nodes_dictionary")
+        if nodes_dictionary is None:
+            continue
+
+        for material_shader in nodes_dictionary.split(','):
+            material_name, _, node_name = material_shader.rpartition(':')
+            material = bpy.data.materials.get(material_name)
+
+            if material and material.use_nodes and material.node_tree.nodes.get("Bake_Texture_Node"):
+                register_lightmap_material(scene, registry_entries, material)
+                if not registry_entries[material].shader_node:
+                    registry_entries[material].shader_node = node_name
+
+        del item["nodes_dictionary"]
+
+    if not scene.lightmap_baker_properties.preview_diffuse_enabled:
+        return
+
+    # Materials saved with the preview on and no shader on record: the shader
+    # the lightmap replaced is the only one left unlinked
+    for material, entry in update_material_registry(scene).items():
+        if entry.shader_node or not material.node_tree:
+            continue
+
+        nodes = material.node_tree.nodes
+        texture_node = nodes.get(entry.texture_node)
+        material_output = nodes.get(entry.output_node)
+        if not texture_node or not material_output or not material_output.inputs[0].is_linked:
+            continue
+
+        if material_output.inputs[0].links[0].from_node == texture_node:
+            shader_nodes = [node for node in nodes if node != texture_node and node.outputs
+                            and node.outputs[0].type == 'SHADER' and not node.outputs[0].is_linked]
+            if len(shader_nodes) == 1:
+                entry.shader_node = shader_nodes[0].name
+
+# Object of a list entry. Entries listed before the pointer existed only know
+# the name, deleted objects are kept alive by the pointer but left every scene.
+def get_item_object(item):
+    obj = item.object or bpy.data.objects.get(item.objects_list)
+    if obj and not obj.users_scene:
+        return None
+
+    return obj
+
+def add_list_item(scene, obj, from_rule=False):
+    new_item = scene.lightmap_baker_objects.add()
+    new_item.objects_list = obj.name
+    new_item.object = obj
+    new_item.from_rule = from_rule
+
+    return new_item
+
+# Bake set rules are applied again once objects were added, removed, renamed
+# or had their custom properties edited, a moment after the last change
+BAKE_SETS_DELAY = 0.5
+
+bake_sets_dirty = False
+scene_object_names = None
+
+# Names of the objects the rules matched when they were last applied
+bake_set_names = set()
+
+def apply_bake_set_rules(scene):
+    global bake_sets_dirty, bake_set_names
+    bake_sets_dirty = False
+
+    matched_objects = bakesets.resolve_rules(scene.lightmap_baker_rules, scene.objects)
+    matched_set = set(matched_objects)
+    bake_set_names = {obj.name for obj in matched_objects}
+    objects_list = scene.lightmap_baker_objects
+
+    # Entries of the rules that no longer match, from the end so indices hold
+    for index in reversed(range(len(objects_list))):
+        item = objects_list[index]
+        if item.from_rule and get_item_object(item) not in matched_set:
+            objects_list.remove(index)
+
+    listed_objects = {get_item_object(item) for item in objects_list}
+    for obj in matched_objects:
+        if obj not in listed_objects:
+            add_list_item(scene, obj, from_rule=True)
+
+def refresh_bake_sets():
+    scene = bpy.context.scene
+
+    # Never touch the list of a running bake
+    if scene.lightmap_baker_properties.busy:
+        return 1.0
+
+    if bake_sets_dirty:
+        apply_bake_set_rules(scene)
+        refresh_ui()
+
+    return None
+
+def mark_bake_sets_dirty():
+    global bake_sets_dirty
+
+    if not bake_sets_dirty:
+        bake_sets_dirty = True
+        bpy.app.timers.register(refresh_bake_sets, first_interval=BAKE_SETS_DELAY)
+
+def on_rule_updated(self, context):
+    mark_bake_sets_dirty()
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+    global scene_object_names
+
+    # Preflight results of the objects whose geometry, UVs or material slots
+    # changed. A material assigned to a slot is a shading update of the object,
+    # or of its mesh, and an edited node tree an update of the material.
+    if preflight.object_results:
+        materials = set()
+        meshes = set()
+        for update in depsgraph.updates:
+            updated = update.id.original
+            if isinstance(updated, bpy.types.Object):
+                if update.is_updated_geometry or update.is_updated_shading:
+                    preflight.invalidate(updated.name)
+            elif isinstance(updated, bpy.types.Material):
+                materials.add(updated.name)
+            elif isinstance(updated, bpy.types.Mesh):
+                meshes.add(updated.name)
+
+        if materials or meshes:
+            for obj_name in list(preflight.object_results):
+                obj = bpy.data.objects.get(obj_name)
+                if (obj is None or (obj.data and obj.data.name in meshes)
+                        or any(slot.material and slot.material.name in materials for slot in obj.material_slots)):
+                    preflight.invalidate(obj_name)
+
+    if not scene.lightmap_baker_rules:
+        return
+
+    # Objects added, removed or renamed. Names are compared, an object added
+    # and another removed by the same update keep the count.
+    object_names = {obj.name for obj in scene.objects}
+    if object_names != scene_object_names or depsgraph.id_type_updated('COLLECTION'):
+        scene_object_names = object_names
+        mark_bake_sets_dirty()
+        return
+
+    # Updated objects entering or leaving the rules, a custom property was
+    # set or cleared. Transforms and edits keep the match as it was.
+    if depsgraph.id_type_updated('OBJECT'):
+        matches = bakesets.get_matcher(scene.lightmap_baker_rules)
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Object):
+                obj = update.id.original
+                if matches(obj) != (obj.name in bake_set_names):
+                    mark_bake_sets_dirty()
+                    return
+
+# Preview Lightmaps
+def lightmap_preview_diffuse(context):
+    if context.scene.lightmap_baker_properties.preview_diffuse_enabled:
+        connect_lightmap_to_shader_output(context)
+    else:
+        disconnect_lightmap_to_shader_output(context)
+
+def connect_lightmap_to_shader_output(context):
+    for entry in context.scene.lightmap_baker_materials:
+        obj_material = entry.material
+        if not obj_material:
+            continue
+
+        nodes = obj_material.node_tree.nodes
+        texture_node = nodes.get(entry.texture_node)
+        material_output = nodes.get(entry.output_node)
+
+        if texture_node and material_output:
+            # Save linked node here, unless the lightmap is already connected
+            shader_node = find_shader_connected_to_material_output(obj_material, material_output)
+            if shader_node and shader_node != texture_node:
+                entry.shader_node = shader_node.name
+
+            # Connect the lightmap
+            obj_material.node_tree.links.new(texture_node.outputs[0], material_output.inputs[0])
+
+def disconnect_lightmap_to_shader_output(context):
+    for entry in context.scene.lightmap_baker_materials:
+        obj_material = entry.material
+        if not obj_material or not entry.shader_node:
+            continue
+
+        nodes = obj_material.node_tree.nodes
+        original_shader_node = nodes.get(entry.shader_node)
+        material_output = nodes.get(entry.output_node)
+
+        if original_shader_node and material_output:
+            print(f"Restored Node {original_shader_node.name} in Material {obj_material.name}")
+            obj_material.node_tree.links.new(original_shader_node.outputs[0], material_output.inputs[0])
+
+def find_shader_connected_to_material_output(material, material_output=None):
+    material_output = material_output or find_material_output_node(material)
+    
+    for n_input in material_output.inputs:
+        for node_link in n_input.links:
+            return node_link.from_node
+        return None
+
+def find_material_output_node(obj_material):
+    # Output node Cycles renders with, looked up by Blender itself
+    material_output = obj_material.node_tree.get_output_node('CYCLES')
+    if material_output:
+        return material_output
+
+    for node in obj_material.node_tree.nodes:
+        if node.type == 'OUTPUT_MATERIAL':
+            return node
+    return None
+
+# Draft Bake
+# A quick look at the light placement: every object is baked in a single pass
+# into its own image, a quarter of the lightmap resolution with a few samples,
+# denoised with a bilateral blur. The draft is previewed through the lightmap
+# texture nodes, upsampled by their cubic interpolation, and the lightmap and
+# the bake settings are left as they were.
+DRAFT_RESOLUTION_DIVISOR = 4
+
+# Material name: image its lightmap texture node showed before the draft
+draft_previous_images = {}
+
+def get_draft_image_name(context):
+    return context.scene.lightmap_baker_properties.lightmap_name + "_draft"
+
+def create_draft_image(context):
+    existing_image = bpy.data.images.get(get_draft_image_name(context))
+    if existing_image:
+        bpy.data.images.remove(existing_image, do_unlink=True)
+
+    resolution = max(16, int(context.scene.lightmap_baker_properties.lightmap_resolution) // DRAFT_RESOLUTION_DIVISOR)
+    image = bpy.data.images.new(name=get_draft_image_name(context), width=resolution, height=resolution, float_buffer=True)
+    image.colorspace_settings.name = 'Linear Rec.709'
+
+    return image
+
+def get_registry_texture_node(entry):
+    return entry.material.node_tree.nodes.get(entry.texture_node) if entry.material else None
+
+# Lightmap texture nodes of every registered material show the draft, or the lightmap
+def set_preview_image(context, image):
+    for entry in context.scene.lightmap_baker_materials:
+        texture_node = get_registry_texture_node(entry)
+        if texture_node:
+            texture_node.image = image
+
+def on_preview_draft_updated(self, context):
+    if self.preview_draft:
+        image = bpy.data.images.get(get_draft_image_name(context))
+        if image:
+            set_preview_image(context, image)
+        return
+
+    # Each atlas has its own lightmap
+    lightmap = bpy.data.images.get(self.lightmap_name)
+    for entry in context.scene.lightmap_baker_materials:
+        texture_node = get_registry_texture_node(entry)
+        image = bpy.data.images.get(draft_previous_images.get(entry.material.name, "")) if texture_node else None
+        if texture_node and (image or lightmap):
+            texture_node.image = image or lightmap
+
+def bake_draft(context):
+    properties = context.scene.lightmap_baker_properties
+    scene = context.scene
+    objects = [get_item_object(item) for item in scene.lightmap_baker_objects]
+
+    time_start = time.perf_counter()
+
+    # Lightmaps to show again when the draft preview is turned off
+    if not properties.preview_draft:
+        draft_previous_images.clear()
+        for entry in scene.lightmap_baker_materials:
+            texture_node = get_registry_texture_node(entry)
+            if texture_node and texture_node.image:
+                draft_previous_images[entry.material.name] = texture_node.image.name
+
+    image = create_draft_image(context)
+    setup_lightmap_nodes(context, [obj.name for obj in objects], image)
+
+    # Settings of the scene, put back once the draft is baked
+    sample_count = scene.cycles.samples
+    bake_margin = scene.render.bake.margin
+    selected_objects = list(context.selected_objects)
+    active_object = context.view_layer.objects.active
+    uv_indices = {obj: obj.data.uv_layers.active_index for obj in objects}
+
+    try:
+        bpy.ops.object.mode_set(mode='OBJECT')
+        bpy.ops.object.select_all(action='DESELECT')
+        context.view_layer.objects.active = objects[0]
+        for obj in objects:
+            obj.select_set(True)
+            obj.data.uv_layers.active_index = 1
+
+        bpy.types.BakeSettings.use_pass_direct = True
+        bpy.types.BakeSettings.use_pass_indirect = True
+        bpy.types.BakeSettings.use_pass_color = False
+
+        # The margin is filled below, at the draft resolution
+        scene.render.bake.margin = 0
+        scene.cycles.samples = properties.draft_sample_count
+
+        print(f"Baking a {image.size[0]}x{image.size[1]} draft of {len(objects)} objects with {scene.cycles.samples} samples")
+        bpy.ops.object.bake('EXEC_DEFAULT', type='DIFFUSE', use_clear=True)
+    finally:
+        scene.cycles.samples = sample_count
+        scene.render.bake.margin = bake_margin
+
+        for obj, uv_index in uv_indices.items():
+            obj.data.uv_layers.active_index = uv_index
+
+        bpy.ops.object.select_all(action='DESELECT')
+        for obj in selected_objects:
+            obj.select_set(True)
+        context.view_layer.objects.active = active_object
+
+    width, height = image.size
+    pixels = postprocess.read_pixels(image)
+    mask = coverage.objects_coverage(objects, width, height, context.evaluated_depsgraph_get())
+
+    # The few samples are smoothed out, edges of the lighting are kept
+    if properties.draft_denoise:
+        pixels = postprocess.bilateral_blur(pixels, postprocess.gaussian_blur(pixels, 2), 1,
+                                            properties.bilateral_blur_color_sigma, properties.bilateral_blur_space_sigma)
+
+    margin = max(1, properties.bake_margin // DRAFT_RESOLUTION_DIVISOR)
+    postprocess.write_pixels(image, coverage.fill_margin(pixels, mask, margin))
+
+    # Same wiring as the lightmap preview, the texture nodes show the draft
+    properties.preview_draft = True
+    properties.preview_diffuse_enabled = True
+    lightmap_preview_diffuse(context)
+
+    properties.draft_time = time.perf_counter() - time_start
+    print(f"Draft baked in {properties.draft_time:.2f} sec")
+
+# What we do when bake is done?
+def calculate_elapsed_time():
+    bpy.context.scene.lightmap_baker_properties.elapsed_time = time.perf_counter() - bpy.context.scene.lightmap_baker_properties.time_start
+
+# Keep the time per object of the last bake of each mode, so both loops can be compared
+def record_bake_mode_timing(context):
+    properties = context.scene.lightmap_baker_properties
+    total_objects = len(context.scene.lightmap_baker_objects)
+
+    if not total_objects:
+        return
+
+    time_per_object = properties.elapsed_time / total_objects
+
+    if properties.bake_mode == 'BATCHED':
+        properties.batched_mode_time = time_per_object
+    elif properties.bake_mode == 'OBJECT':
+        properties.object_mode_time = time_per_object
+
+    print(f"Baked {total_objects} objects in {properties.elapsed_time:.2f} sec ({time_per_object:.3f} sec/object, {properties.bake_mode.lower()} mode)")
+
+    if properties.object_mode_time and properties.batched_mode_time:
+        speedup = properties.object_mode_time / properties.batched_mode_time
+        print(f"Batched bake is {speedup:.2f}x the speed of the per object loop")
+
+def pack_lightmap_texture():
+
+    image_name = bpy.context.scene.lightmap_baker_properties.lightmap_name
+    image = bpy.data.images[image_name]
+    image.pack()
+
+# Time a single pack of a float lightmap at each resolution, this is what
+# used to be paid after every baked object
+def measure_pack_cost(resolutions):
+    pack_times = {}
+
+    for resolution in resolutions:
+        image = bpy.data.images.new(
+            name="Lightmap_Pack_Cost",
+            width=resolution,
+            height=resolution,
+            float_buffer=True
+        )
+
+        time_start = time.perf_counter()
+        image.pack()
+        pack_times[resolution] = time.perf_counter() - time_start
+
+        bpy.data.images.remove(image, do_unlink=True)
+
+    return pack_times
+
+def save_image():
+    scene = bpy.context.scene
+
+    lightmap_name = scene.lightmap_baker_properties.lightmap_name
+    
+    if scene.lightmap_baker_properties.export_enabled:
+        filepath = bpy.path.abspath(scene.lightmap_baker_properties.export_path)
+    else:
+        filepath = bpy.path.abspath(tempfile.gettempdir())
+
+    filepath = os.path.join(filepath, f"{lightmap_name}.exr")
+
+    # Set the render settings for OpenEXR codec to ZIP compression
+    scene.render.image_settings.file_format = 'OPEN_EXR'
+    scene.render.image_settings.color_mode = 'RGB'
+    scene.render.image_settings.exr_codec = 'ZIP'
+    scene.render.filepath = filepath
+
+    # Save the image to the specified file path
+    image = bpy.data.images.get(lightmap_name)
+
+    # Write the in memory buffer, the image becomes file backed without a reload
+    if scene.lightmap_baker_properties.postprocess_engine == 'NUMPY':
+        image.filepath_raw = filepath
+        image.file_format = 'OPEN_EXR'
+        image.save()
+        return
+
+    image.save_render(filepath=filepath, scene=scene)
+    image.filepath = get_img_filpath()
+
+    # The lightmap stays in memory while baking, it is only packed at the very end
+    if image.packed_file:
+        image.unpack(method='REMOVE')
+    else:
+        image.source = 'FILE'
+
+def get_udim_filpath():
+    # The tile number goes before the extension of the file name only
+    root, extension = os.path.splitext(get_img_filpath())
+    return f"{root}.<UDIM>{extension}"
+
+# Save every UDIM tile in its own file, then post process the files
+def finalize_udim_lightmap(context):
+    properties = context.scene.lightmap_baker_properties
+    image = bpy.data.images[properties.lightmap_name]
+    filepath = get_udim_filpath()
+
+    image.filepath_raw = filepath
+    image.file_format = 'OPEN_EXR'
+    image.save()
+
+    objects = [get_item_object(item) for item in context.scene.lightmap_baker_objects]
+    udim.process_tiles(image, filepath, objects, properties, context.evaluated_depsgraph_get())
+
+    image.filepath = filepath
+    image.source = 'TILED'
+    image.reload()
+
+    if not properties.export_enabled:
+        image.pack()
+        udim.remove_tile_files(image, filepath)
+
+def get_img_filpath():
+    scene = bpy.context.scene
+
+    lightmap_name = scene.lightmap_baker_properties.lightmap_name
+    
+    if scene.lightmap_baker_properties.export_enabled:
+        filepath = bpy.path.abspath(scene.lightmap_baker_properties.export_path)
+    else:
+        filepath = bpy.path.abspath(tempfile.gettempdir())
+
+    filepath = os.path.join(filepath, f"{lightmap_name}.exr")
+
+    return filepath
+
+def apply_postprocess_in_memory():
+    property = bpy.context.scene.lightmap_baker_properties
+
+    if not property.use_bilateral_blur:
+        return
+
+    lightmap = bpy.data.images.get(property.lightmap_name)
+
+    pixels = postprocess.read_pixels(lightmap)
+    pixels = postprocess.apply_filters(pixels, property)
+    postprocess.write_pixels(lightmap, pixels)
+
+def apply_postprocess():
+    scene = bpy.context.scene
+    property =  scene.lightmap_baker_properties
+
+    # The in memory engine takes care of the blur
+    use_bilateral_blur = property.use_bilateral_blur and property.postprocess_engine == 'COMPOSITOR'
+
+    # Cancel compositing if no checkbox enabled
+    if not property.use_denoise and not use_bilateral_blur: 
+        return
+    
+    scene.use_nodes = True
+    compositor = scene.node_tree
+    nodes = compositor.nodes
+    
+    lightmap_name = scene.lightmap_baker_properties.lightmap_name
+    lightmap = bpy.data.images.get(lightmap_name)
+
+
+    image_node = nodes.get(lightmap_name)
+
+    if not image_node:
+        image_node = nodes.new(type='CompositorNodeImage')
+        image_node.location = (0, 0)
+        image_node.name = lightmap_name         
+
+    image_node.image = lightmap
+    composite_node = compositor.nodes.get('Composite', None)
+
+    if not composite_node:
+        composite_node = compositor.nodes.new(type='CompositorNodeComposite')
+        composite_node.location = (800, 0)
+
+
+    # Denoise and Bilateral Blur
+    if property.use_denoise and use_bilateral_blur:
+
+        denoise_node = nodes.get('Denoise')
+
+        # If the Denoise node doesn't exist, create one
+        if not denoise_node:
+            denoise_node = nodes.new(type='CompositorNodeDenoise')
+            denoise_node.location = (200, 0)
+            denoise_node.name = 'Denoise'
+
+        bilateral_node = nodes.get('Bilateral Blur')
+
+        if not bilateral_node:
+            bilateral_node = nodes.new(type='CompositorNodeBilateralblur')
+            bilateral_node.location = (600, 0)
+            bilateral_node.name = 'Bilateral Blur'
+            bilateral_node.iterations = property.bilateral_blur_iterations
+            bilateral_node.sigma_color = property.bilateral_blur_color_sigma
+            bilateral_node.sigma_space = property.bilateral_blur_space_sigma
+
+        # Check if Blur node already exists
+        blur_node = nodes.get('Blur')
+
+        if not blur_node:
+            blur_node = nodes.new(type='CompositorNodeBlur')
+            blur_node.location = (400, 0)
+            blur_node.name = 'Blur'
+            blur_node.size_x = 2
+            blur_node.size_y = 2
+
+        # Connect image node 
+        compositor.links.new(image_node.outputs['Image'], denoise_node.inputs['Image'])
+
+        # Connect denoise node 
+        compositor.links.new(denoise_node.outputs['Image'], blur_node.inputs['Image'])
+        compositor.links.new(denoise_node.outputs['Image'], bilateral_node.inputs['Image'])
+
+        # Connect Blur node 
+        compositor.links.new(blur_node.outputs['Image'], bilateral_node.inputs['Determinator'])
+
+        # Connect Bilateral Blur node
+        compositor.links.new(bilateral_node.outputs['Image'], composite_node.inputs['Image'])
+
+    # Denoise
+    elif property.use_denoise:
+        # Check if a Denoise node already exists
+        denoise_node = nodes.get('Denoise')
+
+        # If the Denoise node doesn't exist, create one
+        if not denoise_node:
+            denoise_node = nodes.new(type='CompositorNodeDenoise')
+            denoise_node.location = (200, 0)
+            denoise_node.name = 'Denoise'
+
+        compositor.links.new(image_node.outputs['Image'], denoise_node.inputs['Image'])
+        compositor.links.new(denoise_node.outputs['Image'], composite_node.inputs['Image'])
+
+    # Bilateral Blur
+    elif use_bilateral_blur:
+        # Check if Bilateral Blur node already exists
+        bilateral_node = nodes.get('Bilateral Blur')
+
+        if not bilateral_node:
+            bilateral_node = nodes.new(type='CompositorNodeBilateralblur')
+            bilateral_node.location = (600, 0)
+            bilateral_node.name = 'Bilateral Blur'
+            bilateral_node.iterations = property.bilateral_blur_iterations
+            bilateral_node.sigma_color = property.bilateral_blur_color_sigma
+            bilateral_node.sigma_space = property.bilateral_blur_space_sigma
+
+        # Check if Blur node already exists
+        blur_node = nodes.get('Blur')
+
+        if not blur_node:
+            blur_node = nodes.new(type='CompositorNodeBlur')
+            blur_node.location = (400, 0)
+            blur_node.name = 'Blur'
+            blur_node.size_x = 2
+            blur_node.size_y = 2
+
+        # Connect image node to Blur node
+        compositor.links.new(image_node.outputs['Image'], blur_node.inputs['Image'])
+
+        # Connect image node to Bilateral Blur node
+        compositor.links.new(image_node.outputs['Image'], bilateral_node.inputs['Image'])
+        compositor.links.new(blur_node.outputs['Image'], bilateral_node.inputs['Determinator'])
+
+        # Connect Bilateral Blur node to Composite node
+        compositor.links.new(bilateral_node.outputs['Image'], composite_node.inputs['Image'])
+
+
+
+    # Render Post Process
+    width, height = lightmap.size
+    scene.render.resolution_x = width
+    scene.render.resolution_y = height
+
+    bpy.ops.render.render(write_still=True, use_viewport=False)   
+    lightmap.reload()
+    
+    # The in memory engine filters the denoised lightmap next, and packs it once done
+    if not property.export_enabled and property.postprocess_engine == 'COMPOSITOR':
+        lightmap.pack()
+        if os.path.exists(get_img_filpath()):
+            os.remove(get_img_filpath())
+
+# Bake Scheduler
+# A single timer drives the bake loop and the elapsed time. The bake handlers
+# restart it with no delay, so the next object is dispatched as soon as Cycles is done.
+SCHEDULER_INTERVAL = 0.1
+
+# Background processes of the running parallel bake
+parallel_bake_job = None
+
+# Tiles of the running tiled bake
+tiled_bake_job = None
+
+# Jobs of the running queue bake
+queue_bake_job = None
+
+# When the running Cycles bake was dispatched
+batch_time_start = 0.0
+
+# When the addon started waiting for the scheduler to dispatch the next bake
+idle_time_start = 0.0
+
+def start_bake_scheduler():
+    if bpy.app.timers.is_registered(bake_scheduler):
+        bpy.app.timers.unregister(bake_scheduler)
+    bpy.app.timers.register(bake_scheduler, first_interval=0.0)
+
+def stop_bake_scheduler():
+    if bpy.app.timers.is_registered(bake_scheduler):
+        bpy.app.timers.unregister(bake_scheduler)
+
+def bake_scheduler():
+    # Timers run without a window, operators need one
+    window_manager = bpy.context.window_manager
+    if not window_manager.windows:
+        return None
+
+    window = window_manager.windows[0]
+    with bpy.context.temp_override(window=window, screen=window.screen):
+        return bake_scheduler_step(bpy.context)
+
+def bake_scheduler_step(context):
+    properties = context.scene.lightmap_baker_properties
+    objects_list = context.scene.lightmap_baker_objects
+    total_objects = len(objects_list)
+
+    # Stop when task cancelled
+    if properties.cancel_bake or not properties.busy:
+        if parallel_bake_job:
+            cancel_parallel_bake(context)
+        if tiled_bake_job:
+            cancel_tiled_bake(context)
+        if queue_bake_job:
+            cancel_queue_bake(context)
+        if adaptive_bake:
+            cancel_adaptive_bake(context)
+        return None
+
+    calculate_elapsed_time()
+
+    if parallel_bake_job:
+        return parallel_bake_step(context)
+
+    if tiled_bake_job:
+        return tiled_bake_step(context)
+
+    if queue_bake_job:
+        return queue_bake_step(context)
+
+    if properties.bake_in_progress:
+        update_bake_progress(context, properties.objects_index + estimate_batch_progress(context))
+    else:
+        update_bake_progress(context, properties.objects_index)
+
+        # Check for remaining objects in the list
+        if properties.objects_index < total_objects:
+            objects, batch_count = get_bake_batch(context)
+
+            # Only skipped objects were left
+            if not objects:
+                properties.objects_index += batch_count
+                return 0.0
+
+            properties.bake_batch_count = batch_count
+            properties.bake_in_progress = True
+            start_batch_timer()
+            profiler.record("idle", idle_time_start, batch_time_start, **get_span_args(context))
+            bake_diffuse(context, objects)
+
+        # Bake the objects again with other seeds or more samples
+        elif start_next_adaptive_pass(context):
+            return 0.0
+
+        # The next atlas gets its own lightmap
+        elif start_next_atlas(context):
+            return 0.0
+
+        # Consider Bake Done!
+        else:
+            profiler.record("idle", idle_time_start, time.perf_counter(), **get_span_args(context))
+            handle_bake_completion(context)
+            refresh_ui()
+            return None
+
+    refresh_ui()
+    return SCHEDULER_INTERVAL
+
+def update_bake_progress(context, baked_objects):
+    properties = context.scene.lightmap_baker_properties
+
+    atlas_progress = baked_objects / len(context.scene.lightmap_baker_objects)
+    if adaptive_bake:
+        atlas_progress = (adaptive_bake.pass_index + atlas_progress) / sampling.PASS_COUNT
+    properties.bake_progress = (properties.atlas_index + atlas_progress) / properties.atlas_count
+
+# Entries of the running batch baked by now. Cycles only calls the bake
+# handlers once the whole batch is done, so the objects are counted from the
+# time each one took in its last bake, or the time per object of the last bake.
+def estimate_batch_progress(context):
+    properties = context.scene.lightmap_baker_properties
+    items = get_batch_items(context)
+
+    if len(items) < 2:
+        return 0.0
+
+    fallback = properties.batched_mode_time or properties.object_mode_time
+    times = np.array([item.bake_time or fallback for item in items])
+    if not times.all():
+        return 0.0
+
+    # The last object is only done once Cycles reports the batch
+    baked = min(np.searchsorted(np.cumsum(times), time.perf_counter() - batch_time_start, side='right'), len(items) - 1)
+    return properties.bake_batch_count * baked / len(items)
+
+def record_worker_timings(context, timings):
+    bake_times = {timing["object"]: timing["time"] for timing in timings}
+
+    for item in context.scene.lightmap_baker_objects:
+        if item.objects_list in bake_times:
+            item.bake_time = bake_times[item.objects_list]
+
+def start_batch_timer():
+    global batch_time_start
+    batch_time_start = time.perf_counter()
+
+def start_parallel_bake(context, objects_to_bake):
+    global parallel_bake_job
+    properties = context.scene.lightmap_baker_properties
+
+    # Unchanged objects were already copied from the previous bake
+    objects_to_bake = [item.objects_list for item in context.scene.lightmap_baker_objects if not item.bake_skip]
+
+    parallel_bake_job = parallel.ParallelBake(objects_to_bake, properties.parallel_workers, properties.parallel_threads)
+    parallel_bake_job.start()
+
+def parallel_bake_step(context):
+    global parallel_bake_job
+    properties = context.scene.lightmap_baker_properties
+
+    properties.objects_index = parallel_bake_job.finished_objects()
+    properties.bake_progress = properties.objects_index / len(context.scene.lightmap_baker_objects)
+
+    if not parallel_bake_job.poll():
+        refresh_ui()
+        return SCHEDULER_INTERVAL
+
+    failed_workers = parallel_bake_job.failed_workers()
+    if failed_workers:
+        print(f"Parallel bake failed, see the worker logs in {parallel_bake_job.directory}")
+        parallel_bake_job = None
+        on_bake_cancel(None)
+        return None
+
+    span_args = get_span_args(context)
+    profiler.record("parallel_bake", parallel_bake_job.time_start, time.perf_counter(), workers=len(parallel_bake_job.subsets), **span_args)
+
+    with profiler.span("merge_buffers", **span_args):
+        parallel_bake_job.merge(context, bpy.data.images[properties.lightmap_name])
+    record_worker_timings(context, parallel_bake_job.get_timings())
+    parallel_bake_job.cleanup()
+    parallel_bake_job = None
+
+    handle_bake_completion(context)
+    refresh_ui()
+    return None
+
+def cancel_parallel_bake(context):
+    global parallel_bake_job
+
+    parallel_bake_job.terminate()
+    parallel_bake_job = None
+    on_bake_cancel(None)
+
+def start_queue_bake(context, objects_to_bake):
+    global queue_bake_job
+    properties = context.scene.lightmap_baker_properties
+
+    # Unchanged objects were already copied from the previous bake
+    objects_to_bake = [item.objects_list for item in context.scene.lightmap_baker_objects if not item.bake_skip]
+
+    queue_bake_job = parallel.QueueBake(bpy.path.abspath(properties.queue_directory), objects_to_bake, jobqueue.get_settings(properties),
+                                        properties.queue_job_size, properties.queue_local_workers, properties.parallel_threads,
+                                        properties.queue_timeout)
+    queue_bake_job.start()
+
+def queue_bake_step(context):
+    global queue_bake_job
+    properties = context.scene.lightmap_baker_properties
+
+    # The queue is only looked at every second
+    if time.perf_counter() - queue_bake_job.last_poll < jobqueue.POLL_INTERVAL:
+        return SCHEDULER_INTERVAL
+    queue_bake_job.last_poll = time.perf_counter()
+
+    properties.objects_index = queue_bake_job.finished_objects()
+    properties.bake_progress = properties.objects_index / len(context.scene.lightmap_baker_objects)
+
+    if not queue_bake_job.poll():
+        refresh_ui()
+        return SCHEDULER_INTERVAL
+
+    failed_jobs = queue_bake_job.failed_jobs()
+    if failed_jobs:
+        print(f"Queue bake failed, see the worker logs in {os.path.join(queue_bake_job.queue.directory, 'logs')}: {'; '.join(failed_jobs)}")
+        cancel_queue_bake(context)
+        return None
+
+    span_args = get_span_args(context)
+    profiler.record("queue_bake", queue_bake_job.time_start, time.perf_counter(), jobs=len(queue_bake_job.subsets), **span_args)
+
+    with profiler.span("merge_buffers", **span_args):
+        queue_bake_job.merge(bpy.data.images[properties.lightmap_name])
+    record_worker_timings(context, queue_bake_job.get_timings())
+    queue_bake_job.cleanup()
+    queue_bake_job = None
+
+    handle_bake_completion(context)
+    refresh_ui()
+    return None
+
+def cancel_queue_bake(context):
+    global queue_bake_job
+
+    queue_bake_job.terminate()
+    queue_bake_job = None
+    on_bake_cancel(None)
+
+def start_tiled_bake(context, objects_to_bake):
+    global tiled_bake_job
+    properties = context.scene.lightmap_baker_properties
+
+    tiled_bake_job = tiles.TiledBake(
+        objects_to_bake,
+        int(properties.lightmap_resolution),
+        int(properties.tile_size),
+        properties.bake_margin,
+        tiles.get_halo(properties),
+        get_img_filpath(),
+        properties.max_tiles_in_memory,
+    )
+
+# Dispatch the bake of the next tile, False once every tile is done
+def bake_next_tile(context, execution_context='INVOKE_DEFAULT'):
+    properties = context.scene.lightmap_baker_properties
+
+    objects = tiled_bake_job.start_tile(bpy.data.images[properties.lightmap_name])
+    if objects is None:
+        return False
+
+    # Tiles don't walk the object list
+    properties.bake_batch_count = 0
+    bake_diffuse(context, objects, execution_context)
+    return True
+
+def finish_tile(context):
+    properties = context.scene.lightmap_baker_properties
+
+    with profiler.span("finish_tile", **get_span_args(context)):
+        tiled_bake_job.finish_tile(context, bpy.data.images[properties.lightmap_name])
+
+def tiled_bake_step(context):
+    properties = context.scene.lightmap_baker_properties
+
+    if properties.bake_in_progress:
+        refresh_ui()
+        return SCHEDULER_INTERVAL
+
+    # The previous tile is baked
+    if tiled_bake_job.current_objects:
+        finish_tile(context)
+
+    properties.bake_progress = tiled_bake_job.progress()
+    properties.objects_index = round(properties.bake_progress * len(context.scene.lightmap_baker_objects))
+
+    properties.bake_in_progress = True
+    start_batch_timer()
+    profiler.record("idle", idle_time_start, batch_time_start, **get_span_args(context))
+
+    if not bake_next_tile(context):
+        properties.bake_in_progress = False
+        handle_bake_completion(context)
+        refresh_ui()
+        return None
+
+    refresh_ui()
+    return SCHEDULER_INTERVAL
+
+def finalize_tiled_lightmap(context):
+    global tiled_bake_job
+    properties = context.scene.lightmap_baker_properties
+
+    tiled_bake_job.close()
+    tiled_bake_job = None
+
+    # Peak of the bake itself, the whole lightmap is only loaded below
+    record_peak_memory(context)
+
+    # The lightmap becomes the EXR written on disk, loaded when it's needed
+    image = bpy.data.images[properties.lightmap_name]
+    image.filepath = get_img_filpath()
+    image.source = 'FILE'
+    image.reload()
+
+    if not properties.export_enabled:
+        image.pack()
+        os.remove(get_img_filpath())
+
+def cancel_tiled_bake(context):
+    global tiled_bake_job
+
+    tiled_bake_job.abort()
+    tiled_bake_job = None
+    on_bake_cancel(None)
+
+def record_peak_memory(context):
+    peak_rss = profiler.get_peak_rss()
+    if peak_rss is None:
+        context.scene.lightmap_baker_properties.peak_memory = 0.0
+        print("Peak memory unavailable on this platform")
+        return
+
+    context.scene.lightmap_baker_properties.peak_memory = peak_rss / (1024 * 1024)
+    print(f"Peak memory: {context.scene.lightmap_baker_properties.peak_memory:.0f} MB")
+
+# Bake Profiler
+def get_span_args(context, objects=None):
+    properties = context.scene.lightmap_baker_properties
+    span_args = {"resolution": int(properties.lightmap_resolution), "samples": properties.sample_count}
+
+    if objects:
+        span_args["objects"] = objects
+
+    return span_args
+
+def get_trace_path():
+    return os.path.splitext(get_img_filpath())[0] + "_trace.json"
+
+def write_profile():
+    profiler.write_trace(get_trace_path())
+
+    for stage, total_time, count in profiler.get_summary():
+        print(f"{stage}: {total_time:.2f} sec ({count}x)")
+    print(f"Bake trace written to {get_trace_path()}")
+
+def refresh_ui():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                for region in area.regions:
+                    if region.type == 'UI':
+                        region.tag_redraw()
+                        break
+
+# Properties
+class LIGHTMAPBAKER_properties(bpy.types.PropertyGroup):
+    busy: bpy.props.BoolProperty(
+        name="Busy",
+        description="General State of the bake", #used for the UI lock
+        default=False,
+    )
+
+    bake_in_progress: bpy.props.BoolProperty(
+        name="Bake In Progress",
+        description="",
+        default=False,
+    )
+
+    objects_index: bpy.props.IntProperty(
+        name="Index",
+        description="Index of the selected object in the bake list",
+        default=0,
+    )
+
+    preview_diffuse_enabled: bpy.props.BoolProperty(
+        name="Toggle Lightmap Preview",
+        description="Show only lightmaps on the surface",
+        default=False,
+    )
+
+    preview_draft: bpy.props.BoolProperty(
+        name="Preview Draft",
+        description="Show the last draft bake instead of the lightmap",
+        default=False,
+        update=on_preview_draft_updated,
+    )
+
+    draft_sample_count: bpy.props.IntProperty(
+        name="Draft Samples",
+        description="Number of samples of a draft bake",
+        default=16,
+        min=1,
+    )
+
+    draft_denoise: bpy.props.BoolProperty(
+        name="Draft Denoise",
+        description="Smooth the noise of a draft bake with a bilateral blur",
+        default=True,
+    )
+
+    draft_time: bpy.props.FloatProperty(
+        name="Draft Time",
+        description="Time the last draft bake took",
+        default=0.0,
+    )
+
+    lightmap_baker_uv_map_index: bpy.props.IntProperty(
+        name="Active UV Map Index",
+        description="Active UV Map Index",
+        default=0,
+        min=0,
+        max=1,
+    )
+
+    lightmap_baker_uv_map_name: bpy.props.StringProperty(
+        name="UV Map Name",
+        description="Set the lightmap uv name",
+        default="Lightmap",
+    )
+
+    export_enabled: bpy.props.BoolProperty(
+        name="Export Texture",
+        description="Export lightmap image after baking",
+        default=False,
+    )
+
+    export_path: bpy.props.StringProperty(
+        name="Export Path",
+        description="Path for exporting lightmap image",
+        default="//",
+        subtype='FILE_PATH',
+    )
+
+    automatic_lightmap_preview: bpy.props.BoolProperty(
+        name="Automatic Lightmap Preview",
+        description="Automatically preview lightmaps",
+    )
+
+    lightmap_resolution: bpy.props.EnumProperty(
+        items=[
+            ('64', '64', 'Bake at 512x512 resolution'),
+            ('128', '128', 'Bake at 512x512 resolution'),
+            ('256', '256', 'Bake at 512x512 resolution'),
+            ('512', '512', 'Bake at 512x512 resolution'),
+            ('1024', '1024', 'Bake at 1024x1024 resolution'),
+            ('2048', '2048', 'Bake at 2048x2048 resolution'),
+            ('4096', '4096', 'Bake at 4096x4096 resolution'),
+            ('8192', '8192', 'Bake at 4096x4096 resolution'),
+        ],
+        name="Resolution",
+        description="Choose bake resolution",
+        default='1024',
+    )
+
+    lightmap_name: bpy.props.StringProperty(
+        name="Lightmap Name",
+        description="Name of the baked lightmap texture",
+        default="Lightmap"
+    )
+
+    render_device: bpy.props.EnumProperty(
+        items=[
+            ('CPU', 'CPU', 'Render using CPU'),
+            ('GPU', 'GPU Compute', 'Render using GPU'),
+        ],
+        name="Device",
+        description="Choose render device",
+        default='GPU',
+    )
+
+    sample_count: bpy.props.IntProperty(
+        name="Sample Count",
+        description="Number of samples for baking",
+        default=128,
+        min=1,
+    )
+
+    bake_margin: bpy.props.IntProperty(
+        name="Bake Margin",
+        default=3,
+        min=0,
+        max=64,
+        description="Extend the baked result as a post process filter",
+    )
+
+    profile_bake: bpy.props.BoolProperty(
+        name="Profile Bake",
+        description="Time every stage of the bake and write a Chrome trace next to the lightmap",
+        default=False,
+    )
+
+    margin_mode: bpy.props.EnumProperty(
+        items=[
+            ('JUMP_FLOOD', 'Single Pass', 'Fill the margin of the whole lightmap once the bake is over'),
+            ('CYCLES', 'Cycles', 'Let Cycles extend the margin after every object'),
+        ],
+        name="Margin Mode",
+        description="Choose how the bake margin is generated",
+        default='JUMP_FLOOD',
+    )
+
+    bake_mode: bpy.props.EnumProperty(
+        items=[
+            ('OBJECT', 'Per Object', 'Run one Cycles bake per object'),
+            ('BATCHED', 'Batched', 'Bake several objects sharing the lightmap in a single Cycles bake'),
+            ('PARALLEL', 'Parallel', 'Split the objects across several background Blender processes'),
+            ('TILED', 'Tiled', 'Bake the lightmap one tile at a time and stream the tiles to disk, for very large lightmaps'),
+            ('QUEUE', 'Job Queue', 'Split the objects in jobs in a shared directory, baked by worker processes on this machine or others'),
+        ],
+        name="Bake Mode",
+        description="Choose how objects are sent to Cycles",
+        default='OBJECT',
+    )
+
+    batch_size: bpy.props.IntProperty(
+        name="Batch Size",
+        description="Number of objects baked per Cycles bake, 0 bakes every object at once",
+        default=0,
+        min=0,
+    )
+
+    parallel_workers: bpy.props.IntProperty(
+        name="Workers",
+        description="Number of background Blender processes baking in parallel",
+        default=4,
+        min=1,
+        max=64,
+    )
+
+    parallel_threads: bpy.props.IntProperty(
+        name="Threads per Worker",
+        description="Render threads of each worker, 0 shares the cores of the machine between the workers",
+        default=0,
+        min=0,
+        max=1024,
+    )
+
+    queue_directory: bpy.props.StringProperty(
+        name="Queue Directory",
+        description="Shared directory holding the jobs of a queue bake, workers on other machines watch it with --queue-worker",
+        default="//lightmap_queue/",
+        subtype='DIR_PATH',
+    )
+
+    queue_job_size: bpy.props.IntProperty(
+        name="Objects per Job",
+        description="Objects baked by a worker for each job of the queue",
+        default=16,
+        min=1,
+    )
+
+    queue_local_workers: bpy.props.IntProperty(
+        name="Local Workers",
+        description="Workers started on this machine, 0 leaves the jobs to the workers of other machines",
+        default=2,
+        min=0,
+        max=64,
+    )
+
+    queue_timeout: bpy.props.FloatProperty(
+        name="Claim Timeout",
+        description="Seconds after which the job of a silent worker goes back to the queue",
+        default=600.0,
+        min=10.0,
+    )
+
+    incremental_bake: bpy.props.BoolProperty(
+        name="Incremental Bake",
+        description="Only bake the objects whose geometry, materials or lighting changed since the last bake",
+        default=False,
+    )
+
+    skipped_objects: bpy.props.IntProperty(
+        name="Skipped Objects",
+        description="Number of unchanged objects skipped by the last incremental bake",
+        default=0,
+    )
+
+    skipped_time: bpy.props.FloatProperty(
+        name="Skipped Time",
+        description="Bake time saved by skipping unchanged objects",
+        default=0.0,
+    )
+
+    use_bake_cache: bpy.props.BoolProperty(
+        name="Bake Cache",
+        description="Reuse the pixels of objects already baked with the same inputs and settings, stored on disk",
+        default=False,
+    )
+
+    cache_directory: bpy.props.StringProperty(
+        name="Cache Directory",
+        description="Directory of the bake cache, next to the exported lightmap when empty",
+        default="",
+        subtype='DIR_PATH',
+    )
+
+    cache_max_size: bpy.props.IntProperty(
+        name="Cache Size",
+        description="Maximum size of the bake cache in megabytes, the least recently used entries are removed first",
+        default=2048,
+        min=1,
+    )
+
+    cache_hits: bpy.props.IntProperty(
+        name="Cache Hits",
+        description="Objects of the last bake read from the cache",
+        default=0,
+    )
+
+    cache_misses: bpy.props.IntProperty(
+        name="Cache Misses",
+        description="Objects of the last bake missing from the cache",
+        default=0,
+    )
+
+    cache_size: bpy.props.FloatProperty(
+        name="Cache Size",
+        description="Size of the bake cache in megabytes after the last bake",
+        default=0.0,
+    )
+
+    check_lightmap_uvs: bpy.props.BoolProperty(
+        name="Check Lightmap UVs",
+        description="Before baking, look for overlapping lightmap UVs, UVs outside of the lightmap and islands smaller than a texel",
+        default=True,
+    )
+
+    use_atlas_planner: bpy.props.BoolProperty(
+        name="Atlas Planner",
+        description="Spread the objects over as many lightmaps as needed to reach the texel density, the resolution is the maximum of each lightmap",
+        default=False,
+    )
+
+    texels_per_meter: bpy.props.FloatProperty(
+        name="Texels per Meter",
+        description="Lightmap texel density targeted by the atlas planner",
+        default=32.0,
+        min=0.01,
+    )
+
+    atlas_index: bpy.props.IntProperty(
+        name="Atlas Index",
+        description="Atlas being baked",
+        default=0,
+    )
+
+    atlas_count: bpy.props.IntProperty(
+        name="Atlas Count",
+        description="Number of atlases of the last bake",
+        default=1,
+        min=1,
+    )
 
-def refresh_ui():
-    for window in bpy.context.window_manager.windows:
-        for area in window.screen.areas:
-            if area.type == 'VIEW_3D':
-                for region in area.regions:
-                    if region.type == 'UI':
-                        region.tag_redraw()
-                        break
+    use_udim: bpy.props.BoolProperty(
+        name="UDIM Tiles",
+        description="Bake lightmap UVs beyond the 0-1 square into UDIM tiles 1001, 1002..., each tile at the lightmap resolution",
+        default=False,
+    )
 
-# Properties
-class LIGHTMAPBAKER_properties(bpy.types.PropertyGroup):
-    busy: bpy.props.BoolProperty(
-        name="Busy",
-        description="General State of the bake", #used for the UI lock
+    use_bake_journal: bpy.props.BoolProperty(
+        name="Bake Journal",
+        description="Journal every baked object next to the lightmap, so an interrupted bake can be resumed",
         default=False,
     )
 
-    bake_in_progress: bpy.props.BoolProperty(
-        name="Bake In Progress",
-        description="",
+    progressive_bake: bpy.props.BoolProperty(
+        name="Progressive Bake",
+        description="Keep the samples of every bake next to the lightmap, so Refine Bake adds samples instead of baking again from zero",
         default=False,
     )
 
-    objects_index: bpy.props.IntProperty(
-        name="Index",
-        description="Index of the selected object in the bake list",
+    refine_bake: bpy.props.BoolProperty(
+        name="Refine Bake",
+        description="The running bake adds its samples to the accumulated lightmap",
+        default=False,
+    )
+
+    accumulated_samples: bpy.props.IntProperty(
+        name="Accumulated Samples",
+        description="Samples accumulated in the last progressive lightmap",
         default=0,
     )
 
-    preview_diffuse_enabled: bpy.props.BoolProperty(
-        name="Toggle Lightmap Preview",
-        description="Show only lightmaps on the surface",
+    resume_bake: bpy.props.BoolProperty(
+        name="Resume Bake",
+        description="The current bake replays the journal of an interrupted bake",
         default=False,
     )
 
-    lightmap_baker_uv_map_index: bpy.props.IntProperty(
-        name="Active UV Map Index",
-        description="Active UV Map Index",
+    lightmap_report: bpy.props.BoolProperty(
+        name="Lightmap Report",
+        description="After the bake, measure the texels used and the texel density of every object, and write them as JSON next to the lightmap",
+        default=True,
+    )
+
+    min_texels_per_meter: bpy.props.FloatProperty(
+        name="Min Texels per Meter",
+        description="Lowest texel density of any object the suggested resolution has to keep",
+        default=16.0,
+        min=0.01,
+    )
+
+    lightmap_utilization: bpy.props.FloatProperty(
+        name="Lightmap Utilization",
+        description="Percentage of the lightmap texels covered by the lightmap UVs in the last bake",
+        default=0.0,
+    )
+
+    suggested_resolution: bpy.props.IntProperty(
+        name="Suggested Resolution",
+        description="Smallest lightmap resolution keeping every object above the minimum texel density in the last bake",
         default=0,
-        min=0,
-        max=1,
     )
 
-    lightmap_baker_uv_map_name: bpy.props.StringProperty(
-        name="UV Map Name",
-        description="Set the lightmap uv name",
-        default="Lightmap",
+    density_outliers: bpy.props.IntProperty(
+        name="Density Outliers",
+        description="Objects of the last bake far from the median texel density",
+        default=0,
     )
 
-    export_enabled: bpy.props.BoolProperty(
-        name="Export Texture",
-        description="Export lightmap image after baking",
+    adaptive_sampling: bpy.props.BoolProperty(
+        name="Adaptive Sampling",
+        description="Bake every object with a few samples first, and spend the rest of the samples only on the noisy objects",
         default=False,
     )
 
-    export_path: bpy.props.StringProperty(
-        name="Export Path",
-        description="Path for exporting lightmap image",
-        default="//",
-        subtype='FILE_PATH',
+    adaptive_initial_samples: bpy.props.IntProperty(
+        name="Initial Samples",
+        description="Samples of every object before its noise is measured, split in two bakes with different seeds",
+        default=32,
+        min=2,
     )
 
-    automatic_lightmap_preview: bpy.props.BoolProperty(
-        name="Automatic Lightmap Preview",
-        description="Automatically preview lightmaps",
+    noise_threshold: bpy.props.FloatProperty(
+        name="Noise Threshold",
+        description="Relative noise above which an object gets more samples",
+        default=0.02,
+        min=0.001,
+        precision=3,
     )
 
-    lightmap_resolution: bpy.props.EnumProperty(
-        items=[
-            ('64', '64', 'Bake at 512x512 resolution'),
-            ('128', '128', 'Bake at 512x512 resolution'),
-            ('256', '256', 'Bake at 512x512 resolution'),
-            ('512', '512', 'Bake at 512x512 resolution'),
-            ('1024', '1024', 'Bake at 1024x1024 resolution'),
-            ('2048', '2048', 'Bake at 2048x2048 resolution'),
-            ('4096', '4096', 'Bake at 4096x4096 resolution'),
-            ('8192', '8192', 'Bake at 4096x4096 resolution'),
-        ],
-        name="Resolution",
-        description="Choose bake resolution",
-        default='1024',
+    adaptive_refined_objects: bpy.props.IntProperty(
+        name="Refined Objects",
+        description="Objects of the last bake that got more than the initial samples",
+        default=0,
     )
 
-    lightmap_name: bpy.props.StringProperty(
-        name="Lightmap Name",
-        description="Name of the baked lightmap texture",
-        default="Lightmap"
+    adaptive_time_saved: bpy.props.FloatProperty(
+        name="Adaptive Time Saved",
+        description="Estimated time the last bake saved compared to the same samples for every object",
+        default=0.0,
     )
 
-    render_device: bpy.props.EnumProperty(
+    tile_size: bpy.props.EnumProperty(
         items=[
-            ('CPU', 'CPU', 'Render using CPU'),
-            ('GPU', 'GPU Compute', 'Render using GPU'),
+            ('512', '512', 'Bake tiles of 512x512'),
+            ('1024', '1024', 'Bake tiles of 1024x1024'),
+            ('2048', '2048', 'Bake tiles of 2048x2048'),
+            ('4096', '4096', 'Bake tiles of 4096x4096'),
         ],
-        name="Device",
-        description="Choose render device",
-        default='GPU',
+        name="Tile Size",
+        description="Size of the tiles of a tiled bake",
+        default='2048',
     )
 
-    sample_count: bpy.props.IntProperty(
-        name="Sample Count",
-        description="Number of samples for baking",
-        default=128,
+    max_tiles_in_memory: bpy.props.IntProperty(
+        name="Tiles in Memory",
+        description="Finished tiles kept in memory before they are written to disk",
+        default=1,
         min=1,
+        max=64,
     )
 
-    bake_margin: bpy.props.IntProperty(
-        name="Bake Margin",
-        default=3,
-        min=0,
-        max=64,
-        description="Extend the baked result as a post process filter",
+    peak_memory: bpy.props.FloatProperty(
+        name="Peak Memory",
+        description="Peak memory of Blender in megabytes at the end of the last bake",
+        default=0.0,
+    )
+
+    bake_batch_count: bpy.props.IntProperty(
+        name="Bake Batch Count",
+        description="Number of objects in the current Cycles bake",
+        default=1,
+    )
+
+    object_mode_time: bpy.props.FloatProperty(
+    name="Per Object Time",
+    description="Time per object of the last per object bake",
+    default=0.0,
+    )
+
+    batched_mode_time: bpy.props.FloatProperty(
+    name="Batched Time",
+    description="Time per object of the last batched bake",
+    default=0.0,
     )
 
     time_start: bpy.props.FloatProperty(
@@ -554,10 +2672,20 @@ class LIGHTMAPBAKER_properties(bpy.types.PropertyGroup):
     default=0.0,
     )
 
+    postprocess_engine: bpy.props.EnumProperty(
+        items=[
+            ('NUMPY', 'In Memory', 'Filter the lightmap pixels in memory, Denoise still goes through the compositor'),
+            ('COMPOSITOR', 'Compositor', 'Filter the lightmap with a compositor render'),
+        ],
+        name="Post Process Engine",
+        description="Choose how the post process filters are applied",
+        default='NUMPY',
+    )
+
     use_denoise: bpy.props.BoolProperty(
     name="Denoise",
-    description="Apply Post Process filter on the baked texture",
-    default=True,
+    description="Denoise the baked texture with the compositor. The In Memory engine then still saves, renders and reloads the lightmap for the denoise, before its own filters",
+    default=False,
     )
 
     use_bilateral_blur: bpy.props.BoolProperty(
@@ -590,17 +2718,116 @@ class LIGHTMAPBAKER_properties(bpy.types.PropertyGroup):
     max=30.0,
     )
 
+class LIGHTMAPBAKER_materials_properties(bpy.types.PropertyGroup):
+    material: bpy.props.PointerProperty(
+        name="Material",
+        type=bpy.types.Material,
+    )
+
+    output_node: bpy.props.StringProperty(
+        name="Output Node",
+        description="Material output node the lightmap preview is connected to",
+        default=""
+    )
+
+    shader_node: bpy.props.StringProperty(
+        name="Original Shader Node",
+        description="Shader node connected to the material output before the lightmap preview",
+        default=""
+    )
+
+    texture_node: bpy.props.StringProperty(
+        name="Texture Node",
+        description="Lightmap texture node of the material",
+        default=""
+    )
+
+class LIGHTMAPBAKER_rules_properties(bpy.types.PropertyGroup):
+    rule_type: bpy.props.EnumProperty(
+        items=[
+            ('COLLECTION', 'Collection', 'Every mesh of a collection and its children'),
+            ('NAME', 'Name', 'Every mesh whose name matches a pattern, such as SM_Wall*'),
+            ('PROPERTY', 'Property', 'Every mesh with a custom property set'),
+        ],
+        name="Rule",
+        description="Objects added to the bake list by the rule",
+        default='COLLECTION',
+        update=on_rule_updated,
+    )
+
+    collection: bpy.props.PointerProperty(
+        name="Collection",
+        type=bpy.types.Collection,
+        update=on_rule_updated,
+    )
+
+    pattern: bpy.props.StringProperty(
+        name="Pattern",
+        description="Object name pattern, * and ? as wildcards",
+        default="",
+        update=on_rule_updated,
+    )
+
+    property_name: bpy.props.StringProperty(
+        name="Property",
+        description="Custom property of the objects, added when it is set",
+        default="",
+        update=on_rule_updated,
+    )
+
 class LIGHTMAPBAKER_objects_properties(bpy.types.PropertyGroup):
     objects_list: bpy.props.StringProperty(
         name="Objects List"
     )
 
-    nodes_dictionary: bpy.props.StringProperty(
-        name="Original Shader Node Name",
-        description="Original shader node name for storing links",
+    object: bpy.props.PointerProperty(
+        name="Object",
+        type=bpy.types.Object,
+    )
+
+    from_rule: bpy.props.BoolProperty(
+        name="From Rule",
+        description="Added by a bake set rule, removed once it no longer matches",
+        default=False,
+    )
+
+    fingerprint: bpy.props.StringProperty(
+        name="Fingerprint",
+        description="Hash of the lighting inputs of the object at its last bake",
         default=""
     )
 
+    bake_time: bpy.props.FloatProperty(
+        name="Bake Time",
+        description="Time the last bake of the object took",
+        default=0.0,
+    )
+
+    bake_skip: bpy.props.BoolProperty(
+        name="Skip Bake",
+        description="The object is unchanged and keeps its previous pixels",
+        default=False,
+    )
+
+    samples_used: bpy.props.IntProperty(
+        name="Samples Used",
+        description="Samples the last adaptive bake spent on the object",
+        default=0,
+    )
+
+    atlas: bpy.props.IntProperty(
+        name="Atlas",
+        description="Atlas of the object in the last bake",
+        default=0,
+    )
+
+    lightmap_scale_offset: bpy.props.FloatVectorProperty(
+        name="Lightmap Scale Offset",
+        description="Scale (xy) and offset (zw) moving the unpacked lightmap UVs of the object into the shared atlas",
+        size=4,
+        default=(1.0, 1.0, 0.0, 0.0),
+    )
+
 # Bake Logic
 class LIGHTMAPBAKER_OT_bake(bpy.types.Operator):
     bl_idname = "object.bake_operator"
@@ -609,115 +2836,144 @@ class LIGHTMAPBAKER_OT_bake(bpy.types.Operator):
     bl_options = {"REGISTER", "UNDO"}
 
     def execute(self, context):
-        time_start = time.time()
+        profiler.reset()
+        time_start = time.perf_counter()
+
+        # Objects added or removed since the bake set rules were last applied
+        if bake_sets_dirty:
+            apply_bake_set_rules(context.scene)
 
         # Cancel if the list is empty
         if not context.scene.lightmap_baker_objects:
             self.report({'ERROR'}, "Nothing to Bake :(")
             return {'CANCELLED'}
 
-        # Checks
-        # Check for missing UVs
         objects_to_bake = [obj_name.objects_list for obj_name in context.scene.lightmap_baker_objects]
-        objects_missing_uv = [obj_name for obj_name in objects_to_bake if len(bpy.data.objects.get(obj_name).data.uv_layers) < 2]
 
-        if objects_missing_uv:
-            # Deselect all objects first
-            bpy.ops.object.select_all(action='DESELECT')
+        # Checks, every problem is reported at once
+        problems = find_bake_problems(context)
+        problems.update((message, []) for message in find_settings_problems(context))
 
-            # Select only the objects missing the second UV map
-            for obj_name in objects_missing_uv:
-                bpy.data.objects[obj_name].select_set(True)
+        if problems:
+            # Select only the invalid objects
+            bpy.ops.object.select_all(action='DESELECT')
 
-            context.view_layer.objects.active = bpy.data.objects[objects_missing_uv[0]]
+            invalid_objects = [bpy.data.objects.get(obj_name) for names in problems.values() for obj_name in names]
+            invalid_objects = [obj for obj in invalid_objects if obj and obj.name in context.view_layer.objects]
+            for obj in invalid_objects:
+                obj.select_set(True)
+            if invalid_objects:
+                context.view_layer.objects.active = invalid_objects[0]
 
-            # Display an error message in the info area
-            self.report({'ERROR'}, f"Selected objects missing a second UV map: {', '.join(objects_missing_uv)}")
+            # Display the error messages in the info area
+            for message, names in problems.items():
+                self.report({'ERROR'}, f"{message}: {', '.join(names)}" if names else message)
             return {'CANCELLED'}
 
-        # Check for missing materials in any object in the list
-        objects_missing_materials = [obj_name for obj_name in objects_to_bake if not bpy.data.objects.get(obj_name).data.materials]
-        if objects_missing_materials:
-            # Deselect all objects first
-            bpy.ops.object.select_all(action='DESELECT')
+        profiler.record("preflight", time_start, time.perf_counter(), **get_span_args(context))
+
+        prepare_bake(context, objects_to_bake)
 
-            # Select only the objects missing materials
-            for obj_name in objects_missing_materials:
-                bpy.data.objects[obj_name].select_set(True)
+        # Workers bake in their own processes
+        if context.scene.lightmap_baker_properties.bake_mode == 'PARALLEL':
+            start_parallel_bake(context, objects_to_bake)
+        elif context.scene.lightmap_baker_properties.bake_mode == 'TILED':
+            start_tiled_bake(context, objects_to_bake)
+        elif context.scene.lightmap_baker_properties.bake_mode == 'QUEUE':
+            start_queue_bake(context, objects_to_bake)
 
-            context.view_layer.objects.active = bpy.data.objects[objects_missing_materials[0]]
+        # We are now busy!
+        context.scene.lightmap_baker_properties.busy = True
+        # Start Bake!
+        start_bake_scheduler()
 
-            # Display an error message in the info area
-            self.report({'ERROR'}, f"Selected objects missing materials: {', '.join(objects_missing_materials)}")
+        return {'FINISHED'}
+
+class LIGHTMAPBAKER_OT_resume_bake(bpy.types.Operator):
+    bl_idname = "object.resume_bake"
+    bl_label = "Resume Bake"
+    bl_description = "Continue an interrupted bake, the objects of its journal are read back instead of baked"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        if not is_bake_journal_enabled(context):
+            self.report({'ERROR'}, "Bakes can only be resumed per object or batched, without UDIM tiles")
+            return {'CANCELLED'}
+
+        if not has_bake_journal(context):
+            self.report({'ERROR'}, "Nothing to resume :(")
             return {'CANCELLED'}
 
-        objects_with_unused_slots = [obj_name for obj_name in objects_to_bake
-                                     if bpy.data.objects.get(obj_name).data.materials and
-                                     any(not slot.material for slot in bpy.data.objects.get(obj_name).material_slots)]
+        context.scene.lightmap_baker_properties.resume_bake = True
+        result = bpy.ops.object.bake_operator()
 
-        if objects_with_unused_slots:
-            # Deselect all objects first
-            bpy.ops.object.select_all(action='DESELECT')
+        if 'FINISHED' not in result:
+            context.scene.lightmap_baker_properties.resume_bake = False
+        return result
 
-            # Select only the objects with unused material slots
-            for obj_name in objects_with_unused_slots:
-                bpy.data.objects[obj_name].select_set(True)
+class LIGHTMAPBAKER_OT_refine_bake(bpy.types.Operator):
+    bl_idname = "object.refine_bake"
+    bl_label = "Refine Bake"
+    bl_description = "Bake every object again with another seed and blend it into the accumulated lightmap, weighted by samples"
+    bl_options = {"REGISTER", "UNDO"}
 
-            context.view_layer.objects.active = bpy.data.objects[objects_with_unused_slots[0]]
+    def execute(self, context):
+        if not is_progressive_bake_enabled(context):
+            self.report({'ERROR'}, "Progressive bakes only work per object or batched, without UDIM tiles or adaptive sampling")
+            return {'CANCELLED'}
 
-            # Display an error message in the info area
-            self.report({'ERROR'}, f"Selected objects have unused material slots: {', '.join(objects_with_unused_slots)}")
+        if not has_accumulation_buffer(context):
+            self.report({'ERROR'}, "Nothing to refine :(")
             return {'CANCELLED'}
-        
-        if bpy.context.scene.render.engine == 'BLENDER_EEVEE':
-            self.report({'ERROR'}, "Only Cycles render is supported!")
+
+        context.scene.lightmap_baker_properties.refine_bake = True
+        result = bpy.ops.object.bake_operator()
+
+        if 'FINISHED' not in result:
+            context.scene.lightmap_baker_properties.refine_bake = False
+        return result
+
+class LIGHTMAPBAKER_OT_draft_bake(bpy.types.Operator):
+    bl_idname = "object.draft_bake"
+    bl_label = "Draft Bake"
+    bl_description = "Bake a quick preview of the objects in the list at a quarter of the resolution, the lightmap is left as it is"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        properties = context.scene.lightmap_baker_properties
+
+        if properties.busy:
+            self.report({'ERROR'}, "Wait for the bake to finish")
             return {'CANCELLED'}
 
-        if context.scene.lightmap_baker_properties.export_path == "":
-            self.report({'ERROR'}, "Export part is empty")
+        if bake_sets_dirty:
+            apply_bake_set_rules(context.scene)
+
+        if not context.scene.lightmap_baker_objects:
+            self.report({'ERROR'}, "Nothing to Bake :(")
             return {'CANCELLED'}
 
-        else:
-            # Set the active object outside the loop
-            bpy.ops.object.mode_set(mode='OBJECT')
-            bpy.ops.object.select_all(action='DESELECT')
-            active_object = bpy.data.objects.get(objects_to_bake[0])
-            active_object.select_set(True)
-            context.view_layer.objects.active = active_object
-    
-            bpy.context.scene.cycles.device = context.scene.lightmap_baker_properties.render_device
+        problems = find_bake_problems(context)
 
-            sample_count = context.scene.lightmap_baker_properties.sample_count
-            bpy.context.scene.cycles.samples = sample_count
-    
-            # Disable lightmaps preview
-            context.scene.lightmap_baker_properties.preview_diffuse_enabled = False
-            objects_list = context.scene.lightmap_baker_objects
-            lightmap_preview_diffuse(context, objects_list)
-            create_lightmap_nodes(context, objects_to_bake)
+        if context.scene.render.engine == 'BLENDER_EEVEE':
+            problems["Only Cycles render is supported!"] = []
 
-            for obj_name in objects_to_bake:
-                obj = bpy.data.objects.get(obj_name)
-                obj.data.uv_layers.active_index = 1
-
-            # Reset bake aborting
-            context.scene.lightmap_baker_properties.cancel_bake = False
-            # Reset the objects to bake index
-            context.scene.lightmap_baker_properties.objects_index = 0
-            # Reset elapsed time
-            context.scene.lightmap_baker_properties.elapsed_time = 0.0
-            # Reset the progression
-            context.scene.lightmap_baker_properties.bake_progress = 0.0
-            # Start the timer
-            context.scene.lightmap_baker_properties.time_start = time.perf_counter()
-            # We are now busy!
-            context.scene.lightmap_baker_properties.busy = True
-            # Start Bake!
-            bpy.ops.wm.bake_modal_operator('INVOKE_DEFAULT')
-            bpy.ops.wm.elapsed_time_modal_operator('INVOKE_DEFAULT')
-
-            print("My Script Finished: %.4f sec" % (time.time() - time_start))
-            return {'FINISHED'}
+        # Objects of different lightmaps share the same UV space
+        if properties.use_udim or properties.use_atlas_planner:
+            problems["Drafts are baked in a single lightmap, without UDIM tiles or atlases"] = []
+
+        if problems:
+            for message, names in problems.items():
+                self.report({'ERROR'}, f"{message}: {', '.join(names)}" if names else message)
+            return {'CANCELLED'}
+
+        try:
+            bake_draft(context)
+        except RuntimeError as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+
+        return {'FINISHED'}
 
 class LIGHTMAPBAKER_OT_remove_single_from_bake_list(bpy.types.Operator):
     bl_idname = "object.remove_single_from_bake_list"
@@ -747,11 +3003,11 @@ class LIGHTMAPBAKER_OT_remove_all_from_bake_list(bpy.types.Operator):
     def execute(self, context):
         # disable lightmap preview
         context.scene.lightmap_baker_properties.preview_diffuse_enabled = False
-        objects_list = context.scene.lightmap_baker_objects
 
-        disconnect_lightmap_to_shader_output(context, objects_list)
+        disconnect_lightmap_to_shader_output(context)
 
         context.scene.lightmap_baker_objects.clear()
+        context.scene.lightmap_baker_materials.clear()
         return {'FINISHED'}
 
 class LIGHTMAPBAKER_OT_toggle_lightmap_preview_diffuse(bpy.types.Operator):
@@ -759,26 +3015,20 @@ class LIGHTMAPBAKER_OT_toggle_lightmap_preview_diffuse(bpy.types.Operator):
     bl_label = "Toggle Lightmap Diffuse Only"
 
     def execute(self, context):
-        has_lightmap = False
-
-        # Loop through all objects in the scene
-        for obj in bpy.context.scene.objects:
-            if obj.type == 'MESH':
-                material = obj.active_material
-                if material:
-                    texture_node = material.node_tree.nodes.get("Bake_Texture_Node")
-                    if texture_node:
-                        has_lightmap = True
-                        break  # Exit the loop if at least one object has a lightmap
-        objects_list = context.scene.lightmap_baker_objects
+        # Lightmaps baked before the material registry existed
+        if not context.scene.lightmap_baker_materials:
+            update_material_registry(context.scene)
+
+        # At least one registered material has a lightmap
+        has_lightmap = any(entry.material and entry.material.node_tree.nodes.get(entry.texture_node)
+                           for entry in context.scene.lightmap_baker_materials)
 
-        if not has_lightmap or not objects_list:
+        if not has_lightmap or not context.scene.lightmap_baker_objects:
             self.report({'ERROR'}, "Nothing to preview :(")
             return {'CANCELLED'}
 
         context.scene.lightmap_baker_properties.preview_diffuse_enabled = not context.scene.lightmap_baker_properties.preview_diffuse_enabled
-        objects_list = context.scene.lightmap_baker_objects
-        lightmap_preview_diffuse(context, objects_list)
+        lightmap_preview_diffuse(context)
         return {'FINISHED'}
 
 class LIGHTMAPBAKER_OT_add_to_objects_list(bpy.types.Operator):
@@ -788,16 +3038,48 @@ class LIGHTMAPBAKER_OT_add_to_objects_list(bpy.types.Operator):
     def execute(self, context):
         selected_objects = bpy.context.selected_objects
 
+        # Objects already in the list
+        listed_objects = {get_item_object(item) for item in context.scene.lightmap_baker_objects}
+
         for obj in selected_objects:
-            if obj.type == 'MESH':
-                # Check if the object is not already in the list
-                if obj.name not in (item.objects_list for item in context.scene.lightmap_baker_objects):
-                    # Append the object to the list
-                    new_item = context.scene.lightmap_baker_objects.add()
-                    new_item.objects_list = obj.name
+            if obj.type == 'MESH' and obj not in listed_objects:
+                add_list_item(context.scene, obj)
+                listed_objects.add(obj)
 
         return {'FINISHED'}
 
+class LIGHTMAPBAKER_OT_add_bake_set_rule(bpy.types.Operator):
+    bl_idname = "object.add_bake_set_rule"
+    bl_label = "Add Bake Set Rule"
+    bl_description = "Add a rule filling the bake list from a collection, a name pattern or a custom property"
+
+    def execute(self, context):
+        context.scene.lightmap_baker_rules.add()
+        return {'FINISHED'}
+
+class LIGHTMAPBAKER_OT_remove_bake_set_rule(bpy.types.Operator):
+    bl_idname = "object.remove_bake_set_rule"
+    bl_label = "Remove Bake Set Rule"
+
+    index: bpy.props.IntProperty()
+
+    def execute(self, context):
+        rules = context.scene.lightmap_baker_rules
+        if 0 <= self.index < len(rules):
+            rules.remove(self.index)
+
+        apply_bake_set_rules(context.scene)
+        return {'FINISHED'}
+
+class LIGHTMAPBAKER_OT_apply_bake_set_rules(bpy.types.Operator):
+    bl_idname = "object.apply_bake_set_rules"
+    bl_label = "Apply Bake Set Rules"
+    bl_description = "Add the objects matching the bake set rules to the list, and remove the ones that no longer match"
+
+    def execute(self, context):
+        apply_bake_set_rules(context.scene)
+        return {'FINISHED'}
+
 class LIGHTMAPBAKER_OT_remove_lightmap_nodes(bpy.types.Operator):
     bl_idname = "object.remove_lightmap_nodes"
     bl_label = "Remove Lightmap Nodes"
@@ -821,8 +3103,8 @@ class LIGHTMAPBAKER_OT_remove_lightmap_nodes(bpy.types.Operator):
                         material.node_tree.nodes.remove(texture_node)
 
         # Reconnect original nodes
-        objects_list = context.scene.lightmap_baker_objects
-        disconnect_lightmap_to_shader_output(context, objects_list)
+        disconnect_lightmap_to_shader_output(context)
+        context.scene.lightmap_baker_materials.clear()
         context.scene.lightmap_baker_properties.preview_diffuse_enabled = False
         return {'FINISHED'}
 
@@ -832,7 +3114,7 @@ class LIGHTMAPBAKER_OT_add_lightmap_uv(bpy.types.Operator):
     
     def execute(self, context):
         for obj_name in context.scene.lightmap_baker_objects:
-            obj = bpy.data.objects.get(obj_name.objects_list)
+            obj = get_item_object(obj_name)
             if obj:
                 # Check if the object has a second UV map
                 if len(obj.data.uv_layers) < 2:
@@ -845,6 +3127,70 @@ class LIGHTMAPBAKER_OT_add_lightmap_uv(bpy.types.Operator):
                     obj.data.uv_layers.active_index = 1
         return {'FINISHED'}
 
+class LIGHTMAPBAKER_OT_pack_lightmap_uvs(bpy.types.Operator):
+    bl_idname = "object.pack_lightmap_uvs"
+    bl_label = "Pack Lightmap UVs"
+    bl_description = "Pack the lightmap UVs of every object in the list into one atlas, sized by surface area"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        properties = context.scene.lightmap_baker_properties
+        objects_list = context.scene.lightmap_baker_objects
+
+        if not objects_list:
+            self.report({'ERROR'}, "Nothing to Pack :(")
+            return {'CANCELLED'}
+
+        missing_objects = [item.objects_list for item in objects_list if get_item_object(item) is None]
+        if missing_objects:
+            self.report({'ERROR'}, f"{preflight.MISSING_OBJECT}: {', '.join(missing_objects)}")
+            return {'CANCELLED'}
+
+        objects_missing_uv = [item.objects_list for item in objects_list if len(get_item_object(item).data.uv_layers) < 2]
+        if objects_missing_uv:
+            self.report({'ERROR'}, f"Selected objects missing a second UV map: {', '.join(objects_missing_uv)}")
+            return {'CANCELLED'}
+
+        # Mesh data written in edit mode is overwritten when leaving it
+        if context.object and context.object.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        # The margin of each side of a rectangle
+        padding = 2.0 * properties.bake_margin / int(properties.lightmap_resolution)
+
+        objects = [get_item_object(item) for item in objects_list]
+        transforms = uvpack.pack_objects(objects, context.evaluated_depsgraph_get(), padding)
+
+        if not transforms:
+            self.report({'ERROR'}, "Lightmap UVs can't be packed, lower the bake margin")
+            return {'CANCELLED'}
+
+        apply_lightmap_uv_transforms(context, transforms)
+
+        # Objects sharing a mesh share its UVs, so they bake into the same region
+        shared = sum(1 for obj in objects if obj.data.name in transforms) - len(transforms)
+        if shared:
+            self.report({'INFO'}, f"Packed the lightmap UVs of {len(transforms)} meshes, {shared} objects share a mesh and its packed region")
+        else:
+            self.report({'INFO'}, f"Packed the lightmap UVs of {len(transforms)} meshes")
+        return {'FINISHED'}
+
+# Move the lightmap UVs of packed meshes. UVs already in place are left as
+# they are, so packing them again keeps their fingerprint.
+def apply_lightmap_uv_transforms(context, transforms):
+    transforms = {mesh_name: transform for mesh_name, transform in transforms.items() if not uvpack.is_identity(*transform)}
+
+    for mesh_name, (scale, offset) in transforms.items():
+        uvpack.apply_transform(bpy.data.meshes[mesh_name], scale, offset)
+
+    # Keep the scale and offset from the unpacked UVs, packing again composes them
+    for item in context.scene.lightmap_baker_objects:
+        obj = get_item_object(item)
+        if obj and obj.data.name in transforms:
+            scale, offset = transforms[obj.data.name]
+            scale_x, scale_y, offset_x, offset_y = item.lightmap_scale_offset
+            item.lightmap_scale_offset = (scale_x * scale, scale_y * scale, offset_x * scale + offset[0], offset_y * scale + offset[1])
+
 class LIGHTMAPBAKER_OT_delete_lightmap_uv(bpy.types.Operator):
     bl_idname = "object.delete_lightmap_uv"
     bl_label = "Remove Lightmap UVs"
@@ -852,7 +3198,7 @@ class LIGHTMAPBAKER_OT_delete_lightmap_uv(bpy.types.Operator):
     def execute(self, context):
 
         for obj_name in context.scene.lightmap_baker_objects:
-            obj = bpy.data.objects.get(obj_name.objects_list)
+            obj = get_item_object(obj_name)
             if obj:
                 # Check if there are UV maps before trying to remove one
                 if len(obj.data.uv_layers) > 1:
@@ -873,7 +3219,7 @@ class LIGHTMAPBAKER_OT_set_lightmap_uv_name(bpy.types.Operator):
     def execute(self, context):
 
         for obj_name in context.scene.lightmap_baker_objects:
-            obj = bpy.data.objects.get(obj_name.objects_list)
+            obj = get_item_object(obj_name)
             if obj:
                 # Check if there are UV maps before trying to rename
                 if len(obj.data.uv_layers) > 1:
@@ -893,7 +3239,7 @@ class LIGHTMAPBAKER_OT_set_lightmap_uv_index(bpy.types.Operator):
         uv_index = context.scene.lightmap_baker_properties.lightmap_baker_uv_map_index
 
         for obj_name in context.scene.lightmap_baker_objects:
-            obj = bpy.data.objects.get(obj_name.objects_list)
+            obj = get_item_object(obj_name)
             if obj:
                 # Check if the object has more UV maps than the desired index
                 if len(obj.data.uv_layers) > uv_index:
@@ -911,7 +3257,7 @@ class LIGHTMAPBAKER_OT_select_all_in_list(bpy.types.Operator):
     def execute(self, context):
         bpy.ops.object.select_all(action='DESELECT')
         for obj_name in context.scene.lightmap_baker_objects:
-            obj = bpy.data.objects.get(obj_name.objects_list)
+            obj = get_item_object(obj_name)
             if obj:
                 obj.select_set(True)
         return {'FINISHED'}
@@ -926,7 +3272,7 @@ class LIGHTMAPBAKER_OT_clean_invalid_objects(bpy.types.Operator):
         invalid_indices = []
 
         for index, obj_name in enumerate(context.scene.lightmap_baker_objects):
-            if bpy.data.objects.get(obj_name.objects_list) is None:
+            if get_item_object(obj_name) is None:
                 invalid_indices.append(index)
 
         # Remove invalid objects from the collection
@@ -935,95 +3281,23 @@ class LIGHTMAPBAKER_OT_clean_invalid_objects(bpy.types.Operator):
 
         return {'FINISHED'}
 
-class LIGHTMAPBAKER_OT_bake_modal(bpy.types.Operator):
-    bl_idname = "wm.bake_modal_operator"
-    bl_label = "Bake Modal Operator"
-
-    _timer = None
-    bake_started = False
-    bake_completed = False
-
-    def modal(self, context, event):
-        scene = context.scene
-        objects_list = scene.lightmap_baker_objects
-        total_objects = len(objects_list)
-
-        # Modal stop when task cancelled
-        if scene.lightmap_baker_properties.cancel_bake:
-            self.cancel(context)
-            return {'CANCELLED'}
-        # Modal stop when bake is complete
-        if self.bake_completed:
-            self.cancel(context)
-            return {'CANCELLED'}
-        
-        if not scene.lightmap_baker_properties.bake_in_progress and not scene.lightmap_baker_properties.cancel_bake:
-            # Check for remaining objects in the list
-            if scene.lightmap_baker_properties.objects_index < total_objects and not self.bake_completed:
-                obj_data = objects_list[scene.lightmap_baker_properties.objects_index]
-                obj = bpy.data.objects.get(obj_data.objects_list)
-
-                bake_diffuse(context, obj)
-                scene.lightmap_baker_properties.bake_in_progress = True
-   
-            # Consider Bake Done!
-            elif not self.bake_completed:
-                self.bake_completed = True
-                self.cancel(context)
-            
-
-                handle_bake_completion(context)
-
-
-            # calculate progress
-            progress_value = scene.lightmap_baker_properties.objects_index / len(objects_list)    
-            scene.lightmap_baker_properties.bake_progress = progress_value
-
-        return {'PASS_THROUGH'}
+class LIGHTMAPBAKER_OT_measure_pack_cost(bpy.types.Operator):
+    bl_idname = "object.measure_pack_cost"
+    bl_label = "Measure Pack Cost"
+    bl_description = "Measure the time saved per object by not packing the lightmap after every bake, up to the current resolution"
 
     def execute(self, context):
-        wm = context.window_manager
-        self._timer = wm.event_timer_add(1.0, window=context.window)
-        wm.modal_handler_add(self)
-        return {'RUNNING_MODAL'}
-
-    def cancel(self, context):
-        wm = context.window_manager
-        wm.event_timer_remove(self._timer)
-
-class LIGHTMAPBAKER_OT_elapsed_time_modal(bpy.types.Operator):
-    bl_idname = "wm.elapsed_time_modal_operator"
-    bl_label = "Elapsed Time Modal Operator"
-
-    _timer = None
-    counter = 0.0
-    interval = 0.1
-
-    def modal(self, context, event):
-        # Modal stop when not baking
-        if not context.scene.lightmap_baker_properties.busy:
-            self.cancel(context)
-            return {'CANCELLED'}
+        max_resolution = int(context.scene.lightmap_baker_properties.lightmap_resolution)
+        resolutions = [int(item.identifier) for item in LIGHTMAPBAKER_properties.bl_rna.properties['lightmap_resolution'].enum_items
+                       if int(item.identifier) <= max_resolution]
 
-        # Check if the interval has passed
-        if time.time() - self.counter > self.interval:
-            self.counter = time.time()
+        pack_times = measure_pack_cost(resolutions)
 
-            calculate_elapsed_time()
-            refresh_ui()
-
-        return {'PASS_THROUGH'}
-
-
-    def execute(self, context):
-        wm = context.window_manager
-        self._timer = wm.event_timer_add(1.0, window=context.window)
-        wm.modal_handler_add(self)
-        return {'RUNNING_MODAL'}
+        for resolution, pack_time in pack_times.items():
+            print(f"{resolution}x{resolution}: {pack_time:.3f} sec saved per object")
 
-    def cancel(self, context):
-        wm = context.window_manager
-        wm.event_timer_remove(self._timer)
+        self.report({'INFO'}, f"Saved per object at {max_resolution}x{max_resolution}: {pack_times[max_resolution]:.3f} sec")
+        return {'FINISHED'}
 
 class LIGHTMAPBAKER_OT_cancel_bake(bpy.types.Operator):
     bl_idname = "object.cancel_bake"
@@ -1045,21 +3319,29 @@ class LIGHTMAPBAKER_OT_cancel_bake(bpy.types.Operator):
 
 classes = [
     LIGHTMAPBAKER_properties,
+    LIGHTMAPBAKER_rules_properties,
     LIGHTMAPBAKER_objects_properties,
-    LIGHTMAPBAKER_OT_elapsed_time_modal,
+    LIGHTMAPBAKER_materials_properties,
     LIGHTMAPBAKER_OT_cancel_bake,
+    LIGHTMAPBAKER_OT_measure_pack_cost,
     LIGHTMAPBAKER_OT_toggle_lightmap_preview_diffuse,
     LIGHTMAPBAKER_OT_remove_single_from_bake_list,
     LIGHTMAPBAKER_OT_remove_all_from_bake_list,
-    LIGHTMAPBAKER_OT_bake_modal,
     LIGHTMAPBAKER_OT_clean_invalid_objects,
     LIGHTMAPBAKER_OT_add_lightmap_uv,
+    LIGHTMAPBAKER_OT_pack_lightmap_uvs,
     LIGHTMAPBAKER_OT_delete_lightmap_uv,
     LIGHTMAPBAKER_OT_set_lightmap_uv_name,
     LIGHTMAPBAKER_OT_set_lightmap_uv_index,
     LIGHTMAPBAKER_OT_select_all_in_list,
     LIGHTMAPBAKER_OT_bake,
+    LIGHTMAPBAKER_OT_resume_bake,
+    LIGHTMAPBAKER_OT_refine_bake,
+    LIGHTMAPBAKER_OT_draft_bake,
     LIGHTMAPBAKER_OT_add_to_objects_list,
+    LIGHTMAPBAKER_OT_add_bake_set_rule,
+    LIGHTMAPBAKER_OT_remove_bake_set_rule,
+    LIGHTMAPBAKER_OT_apply_bake_set_rules,
     LIGHTMAPBAKER_OT_remove_lightmap_nodes,
 ]
 
@@ -1070,20 +3352,31 @@ def register():
     bpy.app.handlers.load_post.append(on_file_opened)
     bpy.app.handlers.object_bake_complete.append(on_post_bake)
     bpy.app.handlers.object_bake_cancel.append(on_bake_cancel)
+    bpy.app.handlers.depsgraph_update_post.append(on_depsgraph_update)
 
     bpy.types.Scene.lightmap_baker_properties = bpy.props.PointerProperty(type=LIGHTMAPBAKER_properties)
     bpy.types.Scene.lightmap_baker_objects = bpy.props.CollectionProperty(type=LIGHTMAPBAKER_objects_properties)
+    bpy.types.Scene.lightmap_baker_materials = bpy.props.CollectionProperty(type=LIGHTMAPBAKER_materials_properties)
+    bpy.types.Scene.lightmap_baker_rules = bpy.props.CollectionProperty(type=LIGHTMAPBAKER_rules_properties)
 
 def unregister():
+    stop_bake_scheduler()
+
+    if bpy.app.timers.is_registered(refresh_bake_sets):
+        bpy.app.timers.unregister(refresh_bake_sets)
+
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
 
     bpy.app.handlers.load_post.remove(on_file_opened)
     bpy.app.handlers.object_bake_complete.remove(on_post_bake)
     bpy.app.handlers.object_bake_cancel.remove(on_bake_cancel)
+    bpy.app.handlers.depsgraph_update_post.remove(on_depsgraph_update)
     
     del bpy.types.Scene.lightmap_baker_properties
     del bpy.types.Scene.lightmap_baker_objects
+    del bpy.types.Scene.lightmap_baker_materials
+    del bpy.types.Scene.lightmap_baker_rules
 
 if __name__ == '__main__':
     register()
@@ -0,0 +1,275 @@
+import json
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+
+import bpy
+import numpy as np
+
+from . import cache, coverage, jobqueue, postprocess
+
+# Parallel bake
+# The objects of the list are split across background Blender processes. Each
+# worker bakes its subset into a private float buffer, the coordinator then
+# merges the UV region of each object into the lightmap. Queue bakes hand the
+# subsets to workers through the shared directory of jobqueue.py instead, and
+# their tiles are merged the same way.
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+
+def get_threads_per_worker(worker_count, threads_per_worker=0):
+    # 0 shares the cores of the machine between the workers
+    if threads_per_worker:
+        return threads_per_worker
+    return max(1, (os.cpu_count() or 1) // worker_count)
+
+def split_objects(objects_to_bake, worker_count):
+    # Balance the workers by polygon count, biggest objects first
+    polygon_counts = {obj_name: len(bpy.data.objects[obj_name].data.polygons) for obj_name in objects_to_bake}
+    subsets = [[] for _ in range(worker_count)]
+    workloads = [0] * worker_count
+
+    for obj_name in sorted(objects_to_bake, key=polygon_counts.get, reverse=True):
+        index = workloads.index(min(workloads))
+        subsets[index].append(obj_name)
+        workloads[index] += polygon_counts[obj_name]
+
+    return [subset for subset in subsets if subset]
+
+def merge_tiles(image, tiles):
+    # tiles: list of (x, y, mask, covered, pixels) per object, from any worker.
+    # Covered texels come from their own object, margins are only taken where
+    # no object covers the texel
+    merged = postprocess.read_pixels(image)
+    cache.paste_tiles(merged, tiles)
+    postprocess.write_pixels(image, merged)
+
+def merge_buffers(context, image, buffers):
+    # buffers: list of (float buffer path, object names baked in it)
+    # Each object is rasterized in its own UV region, and only that region is
+    # read from the buffer it was baked in
+    width, height = image.size
+    margin = context.scene.lightmap_baker_properties.bake_margin
+    depsgraph = context.evaluated_depsgraph_get()
+
+    tiles = []
+    for buffer_path, object_names in buffers:
+        pixels = np.load(buffer_path, mmap_mode='r')
+
+        for obj_name in object_names:
+            region = coverage.object_region(bpy.data.objects[obj_name], width, height, depsgraph, margin)
+            if region is None:
+                continue
+
+            x, y, covered, mask = region
+            tiles.append((x, y, mask, covered, np.array(pixels[y:y + mask.shape[0], x:x + mask.shape[1]], dtype=np.float32)))
+
+        # Release the mapped file before the workers directory is removed
+        del pixels
+
+    merge_tiles(image, tiles)
+
+class ParallelBake:
+    def __init__(self, objects_to_bake, worker_count, threads_per_worker=0):
+        self.subsets = split_objects(objects_to_bake, worker_count)
+        self.threads_per_worker = get_threads_per_worker(worker_count, threads_per_worker)
+        self.directory = tempfile.mkdtemp(prefix="lightmap_baker_")
+        self.blend_path = os.path.join(self.directory, "scene.blend")
+        self.processes = []
+        self.time_start = 0.0
+
+    def get_path(self, index, extension):
+        return os.path.join(self.directory, f"worker_{index}.{extension}")
+
+    def start(self):
+        # Workers read the scene from disk, save a copy of its current state
+        bpy.ops.wm.save_as_mainfile(filepath=self.blend_path, copy=True)
+
+        self.time_start = time.perf_counter()
+
+        for index, subset in enumerate(self.subsets):
+            with open(self.get_path(index, "json"), 'w') as objects_file:
+                json.dump(subset, objects_file)
+
+            command = [
+                bpy.app.binary_path, "-b", self.blend_path,
+                "--python", CLI_PATH, "--",
+                "--objects-file", self.get_path(index, "json"),
+                "--raw-output", self.get_path(index, "npy"),
+                "--summary", self.get_path(index, "summary.json"),
+                "--threads", str(self.threads_per_worker),
+            ]
+
+            with open(self.get_path(index, "log"), 'w') as log_file:
+                self.processes.append(subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT))
+
+    def poll(self):
+        # True once every worker exited
+        return all(process.poll() is not None for process in self.processes)
+
+    def wait(self):
+        for process in self.processes:
+            process.wait()
+
+    def finished_objects(self):
+        return sum(len(subset) for subset, process in zip(self.subsets, self.processes) if process.poll() is not None)
+
+    def failed_workers(self):
+        return [index for index, process in enumerate(self.processes) if process.poll() not in (None, 0)]
+
+    def terminate(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        self.wait()
+        self.cleanup()
+
+    def merge(self, context, image):
+        buffers = [(self.get_path(index, "npy"), subset) for index, subset in enumerate(self.subsets)]
+        merge_buffers(context, image, buffers)
+
+    def get_timings(self):
+        timings = []
+        for index in range(len(self.subsets)):
+            with open(self.get_path(index, "summary.json")) as summary_file:
+                timings += json.load(summary_file)["objects"]
+        return timings
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+# Job queue bake, the coordinator side of jobqueue.py
+def extract_object_tiles(context, image, objects_to_bake):
+    # UV region of each object, its margin included, with the texels it covers.
+    # Each object is rasterized in its own region only.
+    width, height = image.size
+    margin = context.scene.lightmap_baker_properties.bake_margin
+    depsgraph = context.evaluated_depsgraph_get()
+    pixels = postprocess.read_pixels(image)
+
+    tiles = []
+    for obj_name in objects_to_bake:
+        region = coverage.object_region(bpy.data.objects[obj_name], width, height, depsgraph, margin)
+        if region is None:
+            continue
+
+        x, y, covered, mask = region
+        tiles.append((x, y, mask, covered, pixels[y:y + mask.shape[0], x:x + mask.shape[1]]))
+
+    return tiles
+
+class QueueBake:
+    def __init__(self, directory, objects_to_bake, settings, job_size, local_workers=0, threads_per_worker=0, timeout=600.0):
+        self.queue = jobqueue.JobQueue(directory, timeout)
+        self.bake_id = f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.subsets = split_objects(objects_to_bake, max(1, math.ceil(len(objects_to_bake) / job_size)))
+        self.settings = settings
+        self.local_workers = local_workers
+        self.threads_per_worker = get_threads_per_worker(max(local_workers, 1), threads_per_worker)
+        self.processes = []
+        self.time_start = 0.0
+        self.last_poll = 0.0
+
+    def get_job_id(self, index):
+        return f"{self.bake_id}_{index:04d}"
+
+    def start(self):
+        # Workers read the scene from the queue, save a copy of its current state
+        blend_path = os.path.join("blends", self.bake_id + ".blend")
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.join(self.queue.directory, blend_path), copy=True)
+
+        self.time_start = time.perf_counter()
+
+        for index, subset in enumerate(self.subsets):
+            self.queue.submit({
+                "job": self.get_job_id(index),
+                "bake": self.bake_id,
+                "blend": blend_path,
+                "objects": subset,
+                "settings": self.settings,
+            })
+
+        for index in range(self.local_workers):
+            command = [
+                bpy.app.binary_path, "-b",
+                "--python", CLI_PATH, "--",
+                "--queue-worker", self.queue.directory,
+                "--queue-timeout", str(self.queue.timeout),
+                "--threads", str(self.threads_per_worker),
+            ]
+
+            log_path = os.path.join(self.queue.directory, "logs", f"{self.bake_id}_worker_{index}.log")
+            with open(log_path, 'w') as log_file:
+                self.processes.append(subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT))
+
+    def poll(self):
+        # True once every job is done, or one of them failed
+        self.queue.reclaim_stale()
+        return self.failed_jobs() or len(self.queue.list_jobs("done", self.bake_id)) == len(self.subsets)
+
+    def wait(self):
+        while not self.poll():
+            time.sleep(jobqueue.POLL_INTERVAL)
+
+    def finished_objects(self):
+        done = set(self.queue.list_jobs("done", self.bake_id))
+        return sum(len(subset) for index, subset in enumerate(self.subsets) if self.get_job_id(index) in done)
+
+    def failed_jobs(self):
+        return [self.queue.read_json(self.queue.get_path("failed", job_id))["error"] for job_id in self.queue.list_jobs("failed", self.bake_id)]
+
+    def merge(self, image):
+        tiles = []
+        for job_id in self.queue.list_jobs("done", self.bake_id):
+            tiles += self.queue.load_result(job_id)
+        merge_tiles(image, tiles)
+
+    def get_timings(self):
+        timings = []
+        for job_id in self.queue.list_jobs("done", self.bake_id):
+            timings += self.queue.read_json(self.queue.get_path("done", job_id))["timings"]
+        return timings
+
+    def terminate(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            process.wait()
+        self.cleanup()
+
+    def cleanup(self):
+        # Local workers leave once the queue is empty
+        self.queue.remove_bake(self.bake_id)
+
+# Bake with 1, 2, 4, 8... workers and time each run, the lightmap is left untouched
+def benchmark_scaling(objects_to_bake, worker_counts=(1, 2, 4, 8), threads_per_worker=0):
+    results = []
+
+    for worker_count in worker_counts:
+        job = ParallelBake(objects_to_bake, worker_count, threads_per_worker)
+
+        job.start()
+        job.wait()
+        bake_time = time.perf_counter() - job.time_start
+        failed_workers = job.failed_workers()
+        job.cleanup()
+
+        results.append({
+            "workers": worker_count,
+            "threads_per_worker": job.threads_per_worker,
+            "time": bake_time,
+            "failed_workers": failed_workers,
+        })
+
+        print(f"{worker_count} workers x {job.threads_per_worker} threads: {bake_time:.2f} sec")
+
+    # Speedup against the first run
+    for result in results:
+        result["speedup"] = results[0]["time"] / result["time"]
+
+    return results
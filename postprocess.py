@@ -0,0 +1,127 @@
+import math
+import numpy as np
+
+# In memory post process
+# The lightmap pixels are pulled once, filtered with NumPy and written back,
+# without going through the compositor, a render and a reload from disk.
+
+# Rows filtered at once, keeps the temporary buffers small on 8k lightmaps
+STRIP_HEIGHT = 256
+
+def read_pixels(image):
+    width, height = image.size
+    pixels = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+
+    return pixels.reshape(height, width, 4)
+
+def read_rows(image, top, bottom):
+    # Rows top to bottom of the image. A few rows are sliced out of the image
+    # pixels, past a quarter of the image one foreach_get is faster
+    width, height = image.size
+    if (bottom - top) * 4 > height:
+        return read_pixels(image)[top:bottom]
+
+    rows = np.array(image.pixels[top * width * 4:bottom * width * 4], dtype=np.float32)
+    return rows.reshape(bottom - top, width, 4)
+
+def write_pixels(image, pixels):
+    image.pixels.foreach_set(np.ascontiguousarray(pixels, dtype=np.float32).ravel())
+    image.update()
+
+def gaussian_kernel(size):
+    # Same falloff as the compositor Blur node in Gaussian mode
+    radius = int(size)
+    offsets = np.arange(-radius, radius + 1, dtype=np.float32) / radius
+    kernel = np.exp(-0.5 * (3.0 * offsets) ** 2)
+
+    return kernel / kernel.sum()
+
+def get_strip_rows(top, bottom, radius, height):
+    # Rows of a strip and its halo, the edge rows repeat past the image
+    return np.clip(np.arange(top - radius, bottom + radius), 0, height - 1)
+
+def pad_columns(strip, radius):
+    return np.pad(strip, ((0, 0), (radius, radius), (0, 0)), mode='edge')
+
+def gaussian_blur(pixels, size):
+    if int(size) < 1:
+        return pixels.copy()
+
+    kernel = gaussian_kernel(size)
+    radius = len(kernel) // 2
+    height, width = pixels.shape[:2]
+
+    blurred = np.empty_like(pixels)
+
+    # Separable blur, rows then columns, one strip and its halo at a time
+    for top in range(0, height, STRIP_HEIGHT):
+        bottom = min(top + STRIP_HEIGHT, height)
+        padded = pad_columns(pixels[get_strip_rows(top, bottom, radius, height)], radius)
+
+        horizontal = np.zeros((padded.shape[0], width, pixels.shape[2]), dtype=pixels.dtype)
+        for offset, weight in enumerate(kernel):
+            horizontal += padded[:, offset:offset + width] * weight
+
+        strip = np.zeros((bottom - top, width, pixels.shape[2]), dtype=pixels.dtype)
+        for offset, weight in enumerate(kernel):
+            strip += horizontal[offset:offset + bottom - top] * weight
+
+        blurred[top:bottom] = strip
+
+    return blurred
+
+def bilateral_blur(pixels, determinator, iterations, sigma_color, sigma_space):
+    # Same as the Bilateral Blur node: neighbours within sigma_space + iterations
+    # are averaged when their determinator color is closer than sigma_color
+    radius = int(math.ceil(sigma_space + iterations))
+    height, width = pixels.shape[:2]
+
+    result = np.empty_like(pixels)
+
+    # Each strip is padded with its own halo, nothing the size of the image is copied
+    for top in range(0, height, STRIP_HEIGHT):
+        bottom = min(top + STRIP_HEIGHT, height)
+        rows = get_strip_rows(top, bottom, radius, height)
+        padded_pixels = pad_columns(pixels[rows], radius)
+        padded_determinator = pad_columns(determinator[rows, :, :3], radius)
+        reference = determinator[top:bottom, :, :3]
+
+        strip_sum = np.zeros((bottom - top, width, pixels.shape[2]), dtype=np.float32)
+        strip_weight = np.zeros((bottom - top, width, 1), dtype=np.float32)
+
+        for dy in range(2 * radius + 1):
+            for dx in range(2 * radius + 1):
+                neighbour = padded_determinator[dy:dy + bottom - top, dx:dx + width]
+                delta_color = np.abs(neighbour - reference).sum(axis=2, keepdims=True)
+                weight = (delta_color < sigma_color).astype(np.float32)
+
+                strip_sum += padded_pixels[dy:dy + bottom - top, dx:dx + width] * weight
+                strip_weight += weight
+
+        # The center pixel always passes the test, so the weight is never zero
+        result[top:bottom] = strip_sum / strip_weight
+
+    return result
+
+def get_filter_radius(properties):
+    # Texels around a pixel the filters of apply_filters read
+    if not properties.use_bilateral_blur:
+        return 0
+
+    # The determinator blur, then the bilateral blur over it
+    return 2 + int(math.ceil(properties.bilateral_blur_space_sigma + properties.bilateral_blur_iterations))
+
+def apply_filters(pixels, properties):
+    if properties.use_bilateral_blur:
+        # The compositor graph feeds a 2px blur as determinator
+        determinator = gaussian_blur(pixels, 2)
+        pixels = bilateral_blur(
+            pixels,
+            determinator,
+            properties.bilateral_blur_iterations,
+            properties.bilateral_blur_color_sigma,
+            properties.bilateral_blur_space_sigma,
+        )
+
+    return pixels
@@ -0,0 +1,91 @@
+from . import coverage, uvcheck
+
+# Preflight
+# Each object of the list is checked once for every problem at the same time,
+# instead of stopping at the first kind of problem. The result of an object,
+# its lightmap UV triangles included, is kept until the depsgraph reports a
+# change of its geometry, shading, mesh or materials, so checking an unchanged
+# list again costs nothing.
+
+MISSING_OBJECT = "Objects missing from the scene"
+NOT_MESH = "Selected objects aren't meshes"
+MISSING_UV = "Selected objects missing a second UV map"
+MISSING_MATERIALS = "Selected objects missing materials"
+UNUSED_SLOTS = "Selected objects have unused material slots"
+
+# Object name: (problems, lightmap UV triangles or None)
+object_results = {}
+
+# Lightmap UV analysis of the last list: (objects and settings, problems)
+uv_result = None
+
+def reset():
+    global uv_result
+    object_results.clear()
+    uv_result = None
+
+def invalidate(obj_name):
+    global uv_result
+    if object_results.pop(obj_name, None) is not None:
+        uv_result = None
+
+def check_object(obj):
+    if obj is None:
+        return [MISSING_OBJECT]
+    if obj.type != 'MESH':
+        return [NOT_MESH]
+
+    problems = []
+    if len(obj.data.uv_layers) < 2:
+        problems.append(MISSING_UV)
+
+    if not obj.data.materials:
+        problems.append(MISSING_MATERIALS)
+    elif any(not slot.material for slot in obj.material_slots):
+        problems.append(UNUSED_SLOTS)
+
+    return problems
+
+def get_object_result(obj_name, obj, depsgraph, check_uvs):
+    result = object_results.get(obj_name)
+
+    if result is None or (check_uvs and result[1] is None and MISSING_UV not in result[0]):
+        problems = check_object(obj)
+        triangles = None
+        if check_uvs and not (set(problems) & {MISSING_OBJECT, NOT_MESH, MISSING_UV}):
+            triangles = coverage.get_lightmap_uv_triangles(obj, depsgraph)
+
+        result = (problems, triangles)
+
+        # Missing objects may show up under the same name
+        if obj is not None:
+            object_results[obj_name] = result
+
+    return result
+
+def run(objects_to_bake, depsgraph, resolution, use_udim=False, check_shared=True, check_uvs=True):
+    # objects_to_bake: list of (object name, object or None)
+    # Returns the names of the offending objects, grouped by error message
+    global uv_result
+    problems = {}
+    triangle_sets = []
+
+    for obj_name, obj in objects_to_bake:
+        object_problems, triangles = get_object_result(obj_name, obj, depsgraph, check_uvs)
+
+        for message in object_problems:
+            problems.setdefault(message, []).append(obj_name)
+
+        if triangles is not None and len(triangles):
+            triangle_sets.append((obj_name, triangles))
+
+    # Overlaps between objects, analysed again only when an object or a setting changed
+    if check_uvs and triangle_sets:
+        key = (tuple(obj_name for obj_name, _ in triangle_sets), resolution, use_udim, check_shared)
+        if uv_result is None or uv_result[0] != key:
+            uv_result = (key, uvcheck.analyse(triangle_sets, resolution, use_udim, check_shared))
+
+        for message, names in uv_result[1].items():
+            problems.setdefault(message, []).extend(names)
+
+    return problems
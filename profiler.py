@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Bake profiler
+# Spans of the bake stages (checks, node setup, Cycles bakes, idle time, post
+# process, save...) written in the Chrome trace event format, open the file in
+# chrome://tracing or ui.perfetto.dev to see where a long bake spends its time.
+
+# Spans of the current (or last) bake: (stage, start, end, args)
+spans = []
+
+def reset():
+    spans.clear()
+
+def record(stage, time_start, time_end, **args):
+    spans.append((stage, time_start, time_end, args))
+
+@contextmanager
+def span(stage, **args):
+    time_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time_start, time.perf_counter(), **args)
+
+def get_summary():
+    # (stage, total time, count) of each stage, longest first
+    totals = {}
+    for stage, time_start, time_end, _ in spans:
+        total_time, count = totals.get(stage, (0.0, 0))
+        totals[stage] = (total_time + time_end - time_start, count + 1)
+
+    return sorted(((stage, total_time, count) for stage, (total_time, count) in totals.items()), key=lambda stage: -stage[1])
+
+def get_peak_rss():
+    # Peak resident memory of the process so far in bytes, None when the
+    # platform doesn't tell
+    if sys.platform == 'win32':
+        return get_peak_working_set()
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+def get_peak_working_set():
+    # Windows has no getrusage, the peak working set is the peak resident memory
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    try:
+        kernel32 = ctypes.WinDLL("kernel32")
+        psapi = ctypes.WinDLL("psapi")
+    except OSError:
+        return None
+
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    psapi.GetProcessMemoryInfo.restype = wintypes.BOOL
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+
+    return counters.PeakWorkingSetSize
+
+def write_trace(path):
+    if not spans:
+        return
+
+    origin = min(time_start for _, time_start, _, _ in spans)
+    process_id = os.getpid()
+
+    events = [{
+        "name": stage,
+        "cat": "bake",
+        "ph": "X",
+        "ts": (time_start - origin) * 1e6,
+        "dur": (time_end - time_start) * 1e6,
+        "pid": process_id,
+        "tid": 0,
+        "args": args,
+    } for stage, time_start, time_end, args in spans]
+
+    with open(path, 'w') as trace_file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
@@ -0,0 +1,71 @@
+import json
+import math
+
+import numpy as np
+
+from . import atlas, coverage
+
+# Lightmap report
+# After a bake: how much of the lightmap is used, how many texels each object
+# gets and its texel density, and the smallest resolution keeping every object
+# above a density threshold. Written as JSON next to the lightmap.
+
+# Objects further than this factor from the median density are outliers
+OUTLIER_FACTOR = 2.0
+
+def build_report(objects, pixels, depsgraph, resolutions, min_texels_per_meter):
+    height, width = pixels.shape[:2]
+
+    triangles = [coverage.get_lightmap_uv_triangles(obj, depsgraph) for obj in objects]
+    object_ids = np.repeat(np.arange(len(objects)), [len(object_triangles) for object_triangles in triangles])
+
+    covered = np.zeros(width * height, dtype=bool)
+    texel_counts = np.zeros(len(objects), dtype=np.int64)
+    if len(object_ids):
+        for hits, texels in coverage.iterate_texels(np.concatenate(triangles), width, height):
+            covered[texels] = True
+            texel_counts += np.bincount(object_ids[hits], minlength=len(objects))
+
+    # Texels holding light, margins included
+    written = (pixels[..., :3] != 0.0).any(axis=2)
+
+    objects_report = []
+    for obj, texels in zip(objects, texel_counts.tolist()):
+        world_area = atlas.get_surface_areas(obj, depsgraph)[0]
+        objects_report.append({
+            "object": obj.name,
+            "texels": texels,
+            "surface_area": world_area,
+            "texels_per_meter": math.sqrt(texels / world_area) if world_area > 0.0 else 0.0,
+        })
+
+    densities = [entry["texels_per_meter"] for entry in objects_report if entry["texels_per_meter"] > 0.0]
+    median_density = float(np.median(densities)) if densities else 0.0
+
+    for entry in objects_report:
+        density = entry["texels_per_meter"]
+        entry["outlier"] = bool(median_density) and (density < median_density / OUTLIER_FACTOR or density > median_density * OUTLIER_FACTOR)
+
+    # The density follows the resolution
+    suggested_resolution = max(resolutions)
+    if densities:
+        for resolution in sorted(resolutions):
+            if min(densities) * resolution / width >= min_texels_per_meter:
+                suggested_resolution = resolution
+                break
+
+    return {
+        "resolution": width,
+        "covered_texels": int(covered.sum()),
+        "written_texels": int(written.sum()),
+        "utilization": float(covered.mean()) * 100.0,
+        "written": float(written.mean()) * 100.0,
+        "median_texels_per_meter": median_density,
+        "min_texels_per_meter": min_texels_per_meter,
+        "suggested_resolution": suggested_resolution,
+        "objects": objects_report,
+    }
+
+def write_report(path, report):
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
@@ -0,0 +1,144 @@
+import json
+import math
+
+import numpy as np
+
+# Adaptive sampling
+# Every object is first baked twice with half of the initial samples and two
+# different seeds. Both bakes see the same light with independent noise, so
+# the difference between them measures the noise of the object. The mean of
+# both bakes is the initial estimate, and the rest of the sample budget only
+# goes to the objects still noisier than the threshold. Their extra bake is
+# blended in, weighted by sample count.
+
+# Objects are never given more than this many times the uniform sample count
+MAX_SAMPLES_FACTOR = 4
+
+# Passes of an adaptive bake
+FIRST_HALF = 0
+SECOND_HALF = 1
+REFINE = 2
+PASS_COUNT = 3
+
+def estimate_noise(first, second, mask):
+    # Relative standard error of the mean of two independent bakes, over the texels of the mask
+    if not mask.any():
+        return 0.0
+
+    first = first[mask][:, :3]
+    second = second[mask][:, :3]
+
+    # Each half has a variance of E[(a - b)^2] / 2, their mean half of that
+    variance = np.mean((first - second) ** 2) / 4.0
+    level = np.mean(np.abs(first + second)) / 2.0
+
+    return float(math.sqrt(variance) / max(level, 1e-6))
+
+def allocate_samples(noise, initial_samples, budget, threshold, max_samples):
+    # noise: object name -> noise at the initial samples
+    # Returns the extra samples of each object above the threshold
+    needed = {}
+    for obj_name, value in noise.items():
+        if value <= threshold:
+            continue
+
+        # Noise goes down with the square root of the sample count
+        samples = min(max_samples, math.ceil(initial_samples * (value / threshold) ** 2))
+        if samples > initial_samples:
+            needed[obj_name] = samples - initial_samples
+
+    total = sum(needed.values())
+    if total > budget:
+        # Every noisy object gets its share of what is left
+        needed = {obj_name: int(samples * budget / total) for obj_name, samples in needed.items()}
+
+    return {obj_name: samples for obj_name, samples in needed.items() if samples > 0}
+
+def blend(pixels, samples, refined, refined_samples):
+    # Running mean of two bakes, samples and refined_samples may be per texel arrays
+    return (pixels * samples + refined * refined_samples) / (samples + refined_samples)
+
+class AdaptiveBake:
+    def __init__(self, objects_to_bake, initial_samples, sample_count, threshold, base_seed):
+        self.objects = list(objects_to_bake)
+        # Split in two equal halves
+        self.initial_samples = max(2, initial_samples - initial_samples % 2)
+        self.sample_count = sample_count
+        self.threshold = threshold
+        self.base_seed = base_seed
+        self.pass_index = FIRST_HALF
+
+        # The uniform bake would give sample_count to every object
+        self.budget = max(0, (sample_count - self.initial_samples) * len(self.objects))
+        self.max_samples = sample_count * MAX_SAMPLES_FACTOR
+
+        # Object name: bake time of each pass
+        self.times = {obj_name: [0.0, 0.0, 0.0] for obj_name in self.objects}
+        self.noise = {}
+        self.extra_samples = {}
+
+        # Texels covered by the baked objects, refined margins don't count there
+        self.covered = None
+
+        # Objects skipped by the refine pass only
+        self.skipped = set()
+
+    def get_pass_samples(self, obj_name=None):
+        if self.pass_index == REFINE:
+            return self.extra_samples[obj_name]
+        return self.initial_samples // 2
+
+    def get_pass_seed(self):
+        return self.base_seed + self.pass_index
+
+    def add_time(self, obj_name, bake_time):
+        if obj_name in self.times:
+            self.times[obj_name][self.pass_index] += bake_time
+
+    def allocate(self):
+        self.extra_samples = allocate_samples(self.noise, self.initial_samples, self.budget, self.threshold, self.max_samples)
+        return self.extra_samples
+
+    def get_total_time(self, obj_name):
+        return sum(self.times[obj_name])
+
+    def get_report(self):
+        objects = []
+        uniform_time = 0.0
+        adaptive_time = 0.0
+
+        for obj_name in self.objects:
+            extra = self.extra_samples.get(obj_name, 0)
+            samples = self.initial_samples + extra
+            noise = self.noise.get(obj_name, 0.0)
+
+            # Bake time grows linearly with the sample count
+            initial_time = self.times[obj_name][FIRST_HALF] + self.times[obj_name][SECOND_HALF]
+            uniform_time += initial_time * self.sample_count / self.initial_samples
+            adaptive_time += self.get_total_time(obj_name)
+
+            objects.append({
+                "object": obj_name,
+                "noise": noise,
+                "final_noise": noise * math.sqrt(self.initial_samples / samples),
+                "samples": samples,
+                "refined": extra > 0,
+                "time": self.get_total_time(obj_name),
+            })
+
+        return {
+            "initial_samples": self.initial_samples,
+            "uniform_samples": self.sample_count,
+            "noise_threshold": self.threshold,
+            "refined_objects": sum(entry["refined"] for entry in objects),
+            "total_samples": sum(entry["samples"] for entry in objects),
+            "uniform_total_samples": self.sample_count * len(objects),
+            "uniform_time": uniform_time,
+            "adaptive_time": adaptive_time,
+            "time_saved": uniform_time - adaptive_time,
+            "objects": objects,
+        }
+
+def write_report(path, sampling_report):
+    with open(path, 'w') as report_file:
+        json.dump(sampling_report, report_file, indent=2)
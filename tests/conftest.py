@@ -0,0 +1,20 @@
+import os
+import sys
+import types
+
+# The addon's __init__ imports the Blender side of the addon. The NumPy modules
+# (coverage, postprocess, cache, journal, jobqueue, sampling, accumulation,
+# uvpack, atlas, uvcheck) only import each other, so they are loaded from a
+# package skipping __init__, and the tests run with a plain Python and NumPy.
+# The package is also registered under the name of the addon directory, pytest
+# then finds it already imported when it sets up the addon directory as a
+# package.
+
+ADDON_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+package = types.ModuleType("lightmap_baker_addon")
+package.__path__ = [ADDON_DIRECTORY]
+package.__file__ = os.path.join(ADDON_DIRECTORY, "__init__.py")
+
+sys.modules.setdefault("lightmap_baker_addon", package)
+sys.modules.setdefault(os.path.basename(ADDON_DIRECTORY), package)
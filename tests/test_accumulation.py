@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+
+from lightmap_baker_addon import accumulation
+
+def bake(value, shape=(4, 6)):
+    return np.full(shape + (4,), value, dtype=np.float32)
+
+def test_runs_are_weighted_by_samples(tmp_path):
+    buffer = accumulation.AccumulationBuffer(str(tmp_path / "Lightmap_accumulation"))
+
+    info = buffer.start_run("key", 5)
+    assert info == {"key": "key", "samples": 0, "runs": 0, "seed": 5}
+    first = buffer.accumulate(info, bake(1.0), 256)
+    assert (first == 1.0).all()
+
+    # A refine run goes on from the stored accumulation
+    info = buffer.start_run("key", 5)
+    assert (info["samples"], info["runs"]) == (256, 1)
+    second = buffer.accumulate(info, bake(4.0), 768)
+
+    assert np.allclose(second, (1.0 * 256 + 4.0 * 768) / 1024)
+    assert (info["samples"], info["runs"]) == (1024, 2)
+
+    # Stored as full floats, with the sample count
+    with open(buffer.info_path) as info_file:
+        assert json.load(info_file) == {"key": "key", "samples": 1024, "runs": 2, "seed": 5}
+    stored = np.load(buffer.pixels_path)
+    assert stored.dtype == np.float32
+    assert np.array_equal(stored, second)
+    assert np.array_equal(buffer.load_pixels(6, 4), second)
+
+def test_changed_key_starts_over(tmp_path):
+    buffer = accumulation.AccumulationBuffer(str(tmp_path / "Lightmap_accumulation"))
+    buffer.accumulate(buffer.start_run("key", 5), bake(1.0), 256)
+
+    info = buffer.start_run("other key", 9)
+
+    assert info == {"key": "other key", "samples": 0, "runs": 0, "seed": 9}
+    assert (buffer.accumulate(info, bake(4.0), 128) == 4.0).all()
+    assert buffer.load_info()["samples"] == 128
+
+def test_new_bake_starts_over(tmp_path):
+    buffer = accumulation.AccumulationBuffer(str(tmp_path / "Lightmap_accumulation"))
+    buffer.accumulate(buffer.start_run("key", 5), bake(1.0), 256)
+
+    assert buffer.start_run("key", 5, refine=False)["samples"] == 0
+
+def test_changed_resolution_starts_over(tmp_path):
+    buffer = accumulation.AccumulationBuffer(str(tmp_path / "Lightmap_accumulation"))
+    buffer.accumulate(buffer.start_run("key", 5), bake(1.0), 256)
+
+    info = buffer.start_run("key", 5)
+    pixels = buffer.accumulate(info, bake(4.0, (8, 12)), 128)
+
+    assert (pixels == 4.0).all()
+    assert info["samples"] == 128
+    assert buffer.load_pixels(6, 4) is None
+    assert buffer.load_pixels(12, 8).shape == (8, 12, 4)
+
+def test_broken_or_missing_buffer_starts_over(tmp_path):
+    buffer = accumulation.AccumulationBuffer(str(tmp_path / "Lightmap_accumulation"))
+    assert buffer.start_run("key", 5)["samples"] == 0
+
+    buffer.accumulate(buffer.start_run("key", 5), bake(1.0), 256)
+    with open(buffer.info_path, 'w') as info_file:
+        info_file.write('{"key": "ke')
+
+    assert buffer.start_run("key", 5)["samples"] == 0
+
+    buffer.clear()
+    assert not buffer.exists()
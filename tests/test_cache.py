@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+
+from lightmap_baker_addon import cache
+
+def make_tile(x, y, covered, radius, value):
+    # Tile of an object covering the covered texels, with a margin of radius texels around them
+    height, width = covered.shape
+    padded = np.zeros((height + 2 * radius, width + 2 * radius), dtype=bool)
+    padded[radius:radius + height, radius:radius + width] = covered
+
+    mask = padded.copy()
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            mask |= np.roll(np.roll(padded, dy, axis=0), dx, axis=1)
+
+    pixels = np.full(mask.shape + (4,), value, dtype=np.float32)
+    return x - radius, y - radius, mask, padded, pixels
+
+def test_margins_never_overwrite_covered_texels():
+    # Two objects side by side, each margin reaches over the other object
+    left = make_tile(2, 2, np.ones((4, 4), dtype=bool), 2, 1.0)
+    right = make_tile(6, 2, np.ones((4, 4), dtype=bool), 2, 2.0)
+
+    for tiles in ([left, right], [right, left]):
+        pixels = np.zeros((8, 12, 4), dtype=np.float32)
+        cache.paste_tiles(pixels, tiles)
+
+        assert (pixels[2:6, 2:6] == 1.0).all()
+        assert (pixels[2:6, 6:10] == 2.0).all()
+        # Margins around the pair
+        assert (pixels[2:6, :2] == 1.0).all()
+        assert (pixels[2:6, 10:] == 2.0).all()
+
+def test_margins_only_fill_texels_nobody_covers():
+    pixels = np.full((10, 10, 4), 5.0, dtype=np.float32)
+    tile = make_tile(4, 4, np.ones((2, 2), dtype=bool), 1, 1.0)
+
+    cache.paste_tiles(pixels, [tile])
+
+    assert (pixels[3:7, 3:7] == 1.0).all()
+    # Texels outside of the tile mask are left alone
+    assert (pixels[:3] == 5.0).all()
+    assert (pixels[7:] == 5.0).all()
+
+def test_overlapping_margins_keep_the_first_tile():
+    first = make_tile(2, 4, np.ones((1, 1), dtype=bool), 2, 1.0)
+    second = make_tile(6, 4, np.ones((1, 1), dtype=bool), 2, 2.0)
+    pixels = np.zeros((9, 9, 4), dtype=np.float32)
+
+    cache.paste_tiles(pixels, [first, second])
+
+    # Column 4 is in both margins
+    assert (pixels[2:7, 4] == 1.0).all()
+    assert (pixels[2:7, 5:] == 2.0).all()
+
+def test_extract_tile_is_the_bounding_box():
+    mask = np.zeros((8, 8), dtype=bool)
+    mask[2:4, 3:6] = True
+    pixels = np.arange(8 * 8 * 4, dtype=np.float32).reshape(8, 8, 4)
+
+    x, y, tile_mask, tile_pixels = cache.extract_tile(pixels, mask)
+
+    assert (x, y) == (3, 2)
+    assert tile_mask.all() and tile_mask.shape == (2, 3)
+    assert np.array_equal(tile_pixels, pixels[2:4, 3:6])
+    assert cache.extract_tile(pixels, np.zeros((8, 8), dtype=bool)) is None
+
+def test_entries_round_trip_and_evict_least_recently_used(tmp_path):
+    bake_cache = cache.BakeCache(str(tmp_path), 0)
+    rng = np.random.default_rng(0)
+    keys = [cache.get_key(f"object {index}", "settings") for index in range(3)]
+
+    for index, key in enumerate(keys):
+        mask = rng.random((6, 5)) < 0.7
+        covered = mask & (rng.random((6, 5)) < 0.5)
+        bake_cache.store(key, index, 2 * index, mask, covered, rng.random((6, 5, 4)), 1.5)
+        os.utime(bake_cache.get_entry_path(key), (index, index))
+
+    x, y, mask, covered, pixels, bake_time = bake_cache.load(keys[1])
+    assert (x, y, bake_time) == (1, 2, 1.5)
+    assert pixels.dtype == np.float32
+    assert not pixels[~mask].any()
+
+    # Loading made the second entry the most recent one
+    sizes = {key: os.path.getsize(bake_cache.get_entry_path(key)) for key in keys}
+    bake_cache.max_size = sizes[keys[1]] + sizes[keys[2]]
+    bake_cache.evict()
+
+    assert bake_cache.load(keys[0]) is None
+    assert bake_cache.load(keys[1]) is not None
+    assert bake_cache.load(keys[2]) is not None
@@ -0,0 +1,190 @@
+import numpy as np
+
+from lightmap_baker_addon import coverage
+
+def square(lower, upper):
+    # Two triangles sharing the diagonal of the (lower, upper) rectangle
+    (x0, y0), (x1, y1) = lower, upper
+    return np.array([
+        [(x0, y0), (x1, y0), (x1, y1)],
+        [(x0, y0), (x1, y1), (x0, y1)],
+    ], dtype=np.float64)
+
+def polygon(sides, center, radius):
+    angles = np.arange(sides) * 2.0 * np.pi / sides
+    return np.stack([center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)], axis=1)
+
+def fan(points, center):
+    # Triangles from an inner point to every edge of the polygon
+    return np.array([(center, points[index], points[(index + 1) % len(points)]) for index in range(len(points))])
+
+def strip(points):
+    # Triangles from the first vertex of the polygon
+    return np.array([(points[0], points[index], points[index + 1]) for index in range(1, len(points) - 1)])
+
+def test_unit_square_covers_every_texel_once():
+    counts = coverage.rasterize_triangles(square((0.0, 0.0), (1.0, 1.0)), 16, 16, counts=True)
+
+    assert (counts == 1).all()
+
+def test_texel_aligned_squares_tile_without_overlap():
+    # Squares with their corners on texel centers, every texel on a shared
+    # edge or corner belongs to exactly one of them
+    size = 12
+    triangles = np.concatenate([square(((x + 0.5) / size, (y + 0.5) / size), ((x + 3.5) / size, (y + 3.5) / size))
+                                for x in range(0, 9, 3) for y in range(0, 9, 3)])
+    counts = coverage.rasterize_triangles(triangles, size, size, counts=True)
+
+    assert counts.max() == 1
+    # Each 3x3 texel square owns 9 texels, like its area
+    assert counts.sum() == 9 * 9
+
+def test_shared_edges_through_texel_centers_count_once():
+    # Vertices on texel centers, the inner edges run through texel centers
+    size = 32
+    points = polygon(8, (0.5, 0.5), 0.4)
+    points = (np.round(points * size - 0.5) + 0.5) / size
+    center = (np.array([16.0, 16.0]) + 0.5) / size
+
+    fan_counts = coverage.rasterize_triangles(fan(points, center), size, size, counts=True)
+    strip_counts = coverage.rasterize_triangles(strip(points), size, size, counts=True)
+
+    assert fan_counts.max() == 1
+    assert strip_counts.max() == 1
+    # Both triangulations of the polygon cover the same texels, no gap inside
+    assert np.array_equal(fan_counts, strip_counts)
+
+def test_winding_does_not_matter():
+    triangles = fan(polygon(7, (0.45, 0.55), 0.3), (0.47, 0.52))
+
+    counter_clockwise = coverage.rasterize_triangles(triangles, 64, 64)
+    clockwise = coverage.rasterize_triangles(triangles[:, ::-1], 64, 64)
+
+    assert counter_clockwise.any()
+    assert np.array_equal(counter_clockwise, clockwise)
+
+def test_degenerate_and_outside_triangles_cover_nothing():
+    triangles = np.array([
+        [(0.1, 0.1), (0.5, 0.5), (0.9, 0.9)],
+        [(1.2, 1.2), (1.8, 1.2), (1.5, 1.9)],
+        [(-0.9, 0.2), (-0.1, 0.2), (-0.5, 0.8)],
+    ])
+
+    assert not coverage.rasterize_triangles(triangles, 32, 32).any()
+
+def test_rows_are_the_v_axis():
+    # Bottom half of the UV square, the first rows of image.pixels
+    mask = coverage.rasterize_triangles(square((0.0, 0.0), (1.0, 0.5)), 8, 8)
+
+    assert mask[:4].all()
+    assert not mask[4:].any()
+
+def test_large_triangles_split_in_bands(monkeypatch):
+    triangles = fan(polygon(9, (0.5, 0.5), 0.45), (0.5, 0.5))
+    expected = coverage.rasterize_triangles(triangles, 256, 256, counts=True)
+
+    monkeypatch.setattr(coverage, "MAX_CANDIDATES", 1 << 10)
+    banded = coverage.rasterize_triangles(triangles, 256, 256, counts=True)
+
+    assert np.array_equal(banded, expected)
+
+def test_region_matches_the_whole_lightmap():
+    triangles = fan(polygon(6, (0.3, 0.7), 0.12), (0.31, 0.69))
+    margin = 3
+    full = coverage.rasterize_triangles(triangles, 128, 128)
+
+    x, y, mask = coverage.rasterize_region(triangles, 128, 128, margin)
+    height, width = mask.shape
+
+    assert np.array_equal(full[y:y + height, x:x + width], mask)
+    assert full.sum() == mask.sum()
+
+    # The margin fits in the region
+    dilated = coverage.dilate_mask(mask, margin)
+    assert np.array_equal(dilated, coverage.dilate_mask(full, margin)[y:y + height, x:x + width])
+    assert coverage.dilate_mask(full, margin).sum() == dilated.sum()
+
+def test_region_is_clipped_to_the_lightmap():
+    triangles = square((-0.2, -0.2), (0.1, 0.1))
+
+    x, y, mask = coverage.rasterize_region(triangles, 64, 64, 4)
+
+    assert (x, y) == (0, 0)
+    assert np.array_equal(mask, coverage.rasterize_triangles(triangles, 64, 64)[:mask.shape[0], :mask.shape[1]])
+
+def test_empty_region_is_none():
+    assert coverage.rasterize_region(np.empty((0, 3, 2)), 64, 64) is None
+    assert coverage.rasterize_region(square((1.5, 1.5), (1.8, 1.8)), 64, 64) is None
+
+def fill(mask, radius):
+    # Pixels holding the index of their texel, covered texels only
+    height, width = mask.shape
+    pixels = np.full((height, width, 4), -1.0, dtype=np.float32)
+    pixels[mask, 0] = np.flatnonzero(mask)
+    return coverage.fill_margin(pixels, mask, radius)
+
+def test_margin_of_a_single_texel_is_a_square():
+    mask = np.zeros((16, 16), dtype=bool)
+    mask[6, 9] = True
+
+    pixels = fill(mask, 3)
+
+    filled = pixels[..., 0] >= 0
+    assert np.array_equal(filled, coverage.dilate_mask(mask, 3))
+    assert filled.sum() == 7 * 7
+    assert (pixels[filled, 0] == 6 * 16 + 9).all()
+
+def test_margin_keeps_covered_texels():
+    mask = coverage.rasterize_triangles(fan(polygon(5, (0.5, 0.5), 0.3), (0.5, 0.5)), 48, 48)
+    pixels = np.random.default_rng(1).random((48, 48, 4)).astype(np.float32)
+    covered = pixels[mask].copy()
+
+    coverage.fill_margin(pixels, mask, 4)
+
+    assert np.array_equal(pixels[mask], covered)
+
+def test_margin_without_radius_or_coverage_changes_nothing():
+    pixels = np.random.default_rng(2).random((8, 8, 4)).astype(np.float32)
+    mask = np.zeros((8, 8), dtype=bool)
+    original = pixels.copy()
+
+    assert np.array_equal(coverage.fill_margin(pixels, mask, 4), original)
+
+    mask[3, 3] = True
+    assert np.array_equal(coverage.fill_margin(pixels, mask, 0), original)
+
+def test_margin_takes_the_color_of_a_covered_texel_in_reach():
+    rng = np.random.default_rng(3)
+    mask = rng.random((40, 56)) < 0.02
+    radius = 5
+
+    pixels = fill(mask, radius)
+
+    # Every texel in reach of the mask is filled, and nothing else
+    filled = pixels[..., 0] >= 0
+    assert np.array_equal(filled, coverage.dilate_mask(mask, radius))
+
+    # With a covered texel, no further than the radius on both axes
+    rows, columns = np.nonzero(filled & ~mask)
+    seed_rows, seed_columns = np.divmod(pixels[rows, columns, 0].astype(np.int64), mask.shape[1])
+    assert mask[seed_rows, seed_columns].all()
+    assert (np.abs(seed_rows - rows) <= radius).all()
+    assert (np.abs(seed_columns - columns) <= radius).all()
+
+def test_margin_takes_the_nearest_of_two_islands():
+    mask = np.zeros((9, 20), dtype=bool)
+    mask[4, 2] = True
+    mask[4, 17] = True
+
+    pixels = fill(mask, 8)
+
+    assert (pixels[:, 3:10, 0] == 4 * 20 + 2).all()
+    assert (pixels[:, 10:17, 0] == 4 * 20 + 17).all()
+
+def test_margin_wider_than_the_image():
+    mask = np.zeros((3, 5), dtype=bool)
+    mask[1, 4] = True
+
+    pixels = fill(mask, 16)
+
+    assert (pixels[..., 0] == 1 * 5 + 4).all()
@@ -0,0 +1,204 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from lightmap_baker_addon import jobqueue
+
+class FakeClock:
+    # Same clock for the coordinator (monotonic) and the workers (time_ns)
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time_ns(self):
+        return int(self.now * 1e9)
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(jobqueue, "time", fake_clock)
+    return fake_clock
+
+def submit_jobs(queue, count, bake_id="bake"):
+    for index in range(count):
+        queue.submit({"job": f"{bake_id}_{index:04d}", "bake": bake_id, "objects": [f"Object_{index}"]})
+
+def make_tiles(value):
+    mask = np.ones((2, 3), dtype=bool)
+    return [(4, 5, mask, mask, np.full((2, 3, 4), value, dtype=np.float32))]
+
+def test_each_job_is_claimed_once(tmp_path, clock):
+    queue = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    other_worker = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    submit_jobs(queue, 2)
+
+    first = queue.claim()
+    second = other_worker.claim()
+
+    assert {first["job"], second["job"]} == {"bake_0000", "bake_0001"}
+    assert first["claim"] != second["claim"]
+    assert first["objects"] == ["Object_0"]
+    assert queue.claim() is None
+    assert queue.list_jobs("pending") == []
+    assert queue.list_jobs("claimed") == ["bake_0000", "bake_0001"]
+
+def test_complete_hands_the_tiles_over(tmp_path, clock):
+    queue = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    submit_jobs(queue, 1)
+    job = queue.claim()
+
+    assert queue.complete(job, make_tiles(2.0), [{"object": "Object_0", "time": 1.5}])
+
+    assert queue.list_jobs("claimed") == []
+    assert queue.list_jobs("done") == ["bake_0000"]
+    assert queue.read_json(queue.get_path("done", "bake_0000"))["timings"] == [{"object": "Object_0", "time": 1.5}]
+
+    (x, y, mask, covered, pixels), = queue.load_result("bake_0000")
+    assert (x, y) == (4, 5)
+    assert mask.all() and covered.all()
+    assert pixels.dtype == np.float32 and (pixels == 2.0).all()
+
+def test_failed_job_keeps_its_error(tmp_path, clock):
+    queue = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    submit_jobs(queue, 1)
+    job = queue.claim()
+
+    assert queue.fail(job, "Object_0 not found")
+
+    assert queue.list_jobs("claimed") == []
+    assert queue.read_json(queue.get_path("failed", "bake_0000"))["error"] == "Object_0 not found"
+
+def test_heartbeats_keep_the_claim(tmp_path, clock):
+    coordinator = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    worker = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    submit_jobs(coordinator, 1)
+    job = worker.claim()
+
+    for _ in range(10):
+        coordinator.reclaim_stale()
+        clock.advance(30.0)
+        assert worker.heartbeat(job)
+
+    coordinator.reclaim_stale()
+    assert coordinator.list_jobs("claimed") == ["bake_0000"]
+    assert coordinator.list_jobs("pending") == []
+
+def test_stale_claim_goes_back_to_pending(tmp_path, clock):
+    coordinator = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    worker = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    submit_jobs(coordinator, 1)
+    worker.claim()
+
+    # The timeout runs from the first time the coordinator saw the heartbeat
+    coordinator.reclaim_stale()
+    clock.advance(59.0)
+    coordinator.reclaim_stale()
+    assert coordinator.list_jobs("claimed") == ["bake_0000"]
+
+    clock.advance(2.0)
+    coordinator.reclaim_stale()
+    assert coordinator.list_jobs("claimed") == []
+    assert coordinator.list_jobs("pending") == ["bake_0000"]
+
+def test_worker_clock_is_never_compared_with_the_coordinator(tmp_path, clock):
+    coordinator = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    worker = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    submit_jobs(coordinator, 1)
+    job = worker.claim()
+
+    # A heartbeat from a clock a day behind still counts as a change
+    coordinator.reclaim_stale()
+    clock.advance(50.0)
+    heartbeat = int((clock.now - 86400.0) * 1e9)
+    os.utime(worker.get_claim_path(job), ns=(heartbeat, heartbeat))
+    coordinator.reclaim_stale()
+    clock.advance(50.0)
+    coordinator.reclaim_stale()
+
+    assert coordinator.list_jobs("claimed") == ["bake_0000"]
+
+def test_reclaimed_job_is_not_written_by_its_old_worker(tmp_path, clock):
+    coordinator = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    slow_worker = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    new_worker = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    submit_jobs(coordinator, 1)
+    slow_job = slow_worker.claim()
+
+    coordinator.reclaim_stale()
+    clock.advance(61.0)
+    coordinator.reclaim_stale()
+
+    # The heartbeat of the old worker doesn't bring its claim back
+    assert not slow_worker.heartbeat(slow_job)
+    assert coordinator.list_jobs("claimed") == []
+    assert coordinator.list_jobs("pending") == ["bake_0000"]
+
+    new_job = new_worker.claim()
+    assert not slow_worker.heartbeat(slow_job)
+    assert not slow_worker.complete(slow_job, make_tiles(1.0), [])
+    assert not slow_worker.fail(slow_job, "cancelled")
+
+    # The claim of the new worker is left alone
+    assert coordinator.list_jobs("claimed") == ["bake_0000"]
+    assert coordinator.list_jobs("done") == [] and coordinator.list_jobs("failed") == []
+
+    assert new_worker.complete(new_job, make_tiles(2.0), [])
+    assert coordinator.list_jobs("claimed") == []
+    assert coordinator.list_jobs("pending") == []
+    assert (coordinator.load_result("bake_0000")[0][4] == 2.0).all()
+
+def test_released_claim_of_a_dead_worker_is_reclaimed(tmp_path, clock):
+    coordinator = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    worker = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    submit_jobs(coordinator, 1)
+    job = worker.claim()
+
+    # Dies after taking its claim back, before writing the result
+    assert worker.release(job)
+    assert coordinator.list_jobs("claimed") == ["bake_0000"]
+
+    coordinator.reclaim_stale()
+    clock.advance(61.0)
+    coordinator.reclaim_stale()
+
+    assert coordinator.list_jobs("claimed") == []
+    assert coordinator.list_jobs("pending") == ["bake_0000"]
+
+def test_remove_bake_leaves_other_bakes(tmp_path, clock):
+    queue = jobqueue.JobQueue(str(tmp_path), timeout=60.0)
+    submit_jobs(queue, 3, "first")
+    submit_jobs(queue, 1, "second")
+    queue.complete(queue.claim(), make_tiles(1.0), [])
+    queue.claim()
+
+    queue.remove_bake("first")
+
+    for state in jobqueue.STATES:
+        assert all(job_id.startswith("second_") for job_id in queue.list_jobs(state))
+    assert queue.list_jobs("pending") == ["second_0000"]
+    assert os.listdir(os.path.join(str(tmp_path), "results")) == []
+
+def test_keep_alive_stops_once_reclaimed(tmp_path):
+    # Real clocks, heartbeats every few milliseconds
+    queue = jobqueue.JobQueue(str(tmp_path), timeout=0.02)
+    submit_jobs(queue, 1)
+    job = queue.claim()
+    claim_path = queue.get_claim_path(job)
+    first_heartbeat = os.stat(claim_path).st_mtime_ns
+
+    with queue.keep_alive(job):
+        time.sleep(0.1)
+        assert os.stat(claim_path).st_mtime_ns != first_heartbeat
+
+        os.rename(claim_path, queue.get_path("pending", job["job"]))
+        time.sleep(0.05)
+
+    assert not os.path.exists(claim_path)
+    assert queue.list_jobs("pending") == ["bake_0000"]
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+
+from lightmap_baker_addon import journal
+
+def append_object(bake_journal, obj_name, value, settings_hash="settings"):
+    mask = np.ones((3, 4), dtype=bool)
+    mask[0, 0] = False
+    covered = mask.copy()
+    covered[:, 3] = False
+    pixels = np.full((3, 4, 4), value, dtype=np.float32)
+    bake_journal.append(obj_name, settings_hash, value, 2 * value, mask, covered, pixels, 0.5)
+
+def get_objects(bake_journal, settings_hash="settings"):
+    return [entry["object"] for entry in bake_journal.get_entries(settings_hash)]
+
+def test_entries_are_replayed_in_order(tmp_path):
+    bake_journal = journal.BakeJournal(str(tmp_path / "Lightmap_journal"))
+    for index, obj_name in enumerate(("Cube", "Plane", "Sphere")):
+        append_object(bake_journal, obj_name, index + 1)
+    append_object(bake_journal, "Cone", 4, "other settings")
+
+    entries = bake_journal.get_entries("settings")
+    assert [entry["object"] for entry in entries] == ["Cube", "Plane", "Sphere"]
+
+    x, y, mask, covered, pixels = bake_journal.load(entries[1])
+    assert (x, y) == (2, 4)
+    assert mask.sum() == 11 and covered.sum() == 8
+    assert (pixels[mask] == 2.0).all()
+    assert not pixels[~mask].any()
+
+def test_cut_line_ends_the_journal(tmp_path):
+    bake_journal = journal.BakeJournal(str(tmp_path / "Lightmap_journal"))
+    for index, obj_name in enumerate(("Cube", "Plane", "Sphere")):
+        append_object(bake_journal, obj_name, index + 1)
+
+    # Crash while writing the last line
+    with open(bake_journal.journal_path, 'r+b') as journal_file:
+        journal_file.truncate(os.path.getsize(bake_journal.journal_path) - 10)
+
+    assert get_objects(bake_journal) == ["Cube", "Plane"]
+
+def test_line_past_the_data_ends_the_journal(tmp_path):
+    bake_journal = journal.BakeJournal(str(tmp_path / "Lightmap_journal"))
+    for index, obj_name in enumerate(("Cube", "Plane", "Sphere")):
+        append_object(bake_journal, obj_name, index + 1)
+
+    # The line of the last object made it to disk, not all of its pixels
+    last_entry = bake_journal.get_entries("settings")[-1]
+    with open(bake_journal.data_path, 'r+b') as data_file:
+        data_file.truncate(last_entry["offset"] + last_entry["size"] // 2)
+
+    assert get_objects(bake_journal) == ["Cube", "Plane"]
+
+def test_resumed_entries_follow_the_cut_line(tmp_path):
+    bake_journal = journal.BakeJournal(str(tmp_path / "Lightmap_journal"))
+    for index, obj_name in enumerate(("Cube", "Plane", "Sphere")):
+        append_object(bake_journal, obj_name, index + 1)
+
+    with open(bake_journal.journal_path, 'r+b') as journal_file:
+        journal_file.truncate(os.path.getsize(bake_journal.journal_path) - 10)
+    with open(bake_journal.data_path, 'ab') as data_file:
+        data_file.write(b"\0" * 100)
+
+    bake_journal.repair()
+    append_object(bake_journal, "Sphere", 3)
+    append_object(bake_journal, "Cone", 4)
+
+    entries = bake_journal.get_entries("settings")
+    assert [entry["object"] for entry in entries] == ["Cube", "Plane", "Sphere", "Cone"]
+    for value, entry in enumerate(entries, 1):
+        _, _, mask, _, pixels = bake_journal.load(entry)
+        assert (pixels[mask] == value).all()
+
+    # The pixels of the lost line are dropped with it
+    assert os.path.getsize(bake_journal.data_path) == entries[-1]["offset"] + entries[-1]["size"]
+
+def test_repair_keeps_a_complete_journal(tmp_path):
+    bake_journal = journal.BakeJournal(str(tmp_path / "Lightmap_journal"))
+    for index, obj_name in enumerate(("Cube", "Plane")):
+        append_object(bake_journal, obj_name, index + 1)
+    sizes = os.path.getsize(bake_journal.journal_path), os.path.getsize(bake_journal.data_path)
+
+    bake_journal.repair()
+
+    assert (os.path.getsize(bake_journal.journal_path), os.path.getsize(bake_journal.data_path)) == sizes
+    assert get_objects(bake_journal) == ["Cube", "Plane"]
+
+def test_missing_journal_has_no_entries(tmp_path):
+    bake_journal = journal.BakeJournal(str(tmp_path / "Lightmap_journal"))
+
+    bake_journal.repair()
+
+    assert not bake_journal.exists()
+    assert bake_journal.get_entries("settings") == []
@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+import pytest
+
+from lightmap_baker_addon import sampling
+
+def make_bakes(noise, seed=0, shape=(32, 32)):
+    # Two bakes of the same light with independent noise of the given relative level
+    rng = np.random.default_rng(seed)
+    light = np.full(shape + (4,), 0.5, dtype=np.float32)
+    first = light + rng.normal(0.0, noise * 0.5, light.shape).astype(np.float32)
+    second = light + rng.normal(0.0, noise * 0.5, light.shape).astype(np.float32)
+    return first, second
+
+def test_identical_bakes_have_no_noise():
+    first, _ = make_bakes(0.1)
+
+    assert sampling.estimate_noise(first, first.copy(), np.ones((32, 32), dtype=bool)) == 0.0
+
+def test_noise_grows_with_the_difference_of_the_bakes():
+    mask = np.ones((32, 32), dtype=bool)
+    estimates = [sampling.estimate_noise(*make_bakes(noise), mask) for noise in (0.01, 0.05, 0.2)]
+
+    assert estimates[0] < estimates[1] < estimates[2]
+    # Standard error of the mean of both bakes: noise / sqrt(2)
+    assert estimates[1] == pytest.approx(0.05 / math.sqrt(2.0), rel=0.1)
+
+def test_noise_is_measured_in_the_mask_only():
+    first, second = make_bakes(0.05)
+    mask = np.zeros((32, 32), dtype=bool)
+    mask[:16] = True
+
+    # Texels outside of the mask don't count
+    second[16:] += 10.0
+    clean_first, clean_second = first.copy(), second.copy()
+    clean_second[16:] = clean_first[16:]
+
+    assert sampling.estimate_noise(first, second, mask) == sampling.estimate_noise(clean_first, clean_second, mask)
+    assert sampling.estimate_noise(first, second, np.zeros((32, 32), dtype=bool)) == 0.0
+
+def test_objects_below_the_threshold_keep_their_samples():
+    extra = sampling.allocate_samples({"Quiet": 0.01, "Noisy": 0.04}, 64, 10000, 0.02, 1024)
+
+    assert "Quiet" not in extra
+    # Twice the threshold takes four times the samples
+    assert extra["Noisy"] == 64 * 4 - 64
+
+def test_samples_are_capped_per_object():
+    extra = sampling.allocate_samples({"Noisy": 1.0}, 64, 100000, 0.02, 512)
+
+    assert extra["Noisy"] == 512 - 64
+
+def test_budget_is_shared_by_need():
+    extra = sampling.allocate_samples({"Noisy": 0.04, "Noisier": 0.06}, 64, 300, 0.02, 4096)
+
+    assert sum(extra.values()) <= 300
+    # 192 and 512 extra samples needed, scaled down by the same factor
+    assert extra == {"Noisy": int(192 * 300 / 704), "Noisier": int(512 * 300 / 704)}
+
+def test_no_budget_refines_nothing():
+    assert sampling.allocate_samples({"Noisy": 0.5}, 64, 0, 0.02, 4096) == {}
+
+def test_blend_weights_by_samples():
+    pixels = np.full((2, 2, 4), 1.0, dtype=np.float32)
+    refined = np.full((2, 2, 4), 4.0, dtype=np.float32)
+
+    assert (sampling.blend(pixels, 64, refined, 192) == 3.25).all()
+    assert (sampling.blend(pixels, 64, refined, 64) == 2.5).all()
+
+    # Samples of each texel
+    samples = np.array([[64.0], [192.0]])[:, :, None]
+    blended = sampling.blend(pixels, samples, refined, 64)
+    assert blended[0, 0, 0] == pytest.approx(2.5)
+    assert blended[1, 0, 0] == pytest.approx(1.75)
+
+def test_adaptive_bake_splits_the_initial_samples():
+    bake = sampling.AdaptiveBake(["Cube", "Plane"], 33, 128, 0.02, 7)
+
+    # Two even halves, the budget is what the uniform bake would spend on top
+    assert bake.initial_samples == 32
+    assert bake.get_pass_samples() == 16
+    assert bake.budget == (128 - 32) * 2
+    assert bake.max_samples == 128 * sampling.MAX_SAMPLES_FACTOR
+    assert bake.get_pass_seed() == 7
+
+    bake.pass_index = sampling.SECOND_HALF
+    assert bake.get_pass_seed() == 8
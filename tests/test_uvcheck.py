@@ -0,0 +1,70 @@
+import numpy as np
+
+from lightmap_baker_addon import uvcheck
+
+def square(lower, upper):
+    (x0, y0), (x1, y1) = lower, upper
+    return np.array([
+        [(x0, y0), (x1, y0), (x1, y1)],
+        [(x0, y0), (x1, y1), (x0, y1)],
+    ], dtype=np.float64)
+
+def overlaps(*object_triangles, resolution=32):
+    triangles = np.concatenate(object_triangles)
+    object_ids = np.repeat(np.arange(len(object_triangles), dtype=np.int32), [len(triangles) for triangles in object_triangles])
+    return uvcheck.find_overlaps(triangles, object_ids, resolution)
+
+def test_separate_objects_do_not_overlap():
+    assert overlaps(square((0.0, 0.0), (0.5, 1.0)), square((0.5, 0.0), (1.0, 1.0))) == (set(), set())
+
+def test_object_overlapping_itself():
+    folded = np.concatenate([square((0.1, 0.1), (0.4, 0.4)), square((0.3, 0.3), (0.6, 0.6))])
+
+    assert overlaps(folded, square((0.7, 0.7), (0.9, 0.9))) == ({0}, set())
+
+def test_objects_overlapping_each_other():
+    self_overlaps, shared_overlaps = overlaps(square((0.0, 0.0), (0.2, 0.2)), square((0.5, 0.5), (0.8, 0.8)), square((0.6, 0.6), (0.9, 0.9)))
+
+    assert self_overlaps == set()
+    assert shared_overlaps == {1, 2}
+
+def test_overlaps_found_across_chunks(monkeypatch):
+    # Overlapping triangles rasterized in different chunks
+    from lightmap_baker_addon import coverage
+    monkeypatch.setattr(coverage, "MAX_CANDIDATES", 1 << 6)
+
+    folded = np.concatenate([square((0.1, 0.1), (0.6, 0.6)), square((0.5, 0.5), (0.9, 0.9))])
+    self_overlaps, shared_overlaps = overlaps(folded, square((0.05, 0.05), (0.2, 0.2)), resolution=64)
+
+    assert self_overlaps == {0}
+    assert shared_overlaps == {0, 1}
+
+def test_overlap_smaller_than_a_texel_is_ignored():
+    # Both squares touch the same texel without reaching its center
+    assert overlaps(square((0.0, 0.0), (0.51, 1.0)), square((0.505, 0.0), (1.0, 1.0)), resolution=4) == (set(), set())
+
+def test_analyse_groups_objects_by_problem():
+    problems = uvcheck.analyse([
+        ("Cube", square((0.1, 0.1), (0.4, 0.4))),
+        ("Plane", square((0.3, 0.3), (0.6, 0.6))),
+        ("Sphere", square((0.8, 0.8), (1.2, 0.9))),
+        ("Cone", square((0.0, 0.9), (0.001, 0.901))),
+    ], 64)
+
+    assert problems == {
+        "Lightmap UVs outside of the 0-1 square": ["Sphere"],
+        "Lightmap UVs overlapping other objects": ["Cube", "Plane"],
+        "Lightmap UV islands smaller than a texel": ["Cone"],
+    }
+
+def test_analyse_udim_tiles_one_by_one():
+    problems = uvcheck.analyse([
+        # Same place in two UDIM tiles
+        ("Cube", square((0.1, 0.1), (0.4, 0.4))),
+        ("Plane", square((1.1, 0.1), (1.4, 0.4))),
+        # Crossing from 1001 into 1002, and left of 1001
+        ("Sphere", square((0.8, 0.5), (1.1, 0.6))),
+        ("Cone", square((-0.9, 0.1), (-0.6, 0.4))),
+    ], 64, use_udim=True)
+
+    assert problems == {"Lightmap UVs outside of the UDIM tiles": ["Sphere", "Cone"]}
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from lightmap_baker_addon import uvpack
+
+def get_rectangles(sizes, positions):
+    return [(x, y, x + width, y + height) for (width, height), (x, y) in zip(sizes, positions)]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_rectangles_never_overlap(seed):
+    rng = np.random.default_rng(seed)
+    count = int(rng.integers(1, 40))
+    sizes = [tuple(size) for size in rng.uniform(0.01, 0.2, (count, 2))]
+    padding = float(rng.choice([0.0, 0.004, 0.02]))
+
+    positions = uvpack.pack_shelves(sizes, padding)
+    if positions is None:
+        # Too large for one atlas at that scale, half of it fits
+        sizes = [(width / 2.0, height / 2.0) for width, height in sizes]
+        positions = uvpack.pack_shelves(sizes, padding)
+    assert positions is not None
+
+    rectangles = get_rectangles(sizes, positions)
+
+    # Inside of the atlas, half of the padding from its edges
+    for left, bottom, right, top in rectangles:
+        assert left >= padding / 2.0 - 1e-9 and bottom >= padding / 2.0 - 1e-9
+        assert right <= 1.0 - padding / 2.0 + 1e-9 and top <= 1.0 - padding / 2.0 + 1e-9
+
+    # At least the padding between any two rectangles
+    for index, first in enumerate(rectangles):
+        for second in rectangles[index + 1:]:
+            gap_x = max(second[0] - first[2], first[0] - second[2])
+            gap_y = max(second[1] - first[3], first[1] - second[3])
+            assert max(gap_x, gap_y) >= padding - 1e-9
+
+def test_rectangles_too_large_do_not_fit():
+    assert uvpack.pack_shelves([(0.6, 0.6), (0.6, 0.6)], 0.0) is None
+    assert uvpack.pack_shelves([(1.0, 1.0)], 0.01) is None
+    assert uvpack.pack_shelves([(1.0, 1.0)], 0.0) == [(0.0, 0.0)]
+
+def test_rows_start_with_the_tallest_rectangles():
+    sizes = [(0.5, 0.2), (0.5, 0.4), (0.5, 0.3)]
+
+    positions = uvpack.pack_shelves(sizes, 0.0)
+
+    assert positions[1] == (0.0, 0.0)
+    assert positions[2] == (0.5, 0.0)
+    # Next shelf above the tallest of the first one
+    assert positions[0] == pytest.approx((0.0, 0.4))
+
+def test_identity_transform():
+    assert uvpack.is_identity(1.0, np.zeros(2))
+    assert uvpack.is_identity(1.0 + 1e-7, np.array([1e-7, -1e-7]))
+    assert not uvpack.is_identity(0.5, np.zeros(2))
+    assert not uvpack.is_identity(1.0, np.array([0.0, 0.01]))
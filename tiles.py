@@ -0,0 +1,242 @@
+import os
+
+import bpy
+import numpy as np
+
+from . import coverage, postprocess
+
+# Tiled bake
+# The lightmap is baked one sub-rectangle of the UV space at a time, into an
+# image the size of a tile. Only the objects overlapping the tile are baked,
+# through a temporary UV map that scales the tile over the whole image. Finished
+# tiles are streamed to a tiled EXR on disk, so the full lightmap never sits in memory.
+# Each tile is baked with a halo of the texels around it, as far as its margin
+# and filters reach, and cropped once they ran, so tile edges leave no seam.
+
+TILE_UV_NAME = "LightmapTile"
+
+def get_uv_bounds(obj):
+    # (min u, min v, max u, max v) of the lightmap UVs
+    uv_layer = obj.data.uv_layers[1]
+    uvs = np.empty(len(uv_layer.data) * 2, dtype=np.float32)
+    uv_layer.data.foreach_get("uv", uvs)
+    uvs = uvs.reshape(-1, 2)
+
+    if not len(uvs):
+        return None
+
+    return (*uvs.min(axis=0), *uvs.max(axis=0))
+
+def get_halo(properties):
+    # Texels of the neighbouring tiles the margin and the filters of a tile read
+    if int(properties.tile_size) >= int(properties.lightmap_resolution):
+        return 0
+
+    return properties.bake_margin + postprocess.get_filter_radius(properties)
+
+def get_tiles(resolution, tile_size):
+    # (x, y) pixel origin of every tile, bottom row first like image.pixels
+    return [(x, y) for y in range(0, resolution, tile_size) for x in range(0, resolution, tile_size)]
+
+def overlaps(bounds, tile, resolution, tile_size, margin):
+    # The margin of an island can spill over the next tile
+    x, y = tile
+    min_u, min_v, max_u, max_v = (value * resolution for value in bounds)
+
+    return (min_u - margin < x + tile_size and max_u + margin > x and
+            min_v - margin < y + tile_size and max_v + margin > y)
+
+def set_tile_uvs(obj, origin, resolution, size):
+    # Temporary UV map scaling the tile and its halo over the whole bake image
+    mesh = obj.data
+    uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+    mesh.uv_layers[1].data.foreach_get("uv", uvs)
+
+    uvs = (uvs.reshape(-1, 2) * resolution - origin) / size
+
+    uv_layer = mesh.uv_layers.get(TILE_UV_NAME) or mesh.uv_layers.new(name=TILE_UV_NAME)
+    uv_layer.data.foreach_set("uv", uvs.ravel())
+
+    # Cycles bakes through the active UV map
+    mesh.uv_layers.active = uv_layer
+
+def remove_tile_uvs(obj):
+    mesh = obj.data
+    uv_layer = mesh.uv_layers.get(TILE_UV_NAME)
+    if uv_layer:
+        mesh.uv_layers.remove(uv_layer)
+
+    mesh.uv_layers.active_index = 1
+
+def get_tile_coverage(objects, origin, resolution, size, depsgraph):
+    triangles = [coverage.get_lightmap_uv_triangles(obj, depsgraph) for obj in objects]
+    if not triangles:
+        return np.zeros((size, size), dtype=bool)
+
+    triangles = (np.concatenate(triangles) * resolution - origin) / size
+    return coverage.rasterize_triangles(triangles, size, size)
+
+class TiledLightmapWriter:
+    # Tiled EXR through OpenImageIO when Blender ships it. Otherwise the tiles
+    # go to a memory mapped buffer on disk, and the EXR is only saved by
+    # Blender at the end, with the whole lightmap in memory for that moment.
+    def __init__(self, path, resolution, tile_size, max_tiles_in_memory):
+        self.path = path
+        self.resolution = resolution
+        self.tile_size = tile_size
+        self.max_tiles_in_memory = max_tiles_in_memory
+        self.pending_tiles = []
+
+        try:
+            import OpenImageIO as oiio
+        except ImportError:
+            oiio = None
+
+        if oiio:
+            spec = oiio.ImageSpec(resolution, resolution, 4, "half")
+            spec.tile_width = tile_size
+            spec.tile_height = tile_size
+            spec.attribute("compression", "zip")
+
+            self.output = oiio.ImageOutput.create(path)
+            if not self.output or not self.output.open(path, spec):
+                raise RuntimeError(f"Can't write the tiled lightmap {path}")
+            self.buffer = None
+        else:
+            print("OpenImageIO is not available, the tiled lightmap is assembled at the end of the bake")
+            self.output = None
+            self.buffer = np.lib.format.open_memmap(
+                os.path.splitext(path)[0] + "_tiles.npy", mode='w+', dtype=np.float16, shape=(resolution, resolution, 4))
+
+    def add_tile(self, tile, pixels):
+        self.pending_tiles.append((tile, pixels))
+
+        if len(self.pending_tiles) >= self.max_tiles_in_memory:
+            self.flush()
+
+    def flush(self):
+        for (x, y), pixels in self.pending_tiles:
+            if self.output:
+                # Image files store the top row first
+                file_y = self.resolution - y - self.tile_size
+                self.output.write_tile(x, file_y, 0, np.ascontiguousarray(pixels[::-1]))
+            else:
+                self.buffer[y:y + self.tile_size, x:x + self.tile_size] = pixels
+
+        self.pending_tiles = []
+
+    def close(self):
+        self.flush()
+
+        if self.output:
+            self.output.close()
+            return
+
+        buffer_path = self.buffer.filename
+        image = bpy.data.images.new("Lightmap_Tiles", width=self.resolution, height=self.resolution, float_buffer=True)
+        postprocess.write_pixels(image, self.buffer)
+        image.filepath_raw = self.path
+        image.file_format = 'OPEN_EXR'
+        image.save()
+        bpy.data.images.remove(image, do_unlink=True)
+
+        del self.buffer
+        os.remove(buffer_path)
+
+    def abort(self):
+        self.pending_tiles = []
+
+        if self.output:
+            self.output.close()
+        else:
+            buffer_path = self.buffer.filename
+            del self.buffer
+            os.remove(buffer_path)
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class TiledBake:
+    def __init__(self, objects_to_bake, resolution, tile_size, margin, halo, path, max_tiles_in_memory):
+        self.resolution = resolution
+        self.tile_size = min(tile_size, resolution)
+        self.halo = halo
+
+        # Size of the bake image, a tile and its halo
+        self.bake_size = self.tile_size + 2 * halo
+
+        bounds = {obj_name: get_uv_bounds(bpy.data.objects[obj_name]) for obj_name in objects_to_bake}
+
+        # Tiles no object overlaps are never baked
+        self.jobs = []
+        for tile in get_tiles(resolution, self.tile_size):
+            tile_objects = [obj_name for obj_name in objects_to_bake
+                            if bounds[obj_name] and overlaps(bounds[obj_name], tile, resolution, self.tile_size, margin + halo)]
+            if tile_objects:
+                self.jobs.append((tile, tile_objects))
+
+        self.index = 0
+        self.current_objects = []
+        self.writer = TiledLightmapWriter(path, resolution, self.tile_size, max_tiles_in_memory)
+
+    def start_tile(self, image):
+        # Objects to bake for the next tile, None once every tile is done
+        if self.index >= len(self.jobs):
+            return None
+
+        tile, tile_objects = self.jobs[self.index]
+        self.current_objects = [bpy.data.objects[obj_name] for obj_name in tile_objects]
+
+        # The bake image is shared by every tile
+        postprocess.write_pixels(image, np.zeros((self.bake_size, self.bake_size, 4), dtype=np.float32))
+
+        for obj in self.current_objects:
+            set_tile_uvs(obj, self.get_origin(tile), self.resolution, self.bake_size)
+
+        print(f"Baking tile {self.index + 1}/{len(self.jobs)} at {tile}, {len(self.current_objects)} objects")
+        return self.current_objects
+
+    def get_origin(self, tile):
+        return (tile[0] - self.halo, tile[1] - self.halo)
+
+    def get_window(self, tile):
+        # Part of the bake image inside the lightmap, the halo of border tiles
+        # stops at the lightmap edge like the filters of a whole lightmap do
+        left, bottom = (max(0, self.halo - value) for value in tile)
+        right, top = (min(self.bake_size, self.resolution - value + self.halo) for value in tile)
+        return (slice(bottom, top), slice(left, right))
+
+    def finish_tile(self, context, image):
+        properties = context.scene.lightmap_baker_properties
+        tile = self.jobs[self.index][0]
+
+        for obj in self.current_objects:
+            remove_tile_uvs(obj)
+
+        window = self.get_window(tile)
+        pixels = postprocess.read_pixels(image)[window]
+
+        if properties.margin_mode == 'JUMP_FLOOD' and properties.bake_margin:
+            depsgraph = context.evaluated_depsgraph_get()
+            mask = get_tile_coverage(self.current_objects, self.get_origin(tile), self.resolution, self.bake_size, depsgraph)
+            pixels = coverage.fill_margin(pixels, mask[window], properties.bake_margin)
+
+        pixels = postprocess.apply_filters(pixels, properties)
+
+        # The tile without its halo
+        rows, columns = window
+        x, y = self.halo - columns.start, self.halo - rows.start
+        self.writer.add_tile(tile, np.ascontiguousarray(pixels[y:y + self.tile_size, x:x + self.tile_size]))
+        self.current_objects = []
+        self.index += 1
+
+    def progress(self):
+        return self.index / len(self.jobs) if self.jobs else 1.0
+
+    def close(self):
+        self.writer.close()
+
+    def abort(self):
+        for obj in self.current_objects:
+            remove_tile_uvs(obj)
+        self.writer.abort()
@@ -0,0 +1,86 @@
+import os
+
+import bpy
+import numpy as np
+
+from . import coverage, postprocess
+
+# UDIM lightmaps
+# Lightmap UVs beyond the 0-1 square land in the UDIM tiles 1001, 1002... (ten
+# tiles per row), each tile gets the full lightmap resolution. Only the tiles
+# covered by an object are created, and each tile is exported as its own file.
+
+FIRST_TILE = 1001
+
+def get_tile_number(u, v):
+    return FIRST_TILE + u + 10 * v
+
+def get_tile_offset(tile_number):
+    return (tile_number - FIRST_TILE) % 10, (tile_number - FIRST_TILE) // 10
+
+def get_used_tiles(objects, depsgraph):
+    tile_numbers = set()
+
+    for obj in objects:
+        tile_coordinates = coverage.get_triangle_tiles(coverage.get_lightmap_uv_triangles(obj, depsgraph))
+        tile_coordinates = tile_coordinates[coverage.in_tile_range(tile_coordinates)]
+        tile_numbers.update(get_tile_number(u, v) for u, v in np.unique(tile_coordinates, axis=0))
+
+    return sorted(int(tile_number) for tile_number in tile_numbers)
+
+def create_udim_image(name, resolution, tile_numbers):
+    image = bpy.data.images.new(name=name, width=resolution, height=resolution, float_buffer=True, tiled=True)
+
+    for tile_number in tile_numbers:
+        if tile_number != FIRST_TILE:
+            image.tiles.new(tile_number=tile_number)
+
+    # A tiled image always starts with 1001
+    if tile_numbers and FIRST_TILE not in tile_numbers:
+        image.tiles.remove(image.tiles.get(FIRST_TILE))
+
+    return image
+
+def get_tile_path(filepath, tile_number):
+    return filepath.replace("<UDIM>", str(tile_number))
+
+def get_tile_paths(image, filepath):
+    return [get_tile_path(filepath, tile.number) for tile in image.tiles]
+
+def process_tiles(image, filepath, objects, properties, depsgraph):
+    # Image.pixels only reaches the first tile, each saved tile is loaded on
+    # its own, filled and filtered with NumPy, and saved back
+    fill_margin = properties.margin_mode == 'JUMP_FLOOD' and properties.bake_margin
+    if not fill_margin and not properties.use_bilateral_blur:
+        return
+
+    triangles = np.concatenate([coverage.get_lightmap_uv_triangles(obj, depsgraph) for obj in objects])
+    tile_coordinates = coverage.get_triangle_tiles(triangles)
+
+    for tile in image.tiles:
+        tile_path = get_tile_path(filepath, tile.number)
+        tile_image = bpy.data.images.load(tile_path)
+
+        try:
+            width, height = tile_image.size
+            pixels = postprocess.read_pixels(tile_image)
+
+            if fill_margin:
+                offset = get_tile_offset(tile.number)
+                tile_triangles = triangles[(tile_coordinates == offset).all(axis=1)] - offset
+                mask = coverage.rasterize_triangles(tile_triangles, width, height)
+                pixels = coverage.fill_margin(pixels, mask, properties.bake_margin)
+
+            pixels = postprocess.apply_filters(pixels, properties)
+
+            postprocess.write_pixels(tile_image, pixels)
+            tile_image.filepath_raw = tile_path
+            tile_image.file_format = 'OPEN_EXR'
+            tile_image.save()
+        finally:
+            bpy.data.images.remove(tile_image, do_unlink=True)
+
+def remove_tile_files(image, filepath):
+    for tile_path in get_tile_paths(image, filepath):
+        if os.path.exists(tile_path):
+            os.remove(tile_path)
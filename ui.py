@@ -1,5 +1,7 @@
 import bpy
 
+from . import lightmap_baker, profiler
+
 class LIGHTMAPBAKER_PT_main():
     bl_space_type = "VIEW_3D"
     bl_region_type = "UI"
@@ -52,6 +54,24 @@ class LIGHTMAPBAKER_PT_objects(LIGHTMAPBAKER_PT_main, bpy.types.Panel):
         col.separator()
         col.menu("LIGHTMAPBAKER_MT_preview_context_menu", icon='DOWNARROW_HLT', text="")
 
+        # Bake set rules
+        col = layout.column(align=True)
+        for index, rule in enumerate(context.scene.lightmap_baker_rules):
+            row = col.row(align=True)
+            row.prop(rule, "rule_type", text="")
+            if rule.rule_type == 'COLLECTION':
+                row.prop(rule, "collection", text="")
+            elif rule.rule_type == 'NAME':
+                row.prop(rule, "pattern", text="")
+            else:
+                row.prop(rule, "property_name", text="")
+            row.operator("object.remove_bake_set_rule", text="", icon='X').index = index
+
+        row = layout.row(align=True)
+        row.operator("object.add_bake_set_rule", text="Add Rule", icon='ADD')
+        if context.scene.lightmap_baker_rules:
+            row.operator("object.apply_bake_set_rules", text="Apply Rules", icon='FILE_REFRESH')
+
 class LIGHTMAPBAKER_PT_uv(bpy.types.Panel):
     bl_parent_id = "LIGHTMAPBAKER_PT_Panel"
     bl_label = "Lightmap UV"
@@ -70,6 +90,7 @@ class LIGHTMAPBAKER_PT_uv(bpy.types.Panel):
         col = layout.column(align=True)
         col.operator("object.add_lightmap_uv", text="Add Lightmap UVs", icon='ADD')
         col.operator("object.delete_lightmap_uv",  text="Delete Lightmap UVs", icon='REMOVE')
+        col.operator("object.pack_lightmap_uvs", text="Pack Lightmap UVs", icon='UV')
         col.separator()
         
         row = col.row(align=False)
@@ -96,9 +117,14 @@ class LIGHTMAPBAKER_PT_filtering(LIGHTMAPBAKER_PT_main, bpy.types.Panel):
         layout.use_property_split = True
         layout.use_property_decorate = False
 
+        row = layout.row(align=False)
+        row.prop(context.scene.lightmap_baker_properties, "postprocess_engine", text="Engine")
+
         # Denoise
         row = layout.row(align=False)
-        row.prop(context.scene.lightmap_baker_properties, "use_denoise", text="Denoise")
+        # Only the compositor denoises, the In Memory engine goes through it for this
+        denoise_text = "Denoise (Compositor)" if context.scene.lightmap_baker_properties.postprocess_engine == 'NUMPY' else "Denoise"
+        row.prop(context.scene.lightmap_baker_properties, "use_denoise", text=denoise_text)
 
         # Bilateral Blur
         row = layout.row(align=False)
@@ -128,10 +154,49 @@ class LIGHTMAPBAKER_PT_settings(LIGHTMAPBAKER_PT_main, bpy.types.Panel):
 
         col = layout.column(align=False)
         col.prop(context.scene.lightmap_baker_properties, "lightmap_resolution", text="Resolution")
+        col.prop(context.scene.lightmap_baker_properties, "use_udim", text="UDIM Tiles")
+        col.prop(context.scene.lightmap_baker_properties, "use_atlas_planner", text="Atlas Planner")
+        if context.scene.lightmap_baker_properties.use_atlas_planner:
+            col.prop(context.scene.lightmap_baker_properties, "texels_per_meter", text="Texels per Meter")
         col.prop(context.scene.lightmap_baker_properties, "render_device", text="Device", toggle=True)
         col.separator()
         col.prop(context.scene.lightmap_baker_properties, "sample_count", text="Sample Count")
         col.prop(context.scene.lightmap_baker_properties, "bake_margin", text="Margin")
+        col.prop(context.scene.lightmap_baker_properties, "margin_mode", text="Margin Mode")
+        col.prop(context.scene.lightmap_baker_properties, "adaptive_sampling", text="Adaptive Sampling")
+        if context.scene.lightmap_baker_properties.adaptive_sampling:
+            col.prop(context.scene.lightmap_baker_properties, "adaptive_initial_samples", text="Initial Samples")
+            col.prop(context.scene.lightmap_baker_properties, "noise_threshold", text="Noise Threshold")
+        col.prop(context.scene.lightmap_baker_properties, "progressive_bake", text="Progressive Bake")
+        col.prop(context.scene.lightmap_baker_properties, "draft_sample_count", text="Draft Samples")
+        col.prop(context.scene.lightmap_baker_properties, "draft_denoise", text="Draft Denoise")
+        col.separator()
+        col.prop(context.scene.lightmap_baker_properties, "incremental_bake", text="Incremental Bake")
+        col.prop(context.scene.lightmap_baker_properties, "check_lightmap_uvs", text="Check Lightmap UVs")
+        col.prop(context.scene.lightmap_baker_properties, "profile_bake", text="Profile Bake")
+        col.prop(context.scene.lightmap_baker_properties, "use_bake_journal", text="Bake Journal")
+        col.prop(context.scene.lightmap_baker_properties, "lightmap_report", text="Lightmap Report")
+        if context.scene.lightmap_baker_properties.lightmap_report:
+            col.prop(context.scene.lightmap_baker_properties, "min_texels_per_meter", text="Min Texels per Meter")
+        col.prop(context.scene.lightmap_baker_properties, "use_bake_cache", text="Bake Cache")
+        if context.scene.lightmap_baker_properties.use_bake_cache:
+            col.prop(context.scene.lightmap_baker_properties, "cache_directory", text="Cache Directory")
+            col.prop(context.scene.lightmap_baker_properties, "cache_max_size", text="Cache Size (MB)")
+        col.prop(context.scene.lightmap_baker_properties, "bake_mode", text="Bake Mode")
+        if context.scene.lightmap_baker_properties.bake_mode == 'BATCHED':
+            col.prop(context.scene.lightmap_baker_properties, "batch_size", text="Batch Size")
+        elif context.scene.lightmap_baker_properties.bake_mode == 'PARALLEL':
+            col.prop(context.scene.lightmap_baker_properties, "parallel_workers", text="Workers")
+            col.prop(context.scene.lightmap_baker_properties, "parallel_threads", text="Threads per Worker")
+        elif context.scene.lightmap_baker_properties.bake_mode == 'QUEUE':
+            col.prop(context.scene.lightmap_baker_properties, "queue_directory", text="Queue Directory")
+            col.prop(context.scene.lightmap_baker_properties, "queue_job_size", text="Objects per Job")
+            col.prop(context.scene.lightmap_baker_properties, "queue_local_workers", text="Local Workers")
+            col.prop(context.scene.lightmap_baker_properties, "parallel_threads", text="Threads per Worker")
+            col.prop(context.scene.lightmap_baker_properties, "queue_timeout", text="Claim Timeout")
+        elif context.scene.lightmap_baker_properties.bake_mode == 'TILED':
+            col.prop(context.scene.lightmap_baker_properties, "tile_size", text="Tile Size")
+            col.prop(context.scene.lightmap_baker_properties, "max_tiles_in_memory", text="Tiles in Memory")
 
 class LIGHTMAPBAKER_PT_export(LIGHTMAPBAKER_PT_main, bpy.types.Panel):
     bl_parent_id = "LIGHTMAPBAKER_PT_Panel"
@@ -224,11 +289,76 @@ class LIGHTMAPBAKER_PT_bake(LIGHTMAPBAKER_PT_main, bpy.types.Panel):
             progress_text = "Completed!"
 
         row.operator(operator_object, text=operator_text, icon=icon, emboss=True)
+
+        # Quick preview of the light placement, the lightmap is left as it is
+        row = layout.row(align=True)
+        row.enabled = not properties.busy
+        row.operator("object.draft_bake", text="Draft Bake", icon='SHADING_SOLID')
+        if bpy.data.images.get(lightmap_baker.get_draft_image_name(context)):
+            row.prop(properties, "preview_draft", text="", icon='HIDE_OFF')
+
+        # Interrupted bake left a journal
+        if not properties.busy and lightmap_baker.is_bake_journal_enabled(context) and lightmap_baker.has_bake_journal(context):
+            layout.operator("object.resume_bake", text="Resume Bake", icon='RECOVER_LAST')
+
+        # Progressive lightmap samples can be added to
+        if not properties.busy and lightmap_baker.is_progressive_bake_enabled(context) and lightmap_baker.has_accumulation_buffer(context):
+            layout.operator("object.refine_bake", text="Refine Bake", icon='ADD')
         layout.progress(factor=progress_value, text=progress_text)
 
         # Display elapsed time 00:00.00
         layout.label(text=f"Elapsed Time: {format_time(context.scene.lightmap_baker_properties.elapsed_time)}") 
 
+        # Lightmaps of the last bake
+        if properties.use_atlas_planner and properties.atlas_count > 1:
+            layout.label(text=f"Atlases: {properties.atlas_count}")
+
+        # Peak memory of the last bake
+        if properties.peak_memory:
+            layout.label(text=f"Peak Memory: {properties.peak_memory:.0f} MB")
+
+        # Texel usage and density of the last lightmap, outliers first
+        if properties.lightmap_report and lightmap_baker.lightmap_report and not properties.busy:
+            col = layout.column(align=True)
+            col.label(text=f"Texels Used: {properties.lightmap_utilization:.1f}%")
+            col.label(text=f"Suggested Resolution: {properties.suggested_resolution}")
+            if properties.density_outliers:
+                col.label(text=f"Density Outliers: {properties.density_outliers}", icon='ERROR')
+                for entry in [entry for entry in lightmap_baker.lightmap_report["objects"] if entry["outlier"]][:5]:
+                    col.label(text=f"{entry['object']}: {entry['texels_per_meter']:.1f} texels/m")
+
+        # Samples in the last progressive lightmap
+        if properties.progressive_bake and properties.accumulated_samples and not properties.busy:
+            layout.label(text=f"Accumulated Samples: {properties.accumulated_samples}")
+
+        # Samples spent by the last adaptive bake, noisiest objects first
+        if properties.adaptive_sampling and lightmap_baker.sampling_report and not properties.busy:
+            col = layout.column(align=True)
+            col.label(text=f"Refined Objects: {properties.adaptive_refined_objects}")
+            col.label(text=f"Time Saved: {properties.adaptive_time_saved:.1f} sec")
+            for entry in sorted(lightmap_baker.sampling_report["objects"], key=lambda entry: -entry["noise"])[:5]:
+                col.label(text=f"{entry['object']}: {entry['samples']} samples")
+
+        # Cache statistics of the last bake
+        if properties.use_bake_cache:
+            layout.label(text=f"Cache: {properties.cache_hits} Hits, {properties.cache_misses} Misses, {properties.cache_size:.0f} MB")
+
+        # Unchanged objects of the last incremental bake
+        if properties.skipped_objects:
+            layout.label(text=f"Skipped {properties.skipped_objects} Objects, saved {format_time(properties.skipped_time)}")
+
+        # Time per object of the last bake in each mode
+        if properties.object_mode_time or properties.batched_mode_time:
+            col = layout.column(align=True)
+            col.label(text=f"Per Object: {properties.object_mode_time:.2f} sec/object")
+            col.label(text=f"Batched: {properties.batched_mode_time:.2f} sec/object")
+
+        # Time spent in each stage of the last bake
+        if properties.profile_bake and profiler.spans and not properties.busy:
+            col = layout.column(align=True)
+            for stage, total_time, count in profiler.get_summary():
+                col.label(text=f"{stage}: {format_time(total_time)} ({count}x)")
+
         
 class LIGHTMAPBAKER_MT_preview_context_menu(bpy.types.Menu):
     bl_label = "Preview Settings"
@@ -238,10 +368,12 @@ class LIGHTMAPBAKER_MT_preview_context_menu(bpy.types.Menu):
 
         layout.operator("object.remove_lightmap_nodes", text="Remove Lightmap Nodes")
         layout.prop(context.scene.lightmap_baker_properties, "automatic_lightmap_preview", text="Automatically Preview Lightmaps", toggle=True)
+        layout.separator()
+        layout.operator("object.measure_pack_cost", text="Measure Pack Cost")
 
 class LIGHTMAPBAKER_UL_objects_list(bpy.types.UIList):
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
-        obj = bpy.data.objects.get(item.objects_list)
+        obj = lightmap_baker.get_item_object(item)
         if obj:
             layout.label(text=obj.name, icon='CUBE')
             layout.operator("object.remove_single_from_bake_list", text="", icon='X', emboss=False).index = index  # Change here
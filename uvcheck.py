@@ -0,0 +1,122 @@
+import numpy as np
+
+from . import coverage
+
+# Lightmap UV preflight
+# The lightmap UV triangles of every object are rasterized at the bake
+# resolution before baking, to catch the UVs that would corrupt the lightmap:
+# texels covered twice by an object or by two objects, UVs outside of the
+# lightmap and islands too small to get a texel.
+
+# UV coordinates closer than 1 / UV_PRECISION are the same island vertex,
+# within UV_RANGE squares around the UDIM tiles
+UV_PRECISION = 1 << 16
+UV_RANGE = 64
+
+def get_islands(triangles, object_ids):
+    # Island index of each triangle, triangles sharing a UV vertex of the same
+    # object are in the same island. Min label propagation with pointer jumping.
+    corners = np.round((np.clip(triangles.reshape(-1, 2), -UV_RANGE / 2, UV_RANGE / 2) + UV_RANGE / 2) * UV_PRECISION).astype(np.int64)
+    bits = (UV_RANGE * UV_PRECISION).bit_length()
+    keys = (np.repeat(object_ids.astype(np.int64), 3) << (2 * bits)) | (corners[:, 0] << bits) | corners[:, 1]
+    _, vertices = np.unique(keys, return_inverse=True)
+    vertices = vertices.reshape(-1, 3)
+
+    labels = np.arange(vertices.max() + 1)
+    while True:
+        triangle_labels = labels[vertices].min(axis=1)
+        updated = labels.copy()
+        np.minimum.at(updated, vertices.ravel(), np.repeat(triangle_labels, 3))
+        updated = updated[updated]
+
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+
+    _, islands = np.unique(labels[vertices[:, 0]], return_inverse=True)
+    return islands
+
+def find_overlaps(triangles, object_ids, resolution):
+    # (objects overlapping themselves, objects overlapping another object)
+    owner = np.full(resolution * resolution, -1, dtype=np.int32)
+    self_overlaps = set()
+    shared_overlaps = set()
+
+    for hits, texels in coverage.iterate_texels(triangles, resolution, resolution):
+        objects = object_ids[hits]
+
+        # Texels covered twice within the chunk
+        order = np.argsort(texels, kind='stable')
+        texels, objects = texels[order], objects[order]
+        repeated = np.flatnonzero(texels[1:] == texels[:-1])
+        same = objects[repeated] == objects[repeated + 1]
+        self_overlaps.update(objects[repeated[same]].tolist())
+        shared_overlaps.update(objects[repeated[~same]].tolist())
+        shared_overlaps.update(objects[repeated[~same] + 1].tolist())
+
+        # Texels covered by a previous chunk
+        previous = owner[texels]
+        covered = previous >= 0
+        same = covered & (previous == objects)
+        other = covered & (previous != objects)
+        self_overlaps.update(objects[same].tolist())
+        shared_overlaps.update(objects[other].tolist())
+        shared_overlaps.update(previous[other].tolist())
+
+        owner[texels] = objects
+
+    return self_overlaps, shared_overlaps
+
+def analyse(triangle_sets, resolution, use_udim=False, check_shared=True):
+    # triangle_sets: list of (object name, (n, 3, 2) lightmap UV triangles)
+    # Returns the names of the offending objects, grouped by error message
+    names = [name for name, _ in triangle_sets]
+    triangles = np.concatenate([object_triangles for _, object_triangles in triangle_sets])
+    object_ids = np.repeat(np.arange(len(triangle_sets), dtype=np.int32), [len(object_triangles) for _, object_triangles in triangle_sets])
+
+    problems = {}
+
+    def flag(message, ids):
+        if len(ids):
+            problems[message] = [names[index] for index in sorted(set(ids))]
+
+    # UDIM tiles are checked one after the other, in their own 0-1 square
+    if use_udim:
+        tile_coordinates = coverage.get_triangle_tiles(triangles)
+        local_triangles = triangles - tile_coordinates[:, None, :]
+
+        # Triangles of no UDIM tile or crossing into the next one
+        in_range = coverage.in_tile_range(tile_coordinates)
+        outside = ~in_range | (local_triangles < 0.0).any(axis=(1, 2)) | (local_triangles > 1.0).any(axis=(1, 2))
+        flag("Lightmap UVs outside of the UDIM tiles", object_ids[outside])
+
+        pages = [(tile_coordinates == tile).all(axis=1) for tile in np.unique(tile_coordinates[in_range], axis=0)]
+    else:
+        pages = [np.ones(len(triangles), dtype=bool)]
+        local_triangles = triangles
+
+        outside = (triangles < 0.0).any(axis=(1, 2)) | (triangles > 1.0).any(axis=(1, 2))
+        flag("Lightmap UVs outside of the 0-1 square", object_ids[outside])
+
+    self_overlaps, shared_overlaps = set(), set()
+    for page in pages:
+        page_self, page_shared = find_overlaps(local_triangles[page], object_ids[page], resolution)
+        self_overlaps |= page_self
+        shared_overlaps |= page_shared
+
+    flag("Lightmap UVs overlapping within the object", list(self_overlaps))
+    if check_shared:
+        flag("Lightmap UVs overlapping other objects", list(shared_overlaps))
+
+    # Islands covering less than a texel
+    first = triangles[:, 1] - triangles[:, 0]
+    second = triangles[:, 2] - triangles[:, 0]
+    areas = 0.5 * np.abs(first[:, 0] * second[:, 1] - first[:, 1] * second[:, 0]) * resolution ** 2
+
+    islands = get_islands(triangles, object_ids)
+    island_areas = np.bincount(islands, weights=areas)
+    island_objects = np.zeros(len(island_areas), dtype=np.int32)
+    island_objects[islands] = object_ids
+    flag("Lightmap UV islands smaller than a texel", island_objects[island_areas < 1.0])
+
+    return problems
@@ -0,0 +1,103 @@
+import math
+
+import numpy as np
+
+from . import atlas
+
+# Lightmap UV packing
+# The lightmap UVs of every object are scaled and moved, as a whole, into their
+# own rectangle of a shared atlas. Rectangles are sized so every object gets
+# the same texel density, and packed in shelves with a padding between them.
+# Only mesh data is touched, through foreach_get/foreach_set, no operator runs.
+
+# Binary search steps on the atlas scale
+SEARCH_STEPS = 24
+
+def get_uv_bounds(mesh):
+    uvs = np.empty(len(mesh.loops) * 2, dtype=np.float64)
+    mesh.uv_layers[1].data.foreach_get("uv", uvs)
+    uvs = uvs.reshape(-1, 2)
+
+    return uvs.min(axis=0), uvs.max(axis=0)
+
+def pack_shelves(sizes, padding):
+    # Positions of the (width, height) rectangles, tallest first, None if they
+    # don't fit in the unit square
+    positions = [None] * len(sizes)
+    x = y = shelf_height = 0.0
+
+    for index in sorted(range(len(sizes)), key=lambda index: -sizes[index][1]):
+        width, height = sizes[index][0] + padding, sizes[index][1] + padding
+
+        if x + width > 1.0 + 1e-9:
+            y += shelf_height
+            x = shelf_height = 0.0
+
+        if x + width > 1.0 + 1e-9 or y + height > 1.0 + 1e-9:
+            return None
+
+        positions[index] = (x + padding / 2.0, y + padding / 2.0)
+        x += width
+        shelf_height = max(shelf_height, height)
+
+    return positions
+
+def pack_objects(objects, depsgraph, padding):
+    # Returns {mesh name: (scale, offset)}, applied as uv * scale + offset.
+    # Objects sharing a mesh share its UVs, the mesh is packed once.
+    meshes = {}
+    for obj in objects:
+        if obj.data.name not in meshes:
+            world_area, uv_area, _ = atlas.get_surface_areas(obj, depsgraph)
+            if world_area > 0.0 and uv_area > 0.0:
+                meshes[obj.data.name] = (obj.data, world_area, uv_area)
+
+    if not meshes:
+        return {}
+
+    names = list(meshes)
+    bounds = [get_uv_bounds(meshes[name][0]) for name in names]
+    extents = [np.maximum(upper - lower, 1e-8) for lower, upper in bounds]
+
+    # The scale of each mesh is density * sqrt(world area / uv area), so the
+    # whole atlas shares one texel density. Search the largest density that fits.
+    densities = [math.sqrt(meshes[name][1] / meshes[name][2]) for name in names]
+
+    def get_sizes(density):
+        return [tuple(extent * density * relative) for extent, relative in zip(extents, densities)]
+
+    # Starting point: the rectangles would exactly cover the atlas
+    total_area = sum(extent[0] * extent[1] * relative ** 2 for extent, relative in zip(extents, densities))
+    low, high = 0.0, 1.0 / math.sqrt(total_area)
+    positions = None
+
+    for _ in range(SEARCH_STEPS):
+        density = (low + high) / 2.0
+        packed = pack_shelves(get_sizes(density), padding)
+        if packed:
+            low, positions = density, packed
+        else:
+            high = density
+
+    if positions is None:
+        return {}
+
+    transforms = {}
+    for name, (lower, _), relative, position in zip(names, bounds, densities, positions):
+        scale = low * relative
+        transforms[name] = (scale, np.array(position) - lower * scale)
+
+    return transforms
+
+def is_identity(scale, offset, tolerance=1e-5):
+    # Packing UVs already packed gives back their own place, up to float rounding
+    return abs(scale - 1.0) < tolerance and np.abs(offset).max() < tolerance
+
+def apply_transform(mesh, scale, offset):
+    uv_layer = mesh.uv_layers[1]
+    uvs = np.empty(len(uv_layer.data) * 2, dtype=np.float32)
+    uv_layer.data.foreach_get("uv", uvs)
+
+    uvs = uvs.reshape(-1, 2) * scale + offset
+    uv_layer.data.foreach_set("uv", uvs.astype(np.float32).ravel())
+    mesh.update()